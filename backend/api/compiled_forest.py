@@ -0,0 +1,225 @@
+"""
+A trained random forest flattened into plain NumPy arrays.
+
+compile_forest() turns a fitted sklearn forest (plus the scaler in front of it
+and the label encoder behind it) into a CompiledForest: one set of node arrays
+for all trees and a sparse table of leaf class probabilities. Scaling is folded
+into the split thresholds, so the compiled forest scores raw feature rows.
+Evaluating, saving and loading it only needs NumPy - serving processes don't
+have to import sklearn.
+
+Two optional reductions shrink it further:
+  * max_depth prunes every tree to that depth; the cut nodes become leaves with
+    the class distribution of the samples that reached them.
+  * top_k / min_probability keep only each leaf's most likely classes. With one
+    class per recipe title most leaves only hold a handful anyway.
+Leaf probabilities are float32 by default (float16 halves them again).
+"""
+
+import io
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+TREE_LEAF = -1
+
+
+class CompiledForest:
+    def __init__(self, feature, threshold, left, right, roots, leaf_index, leaf_ptr, leaf_classes,
+                 leaf_probs, used_features, labels, n_features, max_depth):
+        # Per node (all trees concatenated): split feature (a position in used_features,
+        # TREE_LEAF for leaves), threshold on the raw feature value and child node ids
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.roots = roots
+        # Per node: row in the leaf table, -1 for split nodes
+        self.leaf_index = leaf_index
+        # Leaf table in CSR layout: classes and probabilities of leaf i are [leaf_ptr[i]:leaf_ptr[i + 1]]
+        self.leaf_ptr = leaf_ptr
+        self.leaf_classes = leaf_classes
+        self.leaf_probs = leaf_probs
+        # Original column of each feature the trees split on
+        self.used_features = used_features
+        # Title of every probability column
+        self.labels = labels
+        self.n_features = int(n_features)
+        self.max_depth = int(max_depth)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @property
+    def n_classes(self) -> int:
+        return len(self.labels)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.arrays().values())
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities for raw (unscaled) feature rows, dense or scipy sparse.
+
+        Columns follow self.labels. All rows walk all trees together, one level per step.
+        """
+        if hasattr(X, 'tocsr'):
+            X = X.tocsr()[:, self.used_features].toarray()
+        else:
+            X = np.asarray(X)[:, self.used_features]
+        # sklearn compares float32 feature values against the thresholds
+        X = X.astype(np.float32)
+        n_rows = X.shape[0]
+        rows = np.arange(n_rows)[:, None]
+
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            features = self.feature[nodes]
+            splitting = features != TREE_LEAF
+            if not splitting.any():
+                break
+            go_left = X[rows, np.where(splitting, features, 0)] <= self.threshold[nodes]
+            nodes = np.where(splitting, np.where(go_left, self.left[nodes], self.right[nodes]), nodes)
+
+        # Sum every reached leaf's probabilities into its row
+        leaves = self.leaf_index[nodes].ravel()
+        starts = self.leaf_ptr[leaves]
+        lengths = self.leaf_ptr[leaves + 1] - starts
+        total = int(lengths.sum())
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        cells = np.repeat(np.repeat(np.arange(n_rows) * self.n_classes, self.n_trees), lengths)
+        cells += self.leaf_classes[offsets]
+        probabilities = np.bincount(
+            cells, weights=self.leaf_probs[offsets].astype(np.float64), minlength=n_rows * self.n_classes
+        )
+        return probabilities.reshape(n_rows, self.n_classes) / self.n_trees
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'feature': self.feature, 'threshold': self.threshold, 'left': self.left, 'right': self.right,
+            'roots': self.roots, 'leaf_index': self.leaf_index, 'leaf_ptr': self.leaf_ptr,
+            'leaf_classes': self.leaf_classes, 'leaf_probs': self.leaf_probs,
+            'used_features': self.used_features, 'labels': self.labels,
+        }
+
+    def save(self, path, metadata: Optional[Dict[str, Any]] = None):
+        """Write the arrays as an uncompressed .npz; metadata values must be scalars or arrays"""
+        extra = {f'meta_{key}': np.asarray(value) for key, value in (metadata or {}).items()}
+        np.savez(path, n_features=self.n_features, max_depth=self.max_depth, **self.arrays(), **extra)
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved forest; returns (forest, metadata)"""
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files}
+        metadata = {key[len('meta_'):]: arrays.pop(key).item() for key in list(arrays) if key.startswith('meta_')}
+        return cls(**{key: arrays[key] for key in arrays}), metadata
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        self.save(buffer)
+        return buffer.getvalue()
+
+
+def compile_forest(forest, label_encoder, scaler=None, max_depth: int = None, top_k: int = None,
+                   min_probability: float = 0.0, probability_dtype=np.float32) -> CompiledForest:
+    """Flatten a fitted RandomForestClassifier (and the scaler feeding it) into a CompiledForest"""
+    scale = getattr(scaler, 'scale_', None)
+    if scaler is not None and getattr(scaler, 'with_mean', False) and getattr(scaler, 'mean_', None) is not None:
+        offset = scaler.mean_
+    else:
+        offset = None
+
+    features, thresholds, lefts, rights, leaf_index, roots = [], [], [], [], [], []
+    leaf_values = []
+    n_nodes = 0
+    depth_reached = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        values = tree.value[:, 0, :]
+        roots.append(n_nodes)
+
+        # Walk the tree depth-first, keeping only nodes above the depth limit
+        kept = {}
+        order = []
+        stack = [(0, 0)]
+        while stack:
+            node, depth = stack.pop()
+            kept[node] = n_nodes + len(order)
+            order.append(node)
+            if tree.children_left[node] != TREE_LEAF and (max_depth is None or depth < max_depth):
+                stack.append((tree.children_right[node], depth + 1))
+                stack.append((tree.children_left[node], depth + 1))
+                depth_reached = max(depth_reached, depth + 1)
+
+        tree_features = np.full(len(order), TREE_LEAF, dtype=np.int32)
+        tree_thresholds = np.zeros(len(order), dtype=np.float64)
+        tree_lefts = np.full(len(order), TREE_LEAF, dtype=np.int32)
+        tree_rights = np.full(len(order), TREE_LEAF, dtype=np.int32)
+        tree_leaves = np.full(len(order), -1, dtype=np.int32)
+        for position, node in enumerate(order):
+            left = tree.children_left[node]
+            if left != TREE_LEAF and left in kept:
+                feature = tree.feature[node]
+                threshold = tree.threshold[node]
+                # Undo the scaler: (x - mean) / scale <= t  <=>  x <= t * scale + mean
+                if scale is not None:
+                    threshold = threshold * scale[feature]
+                if offset is not None:
+                    threshold = threshold + offset[feature]
+                tree_features[position] = feature
+                tree_thresholds[position] = threshold
+                tree_lefts[position] = kept[left]
+                tree_rights[position] = kept[tree.children_right[node]]
+            else:
+                tree_leaves[position] = len(leaf_values)
+                leaf_values.append(values[node])
+
+        features.append(tree_features)
+        thresholds.append(tree_thresholds)
+        lefts.append(tree_lefts)
+        rights.append(tree_rights)
+        leaf_index.append(tree_leaves)
+        n_nodes += len(order)
+
+    feature = np.concatenate(features)
+    # Remap split features to the columns actually used, so scoring only densifies those
+    used_features = np.unique(feature[feature != TREE_LEAF]).astype(np.int32)
+    feature = np.where(feature == TREE_LEAF, TREE_LEAF, np.searchsorted(used_features, feature)).astype(np.int32)
+
+    # Sparse leaf table, optionally keeping only each leaf's top_k classes
+    leaf_ptr = [0]
+    leaf_classes = []
+    leaf_probs = []
+    for value in leaf_values:
+        probabilities = value / value.sum() if value.sum() > 0 else value
+        classes = np.flatnonzero(probabilities > min_probability)
+        if top_k and len(classes) > top_k:
+            classes = classes[np.argsort(-probabilities[classes], kind='stable')[:top_k]]
+            classes.sort()
+        leaf_classes.append(classes)
+        leaf_probs.append(probabilities[classes])
+        leaf_ptr.append(leaf_ptr[-1] + len(classes))
+
+    labels = np.asarray(label_encoder.classes_)[np.asarray(forest.classes_).astype(int)].astype(str)
+    class_dtype = np.int16 if len(labels) < 2 ** 15 else np.int32
+    return CompiledForest(
+        feature=feature,
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts),
+        right=np.concatenate(rights),
+        roots=np.array(roots, dtype=np.int32),
+        leaf_index=np.concatenate(leaf_index),
+        leaf_ptr=np.array(leaf_ptr, dtype=np.int32),
+        leaf_classes=np.concatenate(leaf_classes).astype(class_dtype) if leaf_classes else np.zeros(0, class_dtype),
+        leaf_probs=np.concatenate(leaf_probs).astype(probability_dtype) if leaf_probs else np.zeros(0, probability_dtype),
+        used_features=used_features,
+        labels=labels,
+        n_features=forest.n_features_in_,
+        max_depth=depth_reached,
+    )
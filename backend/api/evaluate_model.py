@@ -2,30 +2,52 @@
 """
 Recipe Ingredient Matching Evaluation - Tests ingredient-based matching performance
 Evaluates the actual matching logic used in production with CORE INGREDIENTS
+
+pandas, matplotlib, seaborn and pymysql are imported on first use, so importing
+this module (e.g. from a view) doesn't load them.
 """
 
+from __future__ import annotations
+
 import os
 import json
-import re
 import logging
 from collections import Counter
 from typing import List, Dict, Tuple, Any
 import random
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from difflib import SequenceMatcher
-import matplotlib.patches as mpatches
+from functools import lru_cache
 from math import pi
 
-# Add pymysql import
 try:
-    import pymysql
-    pymysql.install_as_MySQLdb()
+    from .ingredient_normalizer import normalize_ingredient_name
 except ImportError:
-    print("❌ pymysql is required. Install with: pip install pymysql")
-    raise
+    # Running this file directly as a script
+    from ingredient_normalizer import normalize_ingredient_name
+
+
+@lru_cache(maxsize=None)
+def _pymysql():
+    """pymysql, imported (and installed as MySQLdb) on the first database connection"""
+    try:
+        import pymysql
+    except ImportError:
+        print("❌ pymysql is required. Install with: pip install pymysql")
+        raise
+    pymysql.install_as_MySQLdb()
+    return pymysql
+
+
+@lru_cache(maxsize=None)
+def _plotting():
+    """matplotlib and seaborn, imported and styled when the first chart is drawn"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    sns.set(style="whitegrid")
+    plt.rcParams.update({'font.size': 10})
+    return plt, sns
+
 
 # -------------------------
 # REPRODUCIBILITY FIXES
@@ -36,8 +58,6 @@ random.seed(42)
 np.random.seed(42)
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
-sns.set(style="whitegrid")
-plt.rcParams.update({'font.size': 10})
 
 class IngredientMatchingEvaluation:
     def __init__(self, db_host='localhost', db_user='root', db_password='', db_name='cookmatef'):
@@ -52,6 +72,7 @@ class IngredientMatchingEvaluation:
     def connect_to_database(self):
         """Connect to MySQL database"""
         try:
+            pymysql = _pymysql()
             self.connection = pymysql.connect(
                 host=self.db_host,
                 user=self.db_user,
@@ -69,6 +90,8 @@ class IngredientMatchingEvaluation:
 
     def fetch_recipes_with_core_ingredients(self, limit=200) -> pd.DataFrame:
         """Fetch recipes with CORE ingredients from database"""
+        import pandas as pd
+        
         if not self.connection and not self.connect_to_database():
             return pd.DataFrame()
 
@@ -206,39 +229,8 @@ class IngredientMatchingEvaluation:
         return normalized  # deterministic, sorted unique list
 
     def _normalize_ingredient_name(self, ingredient_text: str) -> str:
-        """Normalize ingredient names for better matching"""
-        if not ingredient_text:
-            return ""
-        
-        # Convert to lowercase
-        text = ingredient_text.lower().strip()
-        
-        # Remove quantities and measurements
-        quantity_patterns = [
-            r'\d+\s*(tsp|tbsp|cup|cups|gram|g|kg|ml|l|pinch|to taste|slice|slices)\s*',
-            r'\d+[/\d]*\s*',
-            r'[\d.,]+\s*',
-            r'\([^)]*\)',
-            r'\b(optional|fresh|dried|chopped|sliced|minced|grated|powdered)\b'
-        ]
-        
-        for pattern in quantity_patterns:
-            text = re.sub(pattern, '', text)
-        
-        # Remove extra spaces and common stop words
-        stop_words = {'of', 'and', 'or', 'the', 'a', 'an', 'for', 'in', 'with', 'as'}
-        words = [word for word in text.split() if word not in stop_words and len(word) > 2]
-        
-        # Remove plural forms (basic)
-        normalized_words = []
-        for word in words:
-            if word.endswith('es'):
-                word = word[:-2]
-            elif word.endswith('s'):
-                word = word[:-1]
-            normalized_words.append(word)
-        
-        return ' '.join(normalized_words).strip()
+        """Normalize ingredient names for better matching (same normalizer as production)"""
+        return normalize_ingredient_name(ingredient_text)
 
     def string_similarity(self, a: str, b: str) -> float:
         """Calculate similarity between two strings using SequenceMatcher"""
@@ -583,6 +575,7 @@ class IngredientMatchingEvaluation:
 
     def generate_matching_charts(self, out_dir='matching_charts'):
         """Generate comprehensive matching evaluation charts"""
+        plt, sns = _plotting()
         os.makedirs(out_dir, exist_ok=True)
         er = self.evaluation_results
         
@@ -762,6 +755,7 @@ class IngredientMatchingEvaluation:
 
     def _create_enhanced_performance_chart(self, evaluation_results, out_dir):
         """Create enhanced performance metrics visualization"""
+        plt, _ = _plotting()
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
         
         # 1. Comprehensive Metrics Comparison
@@ -0,0 +1,87 @@
+"""
+Hashed ingredient features for the recommender model.
+
+Every canonical ingredient gets a column picked by a fixed hash (32-bit
+MurmurHash3, seed 0, the same columns sklearn's FeatureHasher picks), so the
+feature space has a fixed width, covers every ingredient in the catalog and is
+identical in every process, whatever PYTHONHASHSEED is. Rows are sparse: a
+recipe only stores the columns of its own ingredients.
+
+The hash is implemented here rather than taken from sklearn so that serving
+processes can build query rows without importing sklearn.
+"""
+
+from functools import lru_cache
+from typing import Iterable, List
+
+import numpy as np
+from scipy import sparse
+
+from .ingredient_normalizer import normalize_ingredient_name
+
+_MASK = 0xffffffff
+
+
+def _rotl(value: int, bits: int) -> int:
+    return ((value << bits) | (value >> (32 - bits))) & _MASK
+
+
+def murmurhash3_32(data: bytes, seed: int = 0) -> int:
+    """Signed 32-bit MurmurHash3 (x86_32), as sklearn.utils.murmurhash3_32 computes it"""
+    c1, c2 = 0xcc9e2d51, 0x1b873593
+    h = seed & _MASK
+    n_blocks = len(data) // 4
+    for block in range(n_blocks):
+        k = int.from_bytes(data[block * 4:block * 4 + 4], 'little')
+        k = (_rotl((k * c1) & _MASK, 15) * c2) & _MASK
+        h = (_rotl(h ^ k, 13) * 5 + 0xe6546b64) & _MASK
+
+    tail = data[n_blocks * 4:]
+    k = 0
+    if len(tail) >= 3:
+        k ^= tail[2] << 16
+    if len(tail) >= 2:
+        k ^= tail[1] << 8
+    if tail:
+        k ^= tail[0]
+        h ^= (_rotl((k * c1) & _MASK, 15) * c2) & _MASK
+
+    h ^= len(data)
+    h ^= h >> 16
+    h = (h * 0x85ebca6b) & _MASK
+    h ^= h >> 13
+    h = (h * 0xc2b2ae35) & _MASK
+    h ^= h >> 16
+    return h - (1 << 32) if h & 0x80000000 else h
+
+
+@lru_cache(maxsize=65536)
+def feature_column(name: str, n_features: int) -> int:
+    """Column of one feature name in an n_features wide hashed block"""
+    h = murmurhash3_32(name.encode('utf-8'))
+    if h == -2 ** 31:
+        # abs() would overflow in 32 bits; FeatureHasher defines the column this way
+        return (2 ** 31 - 1 - (n_features - 1)) % n_features
+    return abs(h) % n_features
+
+
+def canonical_ingredient_ids(ingredients: Iterable[str]) -> List[str]:
+    """Sorted, de-duplicated normalized names; ingredients that normalize to nothing are dropped"""
+    return sorted({normalize_ingredient_name(ingredient) for ingredient in ingredients} - {''})
+
+
+def hash_ingredient_lists(ingredient_lists: Iterable[Iterable[str]], n_features: int) -> sparse.csr_matrix:
+    """One binary row per ingredient list, n_features columns wide.
+
+    Two ingredients hashed to the same column still mean "present" (1.0).
+    """
+    indices = []
+    indptr = [0]
+    for ingredients in ingredient_lists:
+        columns = sorted({feature_column(name, n_features) for name in canonical_ingredient_ids(ingredients)})
+        indices.extend(columns)
+        indptr.append(len(indices))
+    return sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.float64), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int32)),
+        shape=(len(indptr) - 1, n_features)
+    )
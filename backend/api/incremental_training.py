@@ -0,0 +1,66 @@
+import copy
+import logging
+from typing import List
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree._tree import Tree
+
+logger = logging.getLogger(__name__)
+
+
+def pad_tree_classes(estimator, class_positions: np.ndarray, n_classes: int):
+    """Copy of a fitted decision tree whose class axis is widened to n_classes.
+
+    Column i of the tree's leaf values moves to class_positions[i]; classes the
+    tree never saw get zero probability. The splits are untouched.
+    """
+    tree = estimator.tree_
+    state = tree.__getstate__()
+    values = state['values']
+    padded = np.zeros((values.shape[0], values.shape[1], n_classes), dtype=values.dtype)
+    padded[:, :, class_positions] = values
+
+    new_tree = Tree(tree.n_features, np.array([n_classes], dtype=np.intp), tree.n_outputs)
+    new_tree.__setstate__({**state, 'values': padded})
+
+    padded_estimator = copy.copy(estimator)
+    padded_estimator.tree_ = new_tree
+    padded_estimator.classes_ = np.arange(n_classes, dtype=np.float64)
+    padded_estimator.n_classes_ = n_classes
+    return padded_estimator
+
+
+def grow_forest(forest: RandomForestClassifier, old_classes: np.ndarray, new_encoder,
+                X_scaled: np.ndarray, y_encoded: np.ndarray, n_new_trees: int, random_state: int,
+                n_jobs: int = None):
+    """Return a new forest: the old trees re-indexed to new_encoder's classes plus
+    n_new_trees trees fitted on the current rows.
+
+    old_classes are the labels (recipe titles) of the old forest's class columns.
+    sklearn's warm_start can't be used here because it would re-derive the
+    classes from y and drop the ones only the old trees know about.
+    """
+    n_classes = len(new_encoder.classes_)
+    old_positions = new_encoder.transform(old_classes)
+
+    extra = RandomForestClassifier(
+        n_estimators=n_new_trees,
+        max_depth=forest.max_depth,
+        min_samples_split=forest.min_samples_split,
+        min_samples_leaf=forest.min_samples_leaf,
+        random_state=random_state,
+        n_jobs=n_jobs
+    )
+    extra.fit(X_scaled, y_encoded)
+
+    estimators: List = [pad_tree_classes(tree, old_positions, n_classes) for tree in forest.estimators_]
+    estimators += [pad_tree_classes(tree, extra.classes_, n_classes) for tree in extra.estimators_]
+
+    grown = copy.copy(forest)
+    grown.estimators_ = estimators
+    grown.n_estimators = len(estimators)
+    grown.classes_ = np.arange(n_classes)
+    grown.n_classes_ = n_classes
+    logger.info(f"Grew forest to {len(estimators)} trees over {n_classes} recipes")
+    return grown
@@ -0,0 +1,225 @@
+"""
+Ingest-time extraction of core ingredients from free-text recipes.
+
+Recipes without recipe_core_ingredients rows used to be matched on whatever
+parse_ingredients made of their ingredients text, redone on every request.
+Instead, an Aho-Corasick automaton over every ingredient name (with simple
+plurals) and every regional alias the resolver knows scans the raw
+recipes.ingredients text once, in a single pass per recipe. The result is
+stored as recipe_core_ingredients rows, so those recipes join the catalog like
+curated ones. New recipes are extracted when they are added, and the
+extract_core_ingredients command backfills the rest of the table in parallel.
+
+Matches must sit on word boundaries. Where matches overlap, the leftmost
+longest wins, so "green chilli" beats "chilli" and "chilli" inside
+"red chilli powder" is not counted twice.
+"""
+
+import logging
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import connection, transaction
+
+from .ingredient_resolver import IRREGULAR_PLURALS, REGIONAL_ALIASES, IngredientResolver
+
+logger = logging.getLogger(__name__)
+
+# recipe_core_ingredients.category of extracted rows, so they can be told apart from curated ones
+EXTRACTED_CATEGORY = 'extracted'
+EXTRACTED_IMPORTANCE = 1.0
+
+SINGULAR_TO_PLURAL = {singular: plural for plural, singular in IRREGULAR_PLURALS.items()}
+
+
+class AhoCorasick:
+    """Finds every occurrence of every pattern in one pass over the text"""
+
+    def __init__(self, patterns: Dict[str, int]):
+        # State 0 is the root; goto[state] maps a character to the next state
+        self.goto = [{}]
+        self.fail = [0]
+        # (pattern length, value) of every pattern ending in a state, including via fail links
+        self.output = [[]]
+        for pattern, value in patterns.items():
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = self.goto[state][char] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            self.output[state].append((len(pattern), value))
+
+        # Breadth-first, so a state's fail target is final before its children need it
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def __len__(self):
+        return len(self.goto)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """(start, end, value) of every pattern occurrence, in order of end position"""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, value in output[state]:
+                yield position + 1 - length, position + 1, value
+
+
+def surface_forms(name: str) -> List[str]:
+    """How an ingredient name shows up in recipe text: as is, and with its last word pluralized"""
+    name = ' '.join(name.lower().split())
+    if not name:
+        return []
+    *head, last = name.split(' ')
+    if last in SINGULAR_TO_PLURAL:
+        plurals = [SINGULAR_TO_PLURAL[last]]
+    elif last.endswith('y') and len(last) > 2 and last[-2] not in 'aeiou':
+        plurals = [last[:-1] + 'ies']
+    elif last.endswith(('s', 'x', 'ch', 'sh', 'o')):
+        plurals = [last + 'es']
+    else:
+        plurals = [last + 's']
+    return [name] + [' '.join(head + [plural]) for plural in plurals]
+
+
+def extraction_patterns(resolver: IngredientResolver, aliases: Dict[str, Tuple[str, ...]] = None) -> Dict[str, int]:
+    """Surface form -> ingredient_id for every ingredient and every alias the resolver maps"""
+    patterns = {}
+    # Lowest id first, like the resolver, so shared spellings go to the same ingredient
+    for ingredient_id, name in sorted(resolver.names.items()):
+        for form in surface_forms(name):
+            patterns.setdefault(form, ingredient_id)
+    for alias in (REGIONAL_ALIASES if aliases is None else aliases):
+        ingredient_id = resolver.resolve(alias)
+        if ingredient_id is not None:
+            for form in surface_forms(alias):
+                patterns.setdefault(form, ingredient_id)
+    return patterns
+
+
+class IngredientExtractor:
+    def __init__(self, patterns: Dict[str, int]):
+        self.automaton = AhoCorasick(patterns)
+        self.n_patterns = len(patterns)
+        logger.info(f"Built ingredient extractor: {self.n_patterns} patterns, {len(self.automaton)} states")
+
+    def extract(self, text: Optional[str]) -> List[int]:
+        """ingredient_ids mentioned in text, in order of first mention"""
+        if not text:
+            return []
+        text = text.lower()
+        matches = []
+        for start, end, ingredient_id in self.automaton.iter_matches(text):
+            if start > 0 and text[start - 1].isalnum():
+                continue
+            if end < len(text) and text[end].isalnum():
+                continue
+            matches.append((start, start - end, ingredient_id))
+
+        # Leftmost longest, non-overlapping
+        matches.sort()
+        found = []
+        covered = 0
+        for start, negative_length, ingredient_id in matches:
+            if start >= covered:
+                found.append(ingredient_id)
+                covered = start - negative_length
+        return list(dict.fromkeys(found))
+
+
+# Each backfill worker process builds its own automaton once, from the patterns
+_worker_extractor = None
+
+
+def init_extraction_worker(patterns: Dict[str, int]):
+    global _worker_extractor
+    _worker_extractor = IngredientExtractor(patterns)
+
+
+def extract_batch(rows: List[Tuple[int, str]]) -> List[Tuple[int, List[int]]]:
+    """(recipe_id, ingredient_ids) for a batch of (recipe_id, ingredients text), in a worker"""
+    return [(recipe_id, _worker_extractor.extract(text)) for recipe_id, text in rows]
+
+
+def fetch_recipes_without_core_ingredients(after_id: int = 0, limit: int = 1000,
+                                           recipe_ids: Iterable[int] = None) -> List[Tuple[int, str]]:
+    """(recipe_id, ingredients) of recipes with ingredients text but no recipe_core_ingredients rows,
+    by recipe_id, starting after after_id"""
+    query = """
+        SELECT r.recipe_id, r.ingredients
+        FROM recipes r
+        WHERE r.recipe_id > %s AND r.ingredients IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM recipe_core_ingredients rci WHERE rci.recipe_id = r.recipe_id)
+    """
+    params = [after_id]
+    if recipe_ids is not None:
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return []
+        query += f" AND r.recipe_id IN ({', '.join(['%s'] * len(recipe_ids))})"
+        params.extend(recipe_ids)
+    query += " ORDER BY r.recipe_id LIMIT %s"
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+
+
+def save_core_ingredients(extracted: List[Tuple[int, List[int]]]) -> int:
+    """Insert extracted rows as essential core ingredients; returns the number of rows written"""
+    rows = [
+        (recipe_id, ingredient_id, EXTRACTED_IMPORTANCE, EXTRACTED_CATEGORY, 1)
+        for recipe_id, ingredient_ids in extracted
+        for ingredient_id in ingredient_ids
+    ]
+    if not rows:
+        return 0
+    # One transaction per batch, not one commit per row
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany("""
+            INSERT INTO recipe_core_ingredients (recipe_id, ingredient_id, importance_score, category, is_essential)
+            VALUES (%s, %s, %s, %s, %s)
+        """, rows)
+    return len(rows)
+
+
+def delete_extracted_core_ingredients(recipe_ids: Iterable[int]) -> List[int]:
+    """Delete the extracted rows of recipes that have no curated rows, so they get extracted again.
+
+    Recipes with any curated row keep everything. Returns the recipe_ids that were cleared.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return []
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Two statements: MySQL won't DELETE from a table its own subquery reads
+        cursor.execute(f"""
+            SELECT DISTINCT recipe_id FROM recipe_core_ingredients
+            WHERE recipe_id IN ({placeholders}) AND (category IS NULL OR category <> %s)
+        """, recipe_ids + [EXTRACTED_CATEGORY])
+        curated = {row[0] for row in cursor.fetchall()}
+        cleared = [recipe_id for recipe_id in recipe_ids if recipe_id not in curated]
+        if cleared:
+            cursor.execute(f"""
+                DELETE FROM recipe_core_ingredients
+                WHERE recipe_id IN ({', '.join(['%s'] * len(cleared))}) AND category = %s
+            """, cleared + [EXTRACTED_CATEGORY])
+    return cleared
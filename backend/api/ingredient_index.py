@@ -0,0 +1,508 @@
+import heapq
+import logging
+from collections import defaultdict
+from typing import List, Dict, Iterable, Optional, Set, Tuple, Callable
+
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+
+class IngredientIndex:
+    """Inverted index from recipe ingredient to the catalog positions that use it.
+
+    Built once per catalog snapshot. A query first resolves which distinct
+    ingredient terms the user's pantry matches (through a FuzzyTermIndex, once
+    per user ingredient instead of once per recipe), then counts matches per
+    recipe by walking only the posting lists of those terms.
+    """
+
+    def __init__(self, recipes: List[Dict], ingredients_for: Callable[[Dict], List[str]]):
+        self.terms = []
+        self.term_ids = {}
+        self.postings = []
+        self.recipe_ingredients = []
+        self.recipe_term_ids = []
+
+        for position, recipe in enumerate(recipes):
+            ingredients = ingredients_for(recipe) or []
+            term_ids = []
+            for ingredient in ingredients:
+                term = ingredient.lower()
+                term_id = self.term_ids.get(term)
+                if term_id is None:
+                    term_id = len(self.terms)
+                    self.term_ids[term] = term_id
+                    self.terms.append(term)
+                    self.postings.append([])
+                # One entry per occurrence so counts match the per-recipe loop
+                self.postings[term_id].append(position)
+                term_ids.append(term_id)
+            self.recipe_ingredients.append(ingredients)
+            self.recipe_term_ids.append(term_ids)
+
+        logger.info(f"Built ingredient index: {len(self.terms)} terms over {len(recipes)} recipes")
+
+    def candidates(self, matched_terms: Set[int], min_matching: int) -> List[Tuple[int, int]]:
+        """Return (position, matching_count) for recipes that reach min_matching, in catalog order"""
+        if min_matching <= 0:
+            # Every recipe qualifies on count alone, so there is nothing to prune
+            return [
+                (position, sum(1 for term_id in term_ids if term_id in matched_terms))
+                for position, term_ids in enumerate(self.recipe_term_ids)
+                if term_ids
+            ]
+
+        counts = defaultdict(int)
+        for term_id in matched_terms:
+            for position in self.postings[term_id]:
+                counts[position] += 1
+        return sorted(
+            (position, count) for position, count in counts.items()
+            if count >= min_matching
+        )
+
+    def matching_ingredients(self, position: int, matched_terms: Set[int]) -> List[str]:
+        """Matched ingredients of one recipe, lowercased and in recipe order"""
+        return [
+            self.terms[term_id] for term_id in self.recipe_term_ids[position]
+            if term_id in matched_terms
+        ]
+
+
+def select_candidates(counts: np.ndarray, lengths: np.ndarray, min_matching: int,
+                      min_percentage: float) -> List[Tuple[int, int]]:
+    """(position, matching_count) for every recipe passing both thresholds, in catalog order"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentages = np.where(lengths > 0, counts / lengths * 100, 0.0)
+    mask = (lengths > 0) & (counts >= min_matching) & (percentages > min_percentage)
+    positions = np.flatnonzero(mask)
+    return list(zip(positions.tolist(), counts[positions].tolist()))
+
+
+class RecipeIngredientMatrix:
+    """Sparse recipe x ingredient-term matrix (CSR) built from an IngredientIndex.
+
+    matching_count for the whole catalog is one sparse mat-vec of the matrix
+    with the 0/1 vector of terms the user matched.
+    """
+
+    def __init__(self, index: IngredientIndex):
+        indptr = [0]
+        indices = []
+        for term_ids in index.recipe_term_ids:
+            indices.extend(term_ids)
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.int32)
+        # Repeated terms within a recipe are summed, matching the per-recipe loop
+        self.matrix = sparse.csr_matrix(
+            (data, np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(index.recipe_term_ids), len(index.terms))
+        )
+        self.lengths = np.asarray([len(term_ids) for term_ids in index.recipe_term_ids], dtype=np.int64)
+        self.n_terms = len(index.terms)
+
+    def term_vector(self, matched_terms: Set[int]) -> np.ndarray:
+        vector = np.zeros(self.n_terms, dtype=np.int32)
+        if matched_terms:
+            vector[list(matched_terms)] = 1
+        return vector
+
+    def candidates(self, matched_terms: Set[int], min_matching: int, min_percentage: float) -> List[Tuple[int, int]]:
+        """Return (position, matching_count) for recipes passing both thresholds, in catalog order"""
+        return self._select(self.matrix.dot(self.term_vector(matched_terms)), min_matching, min_percentage)
+
+    def _select(self, counts: np.ndarray, min_matching: int, min_percentage: float) -> List[Tuple[int, int]]:
+        return select_candidates(counts, self.lengths, min_matching, min_percentage)
+
+    def candidates_many(self, matched_term_sets: List[Set[int]], thresholds: List[Tuple[int, float]],
+                        chunk_size: int = 64) -> List[List[Tuple[int, int]]]:
+        """candidates() for a batch of queries, scored with one sparse mat-mat product per chunk"""
+        results = []
+        for start in range(0, len(matched_term_sets), chunk_size):
+            chunk = matched_term_sets[start:start + chunk_size]
+            rows = [term_id for terms in chunk for term_id in terms]
+            cols = [column for column, terms in enumerate(chunk) for _ in terms]
+            queries = sparse.csr_matrix(
+                (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                shape=(self.n_terms, len(chunk))
+            )
+            counts = np.asarray(self.matrix.dot(queries).todense())
+            for column, (min_matching, min_percentage) in enumerate(thresholds[start:start + chunk_size]):
+                results.append(self._select(counts[:, column], min_matching, min_percentage))
+        return results
+
+
+# Set bits in every byte value, for NumPy versions without np.bitwise_count (< 2.0)
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Set bits in each uint64 of words"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    return POPCOUNT[words.view(np.uint8).reshape(-1, 8)].sum(axis=1, dtype=np.uint8)
+
+
+class RecipeIngredientBitsets:
+    """Every recipe's ingredient terms as a packed bitset row (bit t = term t).
+
+    Rows are uint64 words stored column-major, so a query only ANDs and
+    popcounts the words its matched terms fall in: one vectorized pass over the
+    catalog per touched word. Costs n_recipes * n_terms / 8 bytes, whatever the
+    recipes hold.
+    Terms repeated within a recipe count once per occurrence, like the other
+    engines; the extra occurrences are kept in a small sparse side table.
+    """
+
+    def __init__(self, index: IngredientIndex):
+        self.n_terms = len(index.terms)
+        self.n_words = (self.n_terms + 63) // 64
+        self.lengths = np.asarray([len(term_ids) for term_ids in index.recipe_term_ids], dtype=np.int64)
+        n_recipes = len(self.lengths)
+
+        # Distinct (recipe, term) pairs and how often each occurs
+        rows = np.repeat(np.arange(n_recipes, dtype=np.int64), self.lengths)
+        terms = np.fromiter(
+            (term_id for term_ids in index.recipe_term_ids for term_id in term_ids), dtype=np.int64, count=len(rows)
+        )
+        pairs, occurrences = np.unique(rows * max(self.n_terms, 1) + terms, return_counts=True)
+        rows, terms = np.divmod(pairs, max(self.n_terms, 1))
+
+        self.bits = np.zeros((n_recipes, self.n_words), dtype=np.uint64, order='F')
+        np.bitwise_or.at(self.bits, (rows, terms >> 6), np.left_shift(np.uint64(1), (terms & 63).astype(np.uint64)))
+        repeated = occurrences > 1
+        self.duplicates = sparse.csr_matrix(
+            (occurrences[repeated] - 1, (rows[repeated], terms[repeated])), shape=(n_recipes, self.n_terms)
+        ) if repeated.any() else None
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes + (self.duplicates.data.nbytes if self.duplicates is not None else 0)
+
+    def query_bits(self, matched_terms: Set[int]) -> np.ndarray:
+        """The matched terms packed the same way as a recipe row"""
+        query = np.zeros(self.n_words, dtype=np.uint64)
+        for term_id in matched_terms:
+            query[term_id >> 6] |= np.uint64(1 << (term_id & 63))
+        return query
+
+    def counts(self, matched_terms: Set[int]) -> np.ndarray:
+        """matching_count of every recipe: popcount(row AND query), plus repeated terms"""
+        counts = np.zeros(self.bits.shape[0], dtype=np.int64)
+        if not matched_terms:
+            return counts
+        query = self.query_bits(matched_terms)
+        for column in np.flatnonzero(query).tolist():
+            counts += popcount(self.bits[:, column] & query[column])
+        if self.duplicates is not None:
+            vector = np.zeros(self.n_terms, dtype=np.int64)
+            vector[list(matched_terms)] = 1
+            counts += self.duplicates.dot(vector)
+        return counts
+
+    def candidates(self, matched_terms: Set[int], min_matching: int, min_percentage: float) -> List[Tuple[int, int]]:
+        """Return (position, matching_count) for recipes passing both thresholds, in catalog order"""
+        return select_candidates(self.counts(matched_terms), self.lengths, min_matching, min_percentage)
+
+    def recipe_mask(self, position: int) -> int:
+        """One recipe's row as a Python int, for single-recipe AND + bit_count()"""
+        return int.from_bytes(self.bits[position].astype('<u8').tobytes(), 'little')
+
+
+def mask_of(term_ids: Iterable[int]) -> int:
+    """Python int bitset with bit t set for every term t"""
+    mask = 0
+    for term_id in term_ids:
+        mask |= 1 << term_id
+    return mask
+
+
+class WeightedIngredientIndex:
+    """Importance-weighted match scores with block-max MaxScore top-k pruning.
+
+    A recipe's score is the importance of the core ingredients the user has
+    over the importance of all of them (a weighted match fraction). Recipes
+    without aligned importance scores weigh every ingredient the same.
+
+    Posting lists hold each term's contribution per recipe and are cut into
+    blocks of BLOCK_SIZE catalog positions, each with the largest contribution
+    in it. For a query, a block's upper bound is the sum of its matched terms'
+    block maxima, and no recipe in the block can score more. top_k scores the
+    SEED_BLOCKS best-bound blocks into a k-best heap, drops every block whose
+    bound is below the k-th best score found, and scores the rest in one
+    vectorized pass over the matched posting lists. Only offers that can beat
+    the heap's minimum are pushed onto it.
+    """
+
+    BLOCK_SIZE = 1024
+    # Blocks scored one at a time to set the first k-th best score
+    SEED_BLOCKS = 4
+    # Slack for float rounding when comparing bounds with scores
+    EPSILON = 1e-9
+
+    def __init__(self, index: IngredientIndex, weights: List[Optional[List[float]]], block_size: int = None):
+        self.block_size = block_size or self.BLOCK_SIZE
+        n_recipes = len(index.recipe_term_ids)
+        self.n_terms = len(index.terms)
+        self.n_blocks = (n_recipes + self.block_size - 1) // self.block_size
+        self.lengths = np.asarray([len(term_ids) for term_ids in index.recipe_term_ids], dtype=np.int64)
+
+        term_column, position_column, contribution_column = [], [], []
+        for position, term_ids in enumerate(index.recipe_term_ids):
+            recipe_weights = weights[position] if position < len(weights) else None
+            if recipe_weights is None or len(recipe_weights) != len(term_ids) or sum(recipe_weights) <= 0:
+                recipe_weights = [1.0] * len(term_ids)
+            total = sum(recipe_weights)
+            term_column.extend(term_ids)
+            position_column.extend([position] * len(term_ids))
+            contribution_column.extend(weight / total for weight in recipe_weights)
+
+        # Term-major, then by position; repeated terms in a recipe are summed, like matching_count
+        keys = np.asarray(term_column, dtype=np.int64) * max(n_recipes, 1) + np.asarray(position_column, dtype=np.int64)
+        keys, inverse = np.unique(keys, return_inverse=True)
+        self.contributions = np.bincount(inverse, weights=np.asarray(contribution_column, dtype=np.float64),
+                                         minlength=len(keys))
+        self.occurrences = np.bincount(inverse, minlength=len(keys)).astype(np.int64)
+        terms = keys // max(n_recipes, 1)
+        self.positions = keys % max(n_recipes, 1)
+
+        # One entry per (term, block) holding postings: where they start and their largest contribution
+        block_keys = terms * max(self.n_blocks, 1) + self.positions // self.block_size
+        starts = np.flatnonzero(np.diff(block_keys, prepend=-1)) if len(block_keys) else np.zeros(0, dtype=np.int64)
+        self.block_starts = np.append(starts, len(keys))
+        self.block_numbers = block_keys[starts] % max(self.n_blocks, 1)
+        self.block_max = (np.maximum.reduceat(self.contributions, starts) if len(starts)
+                          else np.zeros(0, dtype=np.float64))
+        self.term_blocks = np.searchsorted(block_keys[starts] // max(self.n_blocks, 1), np.arange(self.n_terms + 1))
+        logger.info(
+            f"Built weighted ingredient index: {len(keys)} postings in {len(starts)} blocks of "
+            f"{self.block_size} recipes"
+        )
+
+    def top_k(self, matched_terms: Set[int], k: int, min_matching: int, min_percentage: float,
+              prune: bool = True, stats: Dict[str, int] = None) -> List[Tuple[float, int, int]]:
+        """The k best (score, matching_count, position) among recipes a matched term
+        reaches that pass both thresholds, best first; ties go to the higher count,
+        then to catalog order.
+
+        prune=False scores every block a matched term reaches (the reference).
+        stats, if given, receives how many blocks were scored and skipped.
+        """
+        terms = sorted(term_id for term_id in matched_terms if 0 <= term_id < self.n_terms)
+        bounds = np.zeros(self.n_blocks, dtype=np.float64)
+        reached = np.zeros(self.n_blocks, dtype=bool)
+        for term_id in terms:
+            first, last = self.term_blocks[term_id], self.term_blocks[term_id + 1]
+            numbers = self.block_numbers[first:last]
+            bounds[numbers] += self.block_max[first:last]
+            reached[numbers] = True
+
+        blocks = np.flatnonzero(reached)
+        blocks = blocks[np.argsort(-bounds[blocks], kind='stable')]
+        heap = []
+        scored_blocks = 0
+        if k > 0 and len(blocks):
+            if prune:
+                # The best-bound blocks one by one, for a first k-th best score to prune with
+                seeded = 0
+                while seeded < min(self.SEED_BLOCKS, len(blocks)):
+                    self._score_block(int(blocks[seeded]), terms, k, min_matching, min_percentage, heap)
+                    seeded += 1
+                blocks = blocks[seeded:]
+                scored_blocks += seeded
+                if len(heap) == k:
+                    blocks = blocks[bounds[blocks] >= heap[0][0] - self.EPSILON]
+            self._score_blocks(blocks, terms, k, min_matching, min_percentage, heap)
+            scored_blocks += len(blocks)
+        if stats is not None:
+            stats['blocks'] = stats.get('blocks', 0) + scored_blocks
+            stats['skipped'] = stats.get('skipped', 0) + int(reached.sum()) - scored_blocks
+        return [(score, count, -negative_position) for score, count, negative_position in sorted(heap, reverse=True)]
+
+    def _term_postings(self, term_id: int) -> Tuple[int, int]:
+        return self.block_starts[self.term_blocks[term_id]], self.block_starts[self.term_blocks[term_id + 1]]
+
+    def _score_block(self, block: int, terms: List[int], k: int, min_matching: int, min_percentage: float, heap):
+        """Score one block's recipes and offer them to the heap"""
+        start = block * self.block_size
+        scores = np.zeros(len(self.lengths[start:start + self.block_size]), dtype=np.float64)
+        counts = np.zeros(len(scores), dtype=np.int64)
+        for term_id in terms:
+            first, last = self.term_blocks[term_id], self.term_blocks[term_id + 1]
+            entry = first + np.searchsorted(self.block_numbers[first:last], block)
+            if entry == last or self.block_numbers[entry] != block:
+                continue
+            local = self.positions[self.block_starts[entry]:self.block_starts[entry + 1]] - start
+            # A term's postings are distinct positions
+            scores[local] += self.contributions[self.block_starts[entry]:self.block_starts[entry + 1]]
+            counts[local] += self.occurrences[self.block_starts[entry]:self.block_starts[entry + 1]]
+        self._offer(start, scores, counts, k, min_matching, min_percentage, heap)
+
+    def _score_blocks(self, blocks: np.ndarray, terms: List[int], k: int, min_matching: int,
+                      min_percentage: float, heap):
+        """Score the recipes of many blocks in one pass over the matched posting lists"""
+        if not len(blocks):
+            return
+        alive = np.zeros(self.n_blocks, dtype=bool)
+        alive[blocks] = True
+        scores = np.zeros(len(self.lengths), dtype=np.float64)
+        counts = np.zeros(len(self.lengths), dtype=np.int64)
+        for term_id in terms:
+            first, last = self._term_postings(term_id)
+            positions = self.positions[first:last]
+            keep = alive[positions // self.block_size]
+            positions = positions[keep]
+            scores[positions] += self.contributions[first:last][keep]
+            counts[positions] += self.occurrences[first:last][keep]
+        self._offer(0, scores, counts, k, min_matching, min_percentage, heap)
+
+    def _offer(self, start: int, scores: np.ndarray, counts: np.ndarray, k: int, min_matching: int,
+               min_percentage: float, heap):
+        """Push the recipes at start + offset that pass both thresholds onto the size-k min-heap"""
+        # Equal fractions tie whatever order their contributions were summed in
+        scores = np.round(scores, 12)
+        lengths = self.lengths[start:start + len(scores)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentages = np.where(lengths > 0, counts / lengths * 100, 0.0)
+        mask = (counts > 0) & (counts >= min_matching) & (percentages > min_percentage)
+        if len(heap) == k:
+            mask &= scores >= heap[0][0]
+        offsets = np.flatnonzero(mask)
+        if len(offsets) > k:
+            kth_best = np.partition(scores[offsets], len(offsets) - k)[len(offsets) - k]
+            offsets = offsets[scores[offsets] >= kth_best]
+            offsets = offsets[np.lexsort((offsets, -counts[offsets], -scores[offsets]))[:k]]
+        for offset in offsets.tolist():
+            entry = (float(scores[offset]), int(counts[offset]), -(start + offset))
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[start:start + 3] for start in range(len(text) - 2)}
+
+
+class FuzzyTermIndex:
+    """Finds the IngredientIndex terms one ingredient fuzzily matches without
+    comparing it against the whole vocabulary.
+
+    Terms are grouped by normalized name, since matching only looks at
+    normalized names. For a query, three filters over all names pick the
+    candidates that can pass is_match, and is_match then only runs on those:
+      * containment either way: a name containing the query has all of its
+        character trigrams, and a name inside the query has all its trigrams
+        in the query (names under 3 characters are checked directly);
+      * spelling (SequenceMatcher ratio > min_ratio): the ratio is at most
+        2 * shared characters / total length, counted per character. Trigrams
+        can't bound it - short names within the ratio may share none;
+      * word overlap (Jaccard > min_overlap): computed exactly from word postings.
+    Every filter is a superset of the rule it stands for, so the result is
+    exactly the set a scan with is_match over every term would return.
+    """
+
+    def __init__(self, terms: List[str], normalize: Callable[[str], str], min_ratio: float, min_overlap: float):
+        self.terms = terms
+        self.normalize = normalize
+        self.min_ratio = min_ratio
+        self.min_overlap = min_overlap
+
+        self.names = []
+        self.name_ids = {}
+        self.name_terms = []
+        for term_id, term in enumerate(terms):
+            # An empty ingredient never matches anything
+            if not term:
+                continue
+            name = normalize(term)
+            name_id = self.name_ids.get(name)
+            if name_id is None:
+                name_id = self.name_ids[name] = len(self.names)
+                self.names.append(name)
+                self.name_terms.append([])
+            self.name_terms[name_id].append(term_id)
+
+        trigram_postings = defaultdict(list)
+        word_postings = defaultdict(list)
+        characters = {}
+        for name_id, name in enumerate(self.names):
+            for gram in trigrams(name):
+                trigram_postings[gram].append(name_id)
+            for word in set(name.split()):
+                word_postings[word].append(name_id)
+            for character in name:
+                characters.setdefault(character, len(characters))
+        self.trigram_postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in trigram_postings.items()}
+        self.word_postings = {word: np.asarray(ids, dtype=np.int32) for word, ids in word_postings.items()}
+        self.lengths = np.asarray([len(name) for name in self.names], dtype=np.int64)
+        self.trigram_counts = np.asarray([len(trigrams(name)) for name in self.names], dtype=np.int64)
+        self.word_counts = np.asarray([len(set(name.split())) for name in self.names], dtype=np.int64)
+        self.short_names = [name_id for name_id, name in enumerate(self.names) if len(name) < 3]
+
+        # Per-character counts, column-major so the query's characters are contiguous slices
+        self.character_columns = characters
+        self.character_counts = np.zeros((len(self.names), len(characters)), dtype=np.uint16, order='F')
+        for name_id, name in enumerate(self.names):
+            for character in name:
+                self.character_counts[name_id, characters[character]] += 1
+
+        logger.info(
+            f"Built fuzzy term index: {len(self.names)} names, {len(self.trigram_postings)} trigrams "
+            f"over {len(terms)} terms"
+        )
+
+    def _count(self, postings: Dict[str, np.ndarray], keys: Iterable[str]) -> np.ndarray:
+        """How many of keys each name appears under"""
+        hits = [postings[key] for key in keys if key in postings]
+        if not hits:
+            return np.zeros(len(self.names), dtype=np.int64)
+        return np.bincount(np.concatenate(hits), minlength=len(self.names))
+
+    def candidate_names(self, ingredient: str) -> Set[int]:
+        """Ids of the names that may match ingredient; always a superset of the real matches"""
+        name = self.normalize(ingredient)
+        if not self.names:
+            return set()
+
+        grams = trigrams(name)
+        shared_grams = self._count(self.trigram_postings, grams)
+        mask = (shared_grams == self.trigram_counts) & (self.trigram_counts > 0)
+        if grams:
+            mask |= shared_grams == len(grams)
+        else:
+            mask |= np.fromiter((name in other for other in self.names), dtype=bool, count=len(self.names))
+
+        counts = {}
+        for character in name:
+            counts[character] = counts.get(character, 0) + 1
+        columns = [self.character_columns[character] for character in counts if character in self.character_columns]
+        if columns:
+            query = np.asarray([counts[character] for character in counts if character in self.character_columns])
+            shared_characters = np.minimum(self.character_counts[:, columns], query).sum(axis=1)
+            mask |= 2.0 * shared_characters / (self.lengths + len(name)) > self.min_ratio
+
+        words = set(name.split())
+        shared_words = self._count(self.word_postings, words)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mask |= (shared_words > 0) & (shared_words / (self.word_counts + len(words) - shared_words) > self.min_overlap)
+
+        candidates = set(np.flatnonzero(mask).tolist())
+        candidates.update(name_id for name_id in self.short_names if self.names[name_id] in name)
+        if name in self.name_ids:
+            candidates.add(self.name_ids[name])
+        return candidates
+
+    def match_terms(self, ingredient: str, is_match: Callable[[str, str], bool]) -> Set[int]:
+        """Ids of every term ingredient matches under is_match"""
+        if not ingredient:
+            return set()
+        matched = set()
+        for name_id in self.candidate_names(ingredient):
+            term_ids = self.name_terms[name_id]
+            # Terms with the same normalized name all match or all don't
+            if is_match(ingredient, self.terms[term_ids[0]]):
+                matched.update(term_ids)
+        return matched
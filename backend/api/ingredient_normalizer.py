@@ -0,0 +1,72 @@
+"""
+Ingredient name normalizer shared by the recommender and the evaluation code.
+
+Quantity, unit, bracket and descriptor noise is stripped by precompiled
+patterns, then stop words and plural suffixes are handled from lookup tables.
+
+The output must stay exactly that of the original five re.sub passes: stored
+data is keyed on normalized names (see NORMALIZER_DIGEST). Each pass sees the
+text the previous one left, so one alternation can't reproduce them: "2fresh"
+only loses "fresh" once "2" is gone, "a(x)fresh" keeps "afresh", and
+"salt/2 cups" keeps "salt/". The passes therefore still run in order, but only
+on text that has something for the quantity or bracket passes to remove; the
+common bare name ("green chillies") takes the descriptor pattern alone.
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+
+UNITS = ('tsp', 'tbsp', 'cup', 'cups', 'gram', 'g', 'kg', 'ml', 'l', 'pinch', 'to taste', 'slice', 'slices')
+DESCRIPTORS = ('optional', 'fresh', 'dried', 'chopped', 'sliced', 'minced', 'grated', 'powdered')
+STOP_WORDS = frozenset({'of', 'and', 'or', 'the', 'a', 'an', 'for', 'in', 'with', 'as'})
+# Checked in order, first match wins
+PLURAL_SUFFIXES = ('es', 's')
+MIN_WORD_LENGTH = 3
+
+DESCRIPTOR_PATTERN = re.compile(r'\b(?:' + '|'.join(DESCRIPTORS) + r')\b')
+# Applied one after the other, in this order
+NOISE_PASSES = (
+    re.compile(r'\d+\s*(?:' + '|'.join(re.escape(unit) for unit in UNITS) + r')\s*'),
+    re.compile(r'\d+[/\d]*\s*'),
+    re.compile(r'[\d.,]+\s*'),
+    re.compile(r'\([^)]*\)'),
+    DESCRIPTOR_PATTERN,
+)
+# Text without any of these is left alone by every pass but the last
+QUANTITY_OR_BRACKET = re.compile(r'[\d.,(]')
+
+
+def _normalize(ingredient_text: str) -> str:
+    if not ingredient_text:
+        return ""
+
+    text = ingredient_text.lower().strip()
+    if QUANTITY_OR_BRACKET.search(text):
+        for pattern in NOISE_PASSES:
+            text = pattern.sub('', text)
+    else:
+        text = DESCRIPTOR_PATTERN.sub('', text)
+
+    words = []
+    for word in text.split():
+        if len(word) < MIN_WORD_LENGTH or word in STOP_WORDS:
+            continue
+        for suffix in PLURAL_SUFFIXES:
+            if word.endswith(suffix):
+                word = word[:-len(suffix)]
+                break
+        words.append(word)
+    return ' '.join(words)
+
+
+# Bump when _normalize's logic changes; changes to the tables above are picked up by NORMALIZER_DIGEST
+NORMALIZER_VERSION = 2
+# Identifies the normalization rules, for data keyed on normalized names (the neighbour table)
+NORMALIZER_DIGEST = hashlib.sha1(repr((
+    NORMALIZER_VERSION, UNITS, DESCRIPTORS, sorted(STOP_WORDS), PLURAL_SUFFIXES, MIN_WORD_LENGTH,
+    [pattern.pattern for pattern in NOISE_PASSES],
+)).encode()).hexdigest()[:16]
+
+# Ingredient vocabularies are small and the same names are normalized over and over
+normalize_ingredient_name = lru_cache(maxsize=65536)(_normalize)
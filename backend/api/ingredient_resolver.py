@@ -0,0 +1,176 @@
+"""
+Resolve free-text ingredient input to ingredients.ingredient_id.
+
+Every ingredient is reachable through a few hash keys: its lowercased name,
+its normalized name (which folds case, quantities, descriptors and regular
+plurals, so "Tomato (chopped)" and "tomatoes" land on "tomato"), the same with
+irregular plurals singularized ("curry leaves" -> "curry leaf"), and the
+Hindi/regional names in REGIONAL_ALIASES. Input that hits none of them is left
+to fuzzy matching.
+"""
+
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Regional name -> English names to resolve it through, first one the ingredients table has wins
+REGIONAL_ALIASES = {
+    'jeera': ('cumin seeds', 'cumin'),
+    'jeera powder': ('cumin powder', 'cumin'),
+    'haldi': ('turmeric powder', 'turmeric'),
+    'dhania': ('coriander leaves', 'coriander'),
+    'dhania powder': ('coriander powder', 'coriander'),
+    'hara dhania': ('coriander leaves', 'coriander'),
+    'adrak': ('ginger',),
+    'lehsun': ('garlic',),
+    'lahsun': ('garlic',),
+    'pyaz': ('onion',),
+    'pyaaz': ('onion',),
+    'kanda': ('onion',),
+    'aloo': ('potato',),
+    'tamatar': ('tomato',),
+    'mirch': ('chilli', 'green chilli'),
+    'hari mirch': ('green chilli',),
+    'lal mirch': ('red chilli powder', 'red chilli'),
+    'kali mirch': ('black pepper', 'pepper'),
+    'shimla mirch': ('capsicum', 'bell pepper'),
+    'palak': ('spinach',),
+    'methi': ('fenugreek leaves', 'fenugreek'),
+    'kasuri methi': ('dried fenugreek leaves', 'fenugreek leaves'),
+    'gobi': ('cauliflower',),
+    'phool gobi': ('cauliflower',),
+    'patta gobi': ('cabbage',),
+    'matar': ('green peas', 'peas'),
+    'gajar': ('carrot',),
+    'baingan': ('brinjal', 'eggplant'),
+    'bhindi': ('okra', 'lady finger'),
+    'kheera': ('cucumber',),
+    'lauki': ('bottle gourd',),
+    'karela': ('bitter gourd',),
+    'mooli': ('radish',),
+    'pudina': ('mint leaves', 'mint'),
+    'nimbu': ('lemon',),
+    'imli': ('tamarind',),
+    'gur': ('jaggery',),
+    'nariyal': ('coconut',),
+    'kaju': ('cashews', 'cashew'),
+    'badam': ('almonds', 'almond'),
+    'kishmish': ('raisins', 'raisin'),
+    'elaichi': ('cardamom',),
+    'laung': ('cloves', 'clove'),
+    'dalchini': ('cinnamon',),
+    'tej patta': ('bay leaf',),
+    'saunf': ('fennel seeds', 'fennel'),
+    'rai': ('mustard seeds',),
+    'sarson': ('mustard seeds', 'mustard'),
+    'ajwain': ('carom seeds', 'ajwain'),
+    'hing': ('asafoetida', 'hing'),
+    'kesar': ('saffron',),
+    'chawal': ('rice',),
+    'atta': ('wheat flour', 'whole wheat flour'),
+    'maida': ('all purpose flour', 'maida'),
+    'besan': ('gram flour', 'besan'),
+    'suji': ('semolina',),
+    'rava': ('semolina',),
+    'dahi': ('curd', 'yogurt'),
+    'doodh': ('milk',),
+    'makhan': ('butter',),
+    'malai': ('cream', 'fresh cream'),
+    'chana': ('chickpeas',),
+    'kabuli chana': ('chickpeas',),
+    'rajma': ('kidney beans', 'rajma'),
+    'toor dal': ('pigeon peas', 'toor dal'),
+    'murgh': ('chicken',),
+    'gosht': ('mutton',),
+    'anda': ('egg',),
+    'machli': ('fish',),
+    'jhinga': ('prawns', 'shrimp'),
+}
+
+# Plurals the normalizer's suffix stripping gets wrong ("leaves" -> "leav")
+IRREGULAR_PLURALS = {
+    'leaves': 'leaf', 'loaves': 'loaf', 'halves': 'half',
+    'berries': 'berry', 'cherries': 'cherry', 'strawberries': 'strawberry', 'blueberries': 'blueberry',
+    'anchovies': 'anchovy', 'chillies': 'chilli', 'chilies': 'chili',
+}
+
+
+def fetch_ingredients_fingerprint() -> Tuple:
+    """Changes when named ingredients are added or removed"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*), MAX(ingredient_id) FROM ingredients WHERE ingredient_name IS NOT NULL")
+        return tuple(cursor.fetchone())
+
+
+def fetch_ingredients() -> List[Tuple[int, str]]:
+    """(ingredient_id, ingredient_name) for every named ingredient"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT ingredient_id, ingredient_name FROM ingredients WHERE ingredient_name IS NOT NULL")
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+
+
+class IngredientResolver:
+    def __init__(self, ingredients: Iterable[Tuple[int, str]], normalize: Callable[[str], str],
+                 aliases: Dict[str, Tuple[str, ...]] = None):
+        self.normalize = normalize
+        self.names = {}
+        self.keys = {}
+        ingredients = sorted((ingredient_id, name) for ingredient_id, name in ingredients if name and name.strip())
+        for ingredient_id, name in ingredients:
+            self.names[ingredient_id] = name.strip()
+
+        # Exact names first, so another ingredient's normalized form never shadows one;
+        # among ingredients sharing a key the lowest id wins
+        for ingredient_id, name in ingredients:
+            self.keys.setdefault(name.strip().lower(), ingredient_id)
+        for ingredient_id, name in ingredients:
+            for key in self.fuzzy_keys(name):
+                self.keys.setdefault(key, ingredient_id)
+
+        added = 0
+        for alias, targets in (REGIONAL_ALIASES if aliases is None else aliases).items():
+            ingredient_id = next(
+                (resolved for resolved in map(self.resolve, targets) if resolved is not None), None
+            )
+            if ingredient_id is None:
+                continue
+            for key in (alias, *self.fuzzy_keys(alias)):
+                if key not in self.keys:
+                    self.keys[key] = ingredient_id
+                    added += 1
+
+        logger.info(f"Built ingredient resolver: {len(self.names)} ingredients, {len(self.keys)} keys ({added} from aliases)")
+
+    def __len__(self):
+        return len(self.names)
+
+    def fuzzy_keys(self, text: str) -> List[str]:
+        """Normalized form of text, and the same with irregular plurals singularized"""
+        normalized = self.normalize(text.lower())
+        words = text.lower().split()
+        singular = self.normalize(' '.join(IRREGULAR_PLURALS.get(word, word) for word in words))
+        return [key for key in dict.fromkeys((normalized, singular)) if key]
+
+    def resolve(self, text: str) -> Optional[int]:
+        """ingredient_id of free-text input, or None if no key matches"""
+        if not text:
+            return None
+        ingredient_id = self.keys.get(text.strip().lower())
+        if ingredient_id is not None:
+            return ingredient_id
+        for key in self.fuzzy_keys(text):
+            ingredient_id = self.keys.get(key)
+            if ingredient_id is not None:
+                return ingredient_id
+        return None
+
+    def name(self, ingredient_id: int) -> Optional[str]:
+        return self.names.get(ingredient_id)
+
+    def canonical_name(self, text: str) -> str:
+        """The ingredients-table name text resolves to, or text itself on a miss"""
+        ingredient_id = self.resolve(text)
+        return text if ingredient_id is None else self.names[ingredient_id].lower()
@@ -0,0 +1,191 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.ingredient_index import (
+    FuzzyTermIndex, IngredientIndex, RecipeIngredientBitsets, RecipeIngredientMatrix, mask_of,
+)
+from api.ml_model import RecipeMLModel
+import numpy as np
+import random
+import time
+
+BASES = [
+    'onion', 'tomato', 'potato', 'green chilli', 'ginger', 'garlic', 'turmeric powder', 'cumin seeds',
+    'garam masala', 'basmati rice', 'paneer', 'ghee', 'coriander leaves', 'red chilli powder', 'salt',
+    'mustard seeds', 'curry leaves', 'toor dal', 'cashew', 'cream', 'yogurt', 'besan', 'jaggery', 'spinach',
+    'cauliflower', 'green peas', 'carrot', 'okra', 'chickpeas', 'kidney beans', 'coconut', 'tamarind',
+    'cardamom', 'cinnamon', 'cloves', 'bay leaf', 'fennel seeds', 'semolina', 'wheat flour', 'milk',
+    'butter', 'chicken', 'mutton', 'egg', 'fish', 'prawns', 'lemon', 'mint leaves', 'capsicum', 'cabbage',
+]
+VARIETIES = [
+    '', 'red', 'green', 'white', 'black', 'baby', 'roasted', 'split', 'whole', 'desi', 'organic',
+    'kashmiri', 'malabar', 'bengal', 'sweet', 'sour', 'smoked', 'country', 'hill', 'coastal',
+]
+
+
+def build_vocabulary(size):
+    """Distinct catalog-style ingredient names, most common first"""
+    return [f'{variety} {base}'.strip() for variety in VARIETIES for base in BASES][:size]
+
+
+def build_recipes(count, vocabulary, per_recipe, seed=42):
+    """Recipes of about per_recipe distinct ingredients, drawn Zipf-like from the vocabulary"""
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+    lengths = rng.integers(max(per_recipe - 3, 1), per_recipe + 4, size=count)
+    draws = rng.choice(len(vocabulary), size=int(lengths.sum()), p=weights / weights.sum()).tolist()
+    recipes = []
+    start = 0
+    for length in lengths.tolist():
+        term_ids = dict.fromkeys(draws[start:start + length])
+        recipes.append({'ingredients': [vocabulary[term_id] for term_id in term_ids]})
+        start += length
+    return recipes
+
+
+class Command(BaseCommand):
+    help = 'Benchmark recipe matching on packed bitsets against the inverted index, sparse matrix and nested loops'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=str,
+            default='10000,100000,1000000',
+            help='Comma-separated catalog sizes to time (default: 10000,100000,1000000)'
+        )
+        parser.add_argument(
+            '--terms',
+            type=int,
+            default=1000,
+            help=f'Distinct ingredients in the synthetic catalog, at most {len(BASES) * len(VARIETIES)} (default: 1000)'
+        )
+        parser.add_argument(
+            '--per-recipe',
+            type=int,
+            default=8,
+            help='Average ingredients per recipe (default: 8)'
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=20,
+            help='Pantries to score per catalog size (default: 20)'
+        )
+        parser.add_argument(
+            '--loop-sample',
+            type=int,
+            default=1000,
+            help='Recipes the nested loops are timed on; their catalog time is extrapolated (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        if not sizes:
+            raise CommandError('No catalog sizes given')
+        model = RecipeMLModel()
+        vocabulary = build_vocabulary(options['terms'])
+        fuzzy_index = FuzzyTermIndex(
+            vocabulary, model.normalize_ingredient_name,
+            min_ratio=max(model.SPELLING_THRESHOLD, model.MATCH_THRESHOLD), min_overlap=model.MATCH_THRESHOLD
+        )
+
+        rng = random.Random(7)
+        pantries = [
+            rng.sample(vocabulary[:len(vocabulary) // 4 or 1], min(rng.randint(5, 10), len(vocabulary) // 4 or 1))
+            for _ in range(max(options['queries'], 1))
+        ]
+        pantry_terms = []
+        for pantry in pantries:
+            matched = set()
+            for user_ing in pantry:
+                matched |= fuzzy_index.match_terms(user_ing, model.ingredient_matches)
+            pantry_terms.append(matched)
+        min_matching, min_percentage = 2, 30.0
+
+        self.stdout.write(self.style.SUCCESS(
+            f'⏱  {len(vocabulary)} ingredients, ~{options["per_recipe"]} per recipe, {len(pantries)} pantries '
+            f'(~{sum(map(len, pantry_terms)) / len(pantry_terms):.0f} matched terms each)'
+        ))
+        for size in sizes:
+            self.benchmark(model, size, vocabulary, pantries, pantry_terms, min_matching, min_percentage, options)
+
+    def benchmark(self, model, size, vocabulary, pantries, pantry_terms, min_matching, min_percentage, options):
+        recipes = build_recipes(size, vocabulary, options['per_recipe'])
+        index = IngredientIndex(recipes, lambda recipe: recipe['ingredients'])
+        # Pantries were matched against the vocabulary; map them onto this catalog's term ids
+        queries = [
+            {index.term_ids[vocabulary[term_id]] for term_id in terms if vocabulary[term_id] in index.term_ids}
+            for terms in pantry_terms
+        ]
+
+        start = time.perf_counter()
+        matrix = RecipeIngredientMatrix(index)
+        matrix_build = time.perf_counter() - start
+        start = time.perf_counter()
+        bitsets = RecipeIngredientBitsets(index)
+        bitset_build = time.perf_counter() - start
+        start = time.perf_counter()
+        masks = [mask_of(term_ids) for term_ids in index.recipe_term_ids]
+        mask_build = time.perf_counter() - start
+        lengths = bitsets.lengths
+
+        def run_index(matched):
+            return [
+                (position, count) for position, count in index.candidates(matched, min_matching)
+                if count / lengths[position] * 100 > min_percentage
+            ]
+
+        def run_int_masks(matched):
+            pantry = mask_of(matched)
+            scored = []
+            for position, mask in enumerate(masks):
+                count = (mask & pantry).bit_count()
+                if count >= min_matching and count / lengths[position] * 100 > min_percentage:
+                    scored.append((position, count))
+            return scored
+
+        engines = [
+            ('inverted index', run_index, None),
+            ('sparse matrix', lambda matched: matrix.candidates(matched, min_matching, min_percentage),
+             matrix.matrix.data.nbytes + matrix.matrix.indices.nbytes + matrix.matrix.indptr.nbytes),
+            ('bitset columns', lambda matched: bitsets.candidates(matched, min_matching, min_percentage), bitsets.nbytes),
+            ('int AND + bit_count', run_int_masks, sum(mask.__sizeof__() for mask in masks)),
+        ]
+
+        self.stdout.write(self.style.SUCCESS(f'\n📊 {size:,} recipes ({len(index.terms)} terms used)'))
+        self.stdout.write(
+            f'   build: matrix {matrix_build * 1000:.0f} ms, bitsets {bitset_build * 1000:.0f} ms, '
+            f'int masks {mask_build * 1000:.0f} ms'
+        )
+
+        reference = None
+        mismatches = 0
+        baseline = None
+        for name, run, nbytes in engines:
+            start = time.perf_counter()
+            results = [run(matched) for matched in queries]
+            per_query = (time.perf_counter() - start) / len(queries)
+            if reference is None:
+                reference = results
+            else:
+                mismatches += sum(result != expected for result, expected in zip(results, reference))
+            baseline = baseline or per_query
+            memory = f'{nbytes / 1024 / 1024:8.1f} MB' if nbytes is not None else f'{"-":>11}'
+            self.stdout.write(
+                f'   {name:<22} {per_query * 1000:>10.2f} ms/query  {memory}  x{baseline / per_query:.1f}'
+            )
+
+        # Nested loops score every user/recipe pair, so time them on a sample and extrapolate
+        sample = recipes[:max(min(options['loop_sample'], size), 1)]
+        loop_queries = pantries[:3]
+        start = time.perf_counter()
+        for pantry in loop_queries:
+            for recipe in sample:
+                model.find_matching_ingredients_pairwise(pantry, recipe['ingredients'])
+        per_query = (time.perf_counter() - start) / len(loop_queries) * size / len(sample)
+        self.stdout.write(
+            f'   {"nested loops (est.)":<22} {per_query * 1000:>10.2f} ms/query  {"-":>11}  x{baseline / per_query:.2g}'
+        )
+
+        if mismatches:
+            self.stdout.write(self.style.WARNING(f'   ⚠  {mismatches} queries scored differently across engines'))
+        else:
+            self.stdout.write(self.style.SUCCESS('   ✅ Every engine returned the same recipes and counts'))
@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from api.ml_model import RecipeMLModel
+import numpy as np
+import os
+import time
+
+
+class Command(BaseCommand):
+    help = 'Benchmark training (feature building and forest fitting) on 1 to N cores'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cores',
+            type=str,
+            help='Comma-separated core counts to time (default: 1, 2, 4, ... up to all cores)'
+        )
+        parser.add_argument(
+            '--replicate',
+            type=int,
+            default=1,
+            help='Train on this many copies of the catalog, to time a larger one (default: 1)'
+        )
+        parser.add_argument(
+            '--min-parallel',
+            type=int,
+            default=0,
+            help='Recipes needed before features use a process pool (default: 0, always)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=1,
+            help='Runs per core count; the fastest is reported (default: 1)'
+        )
+
+    def handle(self, *args, **options):
+        model = RecipeMLModel()
+        snapshot = model.get_catalog()
+        recipes = model.trainable_recipes(snapshot.recipes)
+        recipes = [
+            {**recipe, 'title': f'{recipe["title"]} #{copy}' if copy else recipe['title']}
+            for copy in range(max(options['replicate'], 1))
+            for recipe in recipes
+        ]
+        hash_features = model.feature_hash_size()
+
+        if options['cores']:
+            cores = [int(count) for count in options['cores'].split(',') if count.strip()]
+        else:
+            cores = [1]
+            while cores[-1] * 2 < (os.cpu_count() or 1):
+                cores.append(cores[-1] * 2)
+            if (os.cpu_count() or 1) > 1:
+                cores.append(os.cpu_count())
+
+        self.stdout.write(self.style.SUCCESS(
+            f'⏱  Training on {len(recipes)} recipes, {os.cpu_count()} cores available'
+        ))
+        self.stdout.write(f'   {"cores":>6} {"features":>10} {"fit":>9} {"total":>9} {"speedup":>8}  same model')
+
+        baseline = None
+        for n_jobs in cores:
+            timings = []
+            for _ in range(max(options['repeat'], 1)):
+                timings.append(self.time_training(model, recipes, hash_features, n_jobs, options['min_parallel']))
+            feature_time, fit_time, X, probabilities = min(timings, key=lambda timing: timing[0] + timing[1])
+            total = feature_time + fit_time
+
+            if baseline is None:
+                baseline = (total, X, probabilities)
+            same = (X != baseline[1]).nnz == 0 and np.allclose(probabilities, baseline[2])
+            self.stdout.write(
+                f'   {n_jobs:>6} {feature_time:>9.3f}s {fit_time:>8.3f}s {total:>8.3f}s '
+                f'{baseline[0] / total:>7.2f}x  {"✅" if same else "❌"}'
+            )
+
+    def time_training(self, model, recipes, hash_features, n_jobs, min_parallel):
+        # Same steps and hyperparameters as RecipeMLModel.train
+        start = time.perf_counter()
+        X, y, _ = model.build_feature_matrix(recipes, hash_features, n_jobs, min_parallel=min_parallel)
+        feature_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        X_scaled = StandardScaler(with_mean=False).fit_transform(X)
+        forest = RandomForestClassifier(
+            n_estimators=100, max_depth=15, min_samples_split=3, min_samples_leaf=2, random_state=42, n_jobs=n_jobs
+        ).fit(X_scaled, y)
+        fit_time = time.perf_counter() - start
+
+        return feature_time, fit_time, X, forest.predict_proba(X_scaled[:50])
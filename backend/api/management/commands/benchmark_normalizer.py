@@ -0,0 +1,115 @@
+from django.core.management.base import BaseCommand
+from api.ingredient_normalizer import normalize_ingredient_name
+import random
+import re
+import time
+
+
+def legacy_normalize_ingredient_name(ingredient_text):
+    """The previous five-pass normalizer, kept here as the benchmark baseline"""
+    if not ingredient_text:
+        return ""
+    text = ingredient_text.lower().strip()
+    quantity_patterns = [
+        r'\d+\s*(tsp|tbsp|cup|cups|gram|g|kg|ml|l|pinch|to taste|slice|slices)\s*',
+        r'\d+[/\d]*\s*',
+        r'[\d.,]+\s*',
+        r'\([^)]*\)',
+        r'\b(optional|fresh|dried|chopped|sliced|minced|grated|powdered)\b'
+    ]
+    for pattern in quantity_patterns:
+        text = re.sub(pattern, '', text)
+    stop_words = {'of', 'and', 'or', 'the', 'a', 'an', 'for', 'in', 'with', 'as'}
+    words = [word for word in text.split() if word not in stop_words and len(word) > 2]
+    normalized_words = []
+    for word in words:
+        if word.endswith('es'):
+            word = word[:-2]
+        elif word.endswith('s'):
+            word = word[:-1]
+        normalized_words.append(word)
+    return ' '.join(normalized_words).strip()
+
+
+INGREDIENTS = [
+    'onion', 'tomato', 'potato', 'green chilli', 'ginger-garlic paste', 'turmeric powder', 'cumin seeds',
+    'garam masala', 'basmati rice', 'paneer', 'ghee', 'coriander leaves', 'red chili powder', 'salt',
+    'mustard seeds', 'curry leaves', 'toor dal', 'cashew', 'cream', 'yogurt', 'besan', 'jaggery',
+]
+QUANTITIES = ['', '1', '2', '1/2', '1 1/2', '0.5', '250', '3/4', '10']
+UNITS = ['', 'tsp', 'tbsp', 'cup', 'cups', 'g', 'grams', 'kg', 'ml', 'pinch', 'slices']
+DESCRIPTORS = ['', 'fresh', 'chopped', 'finely chopped', 'dried', 'grated', 'sliced']
+SUFFIXES = ['', ' (chopped)', ' (optional)', ', to taste', ' for garnish', ' as needed']
+
+
+def build_ingredient_lines(count, seed=42):
+    """Realistic free-text ingredient lines such as '1/2 cup finely chopped onions (optional)'"""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        quantity = rng.choice(QUANTITIES)
+        unit = rng.choice(UNITS) if quantity else ''
+        parts = [f'{quantity} {unit}'.strip(), rng.choice(DESCRIPTORS), rng.choice(INGREDIENTS)]
+        if rng.random() < 0.3:
+            parts[-1] += 's'
+        line = ' '.join(part for part in parts if part) + rng.choice(SUFFIXES)
+        lines.append(line.title() if rng.random() < 0.2 else line)
+    return lines
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark the compiled ingredient normalizer against the old five-pass version'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=200000,
+            help='Number of ingredient lines to normalize (default: 200000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Timing runs per variant; the best one is reported (default: 3)'
+        )
+
+    def _best_time(self, func, lines, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for line in lines:
+                func(line)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def handle(self, *args, **options):
+        lines = build_ingredient_lines(options['count'])
+        self.stdout.write(self.style.SUCCESS(
+            f'⏱  Normalizing {len(lines)} ingredient lines ({len(set(lines))} distinct), best of {options["repeat"]}'
+        ))
+
+        mismatches = sum(
+            1 for line in lines
+            if legacy_normalize_ingredient_name(line) != normalize_ingredient_name.__wrapped__(line)
+        )
+
+        normalize_ingredient_name.cache_clear()
+        variants = [
+            ('five-pass re.sub (old)', legacy_normalize_ingredient_name),
+            ('compiled passes', normalize_ingredient_name.__wrapped__),
+            ('compiled + cache (warm)', normalize_ingredient_name),
+        ]
+        baseline = None
+        for name, func in variants:
+            elapsed = self._best_time(func, lines, options['repeat'])
+            baseline = baseline or elapsed
+            self.stdout.write(
+                f'   {name:<24} {elapsed:8.3f}s  {len(lines) / elapsed:>12,.0f} lines/s  x{baseline / elapsed:.1f}'
+            )
+
+        if mismatches:
+            self.stdout.write(self.style.WARNING(f'   ⚠  {mismatches} lines normalize differently from the old version'))
+        else:
+            self.stdout.write(self.style.SUCCESS('   ✅ Output identical to the old normalizer on every line'))
@@ -0,0 +1,96 @@
+from django.core.management.base import BaseCommand
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from api.ml_model import RecipeMLModel
+from api.recipe_catalog import fetch_recipes_with_core_ingredients
+from scipy import sparse
+import time
+
+
+def legacy_feature_rows(model, recipes, run_catalog_query=True):
+    """The previous train loop: every row re-read the catalog and rebuilt the vocabulary.
+
+    Rows now come from the hashed prepare_features, so they can be compared with
+    build_feature_matrix; the per-row catalog read and vocabulary scan are kept for timing.
+    """
+    X = []
+    y = []
+    for recipe in recipes:
+        ingredients = model.recipe_match_ingredients(recipe)
+        if not ingredients:
+            continue
+        if run_catalog_query:
+            fetch_recipes_with_core_ingredients()
+        model.get_all_unique_ingredients(recipes)
+        X.append(model.prepare_features(
+            user_ingredients=ingredients,
+            cuisine_type=recipe.get('cuisine', 'indian'),
+            meal_type=recipe.get('meal_type', 'dinner'),
+            diet_type=recipe.get('diet_type', 'vegetarian'),
+            serving_size=recipe.get('serving_size', 4),
+            hash_features=model.feature_hash_size()
+        ))
+        y.append(recipe['title'])
+    return sparse.vstack(X, format='csr'), y
+
+
+class Command(BaseCommand):
+    help = 'Benchmark building the training matrix before and after fixing the vocabulary once'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=str,
+            default='50,100,200,400',
+            help='Comma-separated catalog sizes to time (default: 50,100,200,400)'
+        )
+        parser.add_argument(
+            '--skip-legacy-above',
+            type=int,
+            default=1000,
+            help='Only time the old quadratic loop up to this many recipes (default: 1000)'
+        )
+        parser.add_argument(
+            '--no-db',
+            action='store_true',
+            help='Leave the per-row catalog query out of the old loop'
+        )
+
+    def handle(self, *args, **options):
+        model = RecipeMLModel()
+        recipes = model.get_catalog().recipes
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+
+        self.stdout.write(self.style.SUCCESS(f'⏱  Feature building for train() on up to {len(recipes)} recipes'))
+        self.stdout.write(f'   {"recipes":>8} {"old":>10} {"new":>10} {"speedup":>8} {"fit":>8}  rows identical')
+
+        for size in sizes:
+            subset = recipes[:size]
+            if len(subset) < size:
+                self.stdout.write(self.style.WARNING(f'   Only {len(recipes)} recipes in the catalog, stopping at {size}'))
+                break
+
+            start = time.perf_counter()
+            X, y, _ = model.build_feature_matrix(subset, model.feature_hash_size())
+            new_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            X_scaled = StandardScaler(with_mean=False).fit_transform(X)
+            RandomForestClassifier(
+                n_estimators=100, max_depth=15, min_samples_split=3, min_samples_leaf=2, random_state=42
+            ).fit(X_scaled, y)
+            fit_time = time.perf_counter() - start
+
+            if size > options['skip_legacy_above']:
+                self.stdout.write(f'   {size:>8} {"-":>10} {new_time:>9.3f}s {"-":>8} {fit_time:>7.2f}s  -')
+                continue
+
+            start = time.perf_counter()
+            X_old, y_old = legacy_feature_rows(model, subset, run_catalog_query=not options['no_db'])
+            old_time = time.perf_counter() - start
+
+            identical = X_old.shape == X.shape and (X_old != X).nnz == 0 and y_old == y
+            self.stdout.write(
+                f'   {size:>8} {old_time:>9.3f}s {new_time:>9.3f}s {old_time / new_time:>7.1f}x {fit_time:>7.2f}s  '
+                f'{"✅" if identical else "❌"}'
+            )
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.ml_model import recipe_ml_model
+from api.recipe_catalog import fetch_recipes_from_match_table, fetch_recipes_with_core_ingredients, recipe_catalog
+from api.recipe_match_table import rebuild_match_table
+import time
+
+
+class Command(BaseCommand):
+    help = 'Rebuild recipe_match_table, the pre-normalized catalog read model, from the recipe tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Recipes refreshed per transaction (default: 5000)'
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Time loading the catalog with the join and from the table, and check they agree'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        start = time.perf_counter()
+        try:
+            written = rebuild_match_table(
+                recipe_ml_model.normalize_ingredient_name, recipe_ml_model.parse_instructions, options['batch_size']
+            )
+        except Exception as e:
+            raise CommandError(f'Rebuild failed (are the api migrations applied?): {e}')
+        recipe_catalog.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {written} recipes in recipe_match_table ({time.perf_counter() - start:.1f}s)'
+        ))
+
+        if options['compare']:
+            self.compare()
+
+    def compare(self):
+        start = time.perf_counter()
+        joined = fetch_recipes_with_core_ingredients()
+        join_time = time.perf_counter() - start
+        start = time.perf_counter()
+        flat = fetch_recipes_from_match_table()
+        flat_time = time.perf_counter() - start
+        self.stdout.write(f'   Join + GROUP_CONCAT  {join_time * 1000:>8.1f} ms  ({len(joined)} recipes)')
+        self.stdout.write(f'   Match table scan     {flat_time * 1000:>8.1f} ms  ({len(flat)} recipes)')
+
+        # GROUP_CONCAT order isn't defined, so compare ingredient sets
+        joined_by_id = {recipe['recipe_id']: recipe for recipe in joined}
+        differing = [
+            recipe['recipe_id'] for recipe in flat
+            if recipe['recipe_id'] not in joined_by_id
+            or set(recipe['core_ingredients']) != set(joined_by_id[recipe['recipe_id']]['core_ingredients'])
+        ]
+        missing = len(joined_by_id.keys() - {recipe['recipe_id'] for recipe in flat})
+        if differing or missing:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  {len(differing)} recipes differ, {missing} missing from the table'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('   ✅ Same recipes and core ingredients as the join'))
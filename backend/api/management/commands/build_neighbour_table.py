@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from api.ml_model import recipe_ml_model
+from api.model_store import save_neighbour_table
+from api.neighbour_table import build_neighbour_table
+import time
+
+
+class Command(BaseCommand):
+    help = 'Precompute every ingredient\'s matching neighbours and their scores into the neighbour table the recommender loads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Write the table to this .npz file instead of the artifact directory'
+        )
+        parser.add_argument(
+            '--show',
+            type=str,
+            help='Print the neighbours of this ingredient after building'
+        )
+
+    def handle(self, *args, **options):
+        model = recipe_ml_model
+        vocabulary = self.load_vocabulary(model)
+        if not vocabulary:
+            raise CommandError('No ingredients found')
+        self.stdout.write(f'⏳ Scoring {len(vocabulary)} ingredient names...')
+
+        start = time.perf_counter()
+        table = build_neighbour_table(
+            vocabulary, model.normalize_ingredient_name, model.ingredient_similarity_score,
+            threshold=model.MATCH_THRESHOLD, min_ratio=max(model.SPELLING_THRESHOLD, model.MATCH_THRESHOLD)
+        )
+        build_time = time.perf_counter() - start
+
+        path = save_neighbour_table(
+            table, {**model.neighbour_table_metadata(), 'built_at': time.time()}, options['output']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {table.n_names} names, {table.n_edges} neighbours '
+            f'({table.n_edges / max(table.n_names, 1):.1f} per name) in {build_time:.1f}s'
+        ))
+        self.stdout.write(f'   Saved {path} ({path.stat().st_size / 1024:.0f} KB)')
+
+        if options['show']:
+            name = model.normalize_ingredient_name(options['show'])
+            neighbours = table.neighbour_scores(name)
+            if not neighbours:
+                self.stdout.write(self.style.WARNING(f'⚠️  "{name}" is not in the table'))
+            for neighbour, score in neighbours:
+                self.stdout.write(f'   {score:.2f}  {neighbour}')
+
+    def load_vocabulary(self, model):
+        """Names in the ingredients table plus every ingredient the catalog's recipes use"""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT ingredient_name FROM ingredients WHERE ingredient_name IS NOT NULL")
+            names = [row[0].lower() for row in cursor.fetchall()]
+        names.extend(model.get_ingredient_index().terms)
+        return list(dict.fromkeys(name for name in names if name))
@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+from scipy import sparse
 import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.ensemble import RandomForestClassifier
@@ -15,8 +16,10 @@ from backend.api.ml_model import RecipeMLModel
 logger = logging.getLogger(__name__)
 
 class RecipeModelEvaluator:
-    def __init__(self, ml_model):
+    def __init__(self, ml_model, n_jobs=None):
         self.ml_model = ml_model
+        # Cores for fitting and cross-validation; defaults to ML_TRAINING_N_JOBS
+        self.n_jobs = n_jobs if n_jobs is not None else ml_model.training_n_jobs()
         self.y_true = []
         self.y_pred = []
         self.recipe_names = []
@@ -50,22 +53,22 @@ class RecipeModelEvaluator:
                     serving_size=recipe.get('serving_size', 4)
                 )
                 
-                X.append(list(features.values()))
+                X.append(features)
                 y_true.append(recipe['title'])
                 recipe_info.append({
                     'title': recipe['title'],
                     'ingredients': ingredients,
-                    'features': list(features.values())
+                    'features': features
                 })
             
             if len(set(y_true)) < 5:
                 logger.warning("Not enough recipe variety for evaluation.")
                 return False
             
-            self.X = np.array(X)
+            self.X = sparse.vstack(X, format='csr')
             self.y_true = y_true
             self.recipe_info = recipe_info
-            self.feature_columns = list(features.keys())
+            self.feature_columns = list(self.ml_model.context_features('', '', '', 0).keys())
             
             logger.info(f"Prepared evaluation data: {len(X)} samples, {len(set(y_true))} unique recipes")
             return True
@@ -92,7 +95,7 @@ class RecipeModelEvaluator:
             
             # Scale features
             from sklearn.preprocessing import StandardScaler
-            scaler = StandardScaler()
+            scaler = StandardScaler(with_mean=False)
             X_train_scaled = scaler.fit_transform(X_train)
             X_test_scaled = scaler.transform(X_test)
             
@@ -102,7 +105,8 @@ class RecipeModelEvaluator:
                 max_depth=10,
                 min_samples_split=2,
                 min_samples_leaf=1,
-                random_state=42
+                random_state=42,
+                n_jobs=self.n_jobs
             )
             
             model.fit(X_train_scaled, y_train)
@@ -215,7 +219,7 @@ class RecipeModelEvaluator:
             from sklearn.ensemble import RandomForestClassifier
             from sklearn.model_selection import cross_validate
             
-            scaler = StandardScaler()
+            scaler = StandardScaler(with_mean=False)
             X_scaled = scaler.fit_transform(self.X)
             
             model = RandomForestClassifier(
@@ -223,7 +227,8 @@ class RecipeModelEvaluator:
                 max_depth=10,
                 min_samples_split=2,
                 min_samples_leaf=1,
-                random_state=42
+                random_state=42,
+                n_jobs=self.n_jobs
             )
             
             # Define scoring metrics
@@ -427,9 +432,9 @@ class RecipeModelEvaluator:
 
 
 # Integration with your existing RecipeMLModel
-def evaluate_recipe_model(ml_model_instance):
+def evaluate_recipe_model(ml_model_instance, n_jobs=None):
     """Convenience function to evaluate your RecipeMLModel"""
-    evaluator = RecipeModelEvaluator(ml_model_instance)
+    evaluator = RecipeModelEvaluator(ml_model_instance, n_jobs=n_jobs)
     
     print("🧪 Starting ML Model Evaluation...")
     report = evaluator.generate_evaluation_report()
@@ -0,0 +1,112 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.compiled_forest import compile_forest, CompiledForest
+from api.ml_model import recipe_ml_model
+from api.model_store import fingerprint_tag, save_compiled_forest
+import io
+import joblib
+import numpy as np
+import time
+
+
+class Command(BaseCommand):
+    help = 'Export the trained forest to NumPy arrays (optionally pruned) and compare it with the sklearn model'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-depth',
+            type=int,
+            help='Prune every tree to this depth'
+        )
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            help='Keep only the K most likely recipes in each leaf'
+        )
+        parser.add_argument(
+            '--min-probability',
+            type=float,
+            default=0.0,
+            help='Drop leaf probabilities at or below this value (default: 0)'
+        )
+        parser.add_argument(
+            '--half-precision',
+            action='store_true',
+            help='Store leaf probabilities as float16 instead of float32'
+        )
+        parser.add_argument(
+            '--save',
+            action='store_true',
+            help='Write the export next to the current artifact, where workers load it from'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Write the export to this .npz file instead'
+        )
+
+    def handle(self, *args, **options):
+        if not recipe_ml_model.ensure_trained():
+            raise CommandError('No trained model: train one first')
+        bundle = recipe_ml_model.bundle
+        if bundle.X is None:
+            raise CommandError('The loaded model has no training rows to compare on; retrain it first')
+
+        compiled = compile_forest(
+            bundle.model, bundle.label_encoder, bundle.scaler,
+            max_depth=options['max_depth'], top_k=options['top_k'], min_probability=options['min_probability'],
+            probability_dtype=np.float16 if options['half_precision'] else np.float32
+        )
+
+        # Size and load time of each form, from memory so the disk cache doesn't skew it
+        buffer = io.BytesIO()
+        joblib.dump(bundle.model, buffer)
+        sklearn_bytes = buffer.getvalue()
+        start = time.perf_counter()
+        joblib.load(io.BytesIO(sklearn_bytes))
+        sklearn_load = time.perf_counter() - start
+
+        compiled_bytes = compiled.to_bytes()
+        start = time.perf_counter()
+        CompiledForest.load(io.BytesIO(compiled_bytes))
+        compiled_load = time.perf_counter() - start
+
+        X = bundle.X
+        start = time.perf_counter()
+        expected = bundle.model.predict_proba(bundle.scaler.transform(X))
+        sklearn_eval = time.perf_counter() - start
+        start = time.perf_counter()
+        actual = compiled.predict_proba(X)
+        compiled_eval = time.perf_counter() - start
+
+        n_sklearn_nodes = sum(estimator.tree_.node_count for estimator in bundle.model.estimators_)
+        self.stdout.write(self.style.SUCCESS(
+            f'🌲 {compiled.n_trees} trees, {compiled.n_classes} recipes, {compiled.n_features} features '
+            f'({len(compiled.used_features)} used by splits)'
+        ))
+        self.stdout.write(f'   {"":<10} {"nodes":>8} {"size KB":>9} {"load ms":>8} {"score ms":>9}  ({X.shape[0]} rows)')
+        self.stdout.write(
+            f'   {"sklearn":<10} {n_sklearn_nodes:>8} {len(sklearn_bytes) / 1024:>9.0f} '
+            f'{sklearn_load * 1000:>8.1f} {sklearn_eval * 1000:>9.1f}'
+        )
+        self.stdout.write(
+            f'   {"compiled":<10} {compiled.n_nodes:>8} {len(compiled_bytes) / 1024:>9.0f} '
+            f'{compiled_load * 1000:>8.1f} {compiled_eval * 1000:>9.1f}'
+        )
+        self.stdout.write(
+            f'   Top-1 agreement {np.mean(actual.argmax(axis=1) == expected.argmax(axis=1)) * 100:.1f}%, '
+            f'largest probability difference {np.abs(actual - expected).max():.4f}'
+        )
+
+        metadata = {
+            'catalog': fingerprint_tag((bundle.artifact_info or {}).get('catalog_fingerprint')),
+            'hash_features': bundle.hash_features,
+        }
+        if options['output']:
+            compiled.save(options['output'], metadata)
+            self.stdout.write(self.style.SUCCESS(f'✅ Saved {options["output"]}'))
+        elif options['save']:
+            artifact = (bundle.artifact_info or {}).get('path')
+            if not artifact:
+                raise CommandError('The model in memory has no artifact to save next to; use --output')
+            path = save_compiled_forest(compiled, artifact, metadata)
+            self.stdout.write(self.style.SUCCESS(f'✅ Saved {path}; workers use it the next time they load that artifact'))
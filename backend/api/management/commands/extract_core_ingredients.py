@@ -0,0 +1,116 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.core.management.base import BaseCommand, CommandError
+from api.ingredient_extractor import (
+    IngredientExtractor, extract_batch, extraction_patterns, fetch_recipes_without_core_ingredients,
+    init_extraction_worker, save_core_ingredients,
+)
+from api.ml_model import recipe_ml_model, recipes_changed
+import multiprocessing
+import os
+import time
+
+
+class Command(BaseCommand):
+    help = 'Backfill recipe_core_ingredients by scanning the ingredients text of every recipe that has none'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Extraction processes; 1 extracts in this process (default: all cores)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Recipes read, extracted and written per batch (default: 2000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Extract and report without writing any rows'
+        )
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=0,
+            help='Print what was extracted for the first N recipes (default: 0)'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        resolver = recipe_ml_model.get_ingredient_resolver()
+        if not len(resolver):
+            raise CommandError('No ingredients found')
+        patterns = extraction_patterns(resolver)
+        self.stdout.write(f'⏳ {len(patterns)} patterns over {len(resolver)} ingredients, {options["workers"]} worker(s)')
+
+        self.recipes = 0
+        self.rows = 0
+        self.empty = 0
+        self.shown = 0
+        self.options = options
+        start = time.perf_counter()
+        if options['workers'] > 1:
+            self.run_parallel(patterns, options)
+        else:
+            extractor = IngredientExtractor(patterns)
+            for batch in self.batches(options):
+                self.store([(recipe_id, extractor.extract(text)) for recipe_id, text in batch], resolver)
+        elapsed = time.perf_counter() - start
+
+        if self.rows and not options['dry_run']:
+            recipes_changed()
+        verb = 'Would write' if options['dry_run'] else 'Wrote'
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {verb} {self.rows} core ingredients for {self.recipes - self.empty} recipes in {elapsed:.1f}s '
+            f'({self.recipes / max(elapsed, 1e-9):,.0f} recipes/s)'
+        ))
+        if self.empty:
+            self.stdout.write(self.style.WARNING(f'⚠️  {self.empty} recipes mentioned no known ingredient'))
+
+    def batches(self, options):
+        """Keyset pagination over recipes without core ingredients.
+
+        Recipes that extract nothing keep having no rows, so paging is by recipe_id
+        rather than re-querying from the start.
+        """
+        after_id = 0
+        while True:
+            batch = fetch_recipes_without_core_ingredients(after_id, options['batch_size'])
+            if not batch:
+                return
+            after_id = batch[-1][0]
+            yield batch
+
+    def run_parallel(self, patterns, options):
+        """Workers extract while this process reads the next batches and writes finished ones"""
+        # spawn, not fork: the parent holds an open database connection
+        context = multiprocessing.get_context('spawn')
+        resolver = recipe_ml_model.get_ingredient_resolver()
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=context,
+                                 initializer=init_extraction_worker, initargs=(patterns,)) as pool:
+            pending = set()
+            for batch in self.batches(options):
+                pending.add(pool.submit(extract_batch, batch))
+                # Keep a couple of batches queued per worker, not the whole table
+                if len(pending) >= options['workers'] * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self.store(future.result(), resolver)
+            for future in pending:
+                self.store(future.result(), resolver)
+
+    def store(self, extracted, resolver):
+        self.recipes += len(extracted)
+        self.empty += sum(1 for _, ingredient_ids in extracted if not ingredient_ids)
+        if self.options['dry_run']:
+            self.rows += sum(len(ingredient_ids) for _, ingredient_ids in extracted)
+        else:
+            self.rows += save_core_ingredients(extracted)
+        for recipe_id, ingredient_ids in extracted[:max(self.options['show'] - self.shown, 0)]:
+            names = ', '.join(resolver.name(ingredient_id) for ingredient_id in ingredient_ids)
+            self.stdout.write(f'   #{recipe_id}: {names or "-"}')
+            self.shown += 1
@@ -0,0 +1,138 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import json
+import os
+import subprocess
+import sys
+
+# Modules that are expensive to import and that login/signup traffic never needs
+HEAVY_MODULES = ('numpy', 'scipy', 'pandas', 'sklearn', 'joblib', 'matplotlib', 'seaborn', 'pymysql')
+
+# What the recommender and the evaluation script used to import at module level
+EAGER_IMPORTS = (
+    'pandas', 'joblib', 'sklearn.ensemble', 'sklearn.preprocessing', 'sklearn.model_selection',
+    'matplotlib.pyplot', 'seaborn', 'pymysql',
+)
+
+# Run in a fresh interpreter under -X importtime; prints one JSON line on stdout
+CHILD = '''
+import importlib, json, sys, time
+start = time.perf_counter()
+for name in {eager!r}:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        pass
+if 'pymysql' in sys.modules:
+    sys.modules['pymysql'].install_as_MySQLdb()
+import backend.wsgi
+boot = time.perf_counter() - start
+
+from django.test import Client
+from api.process_memory import process_memory
+start = time.perf_counter()
+response = Client().get({path!r})
+first_request = time.perf_counter() - start
+
+print(json.dumps({{
+    'boot': boot,
+    'first_request': first_request,
+    'status': response.status_code,
+    'memory': process_memory(),
+    'loaded': [name for name in {heavy!r} if name in sys.modules],
+}}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Time Django boot and the first request in a fresh process, with an import-time breakdown (-X importtime)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            type=str,
+            default='/api/login/',
+            help='Request to time after boot (default: /api/login/)'
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Also run with the heavy modules imported and the model loaded at boot, as before lazy imports'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Slowest top-level imports to list (default: 10)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Fresh processes per scenario; the fastest is reported (default: 3)'
+        )
+
+    def handle(self, *args, **options):
+        scenarios = [('Lazy imports', False)]
+        if options['compare']:
+            scenarios.insert(0, ('Eager imports + model loaded at boot', True))
+
+        results = []
+        for title, eager in scenarios:
+            runs = [self.run_child(options['path'], eager) for _ in range(max(options['repeat'], 1))]
+            result = min(runs, key=lambda run: run['boot'] + run['first_request'])
+            self.print_report(title, result, options['top'])
+            results.append(result)
+
+        if len(results) == 2:
+            before, after = results
+            self.stdout.write(self.style.SUCCESS(
+                f'\n✅ Boot {before["boot"] * 1000:.0f} → {after["boot"] * 1000:.0f} ms, '
+                f'boot + first request {(before["boot"] + before["first_request"]) * 1000:.0f} → '
+                f'{(after["boot"] + after["first_request"]) * 1000:.0f} ms, '
+                f'RSS {self.rss(before):.1f} → {self.rss(after):.1f} MB'
+            ))
+
+    def run_child(self, path, eager):
+        env = {**os.environ, 'ML_LOAD_AT_BOOT': 'True' if eager else 'False'}
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+        code = CHILD.format(eager=EAGER_IMPORTS if eager else (), path=path, heavy=HEAVY_MODULES)
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        if process.returncode != 0:
+            raise CommandError(f'Child process failed:\n{process.stderr[-2000:]}')
+        try:
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            raise CommandError(f'Unexpected child output:\n{process.stdout[-2000:]}')
+        result['imports'] = self.parse_importtime(process.stderr)
+        return result
+
+    def parse_importtime(self, stderr):
+        """Cumulative microseconds of each top-level import from -X importtime output"""
+        imports = []
+        for line in stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|', 2)
+            # Nested imports are indented under the module that triggered them
+            if not name.startswith('  ') and name.strip():
+                imports.append((name.strip(), int(cumulative)))
+        return imports
+
+    def rss(self, result):
+        return (result['memory'] or {}).get('rss', 0) / 1024
+
+    def print_report(self, title, result, top):
+        total_imports = sum(cumulative for _, cumulative in result['imports'])
+        self.stdout.write(self.style.SUCCESS(f'\n📊 {title}'))
+        self.stdout.write(f'   Boot (settings, apps, wsgi)  {result["boot"] * 1000:>8.1f} ms')
+        self.stdout.write(f'   First request ({result["status"]})     {result["first_request"] * 1000:>8.1f} ms')
+        self.stdout.write(f'   Imports                      {total_imports / 1000:>8.1f} ms')
+        self.stdout.write(f'   RSS                          {self.rss(result):>8.1f} MB')
+        self.stdout.write(f'   Heavy modules loaded: {", ".join(result["loaded"]) or "none"}')
+        self.stdout.write(f'   {"cumulative ms":>14}  top-level import')
+        for name, cumulative in sorted(result['imports'], key=lambda item: -item[1])[:top]:
+            self.stdout.write(f'   {cumulative / 1000:>14.1f}  {name}')
@@ -48,7 +48,7 @@ class Command(BaseCommand):
                 self.stdout.write(
                     self.style.SUCCESS(f'   ✅ Model trained successfully in {training_time:.2f} seconds!')
                 )
-                self.stdout.write(f'   Features used: {len(recipe_ml_model.feature_columns)}')
+                self.stdout.write(f'   Features used: {recipe_ml_model.feature_count}')
             else:
                 self.stdout.write(
                     self.style.ERROR('   ❌ Model training failed!')
@@ -118,7 +118,7 @@ class Command(BaseCommand):
         # Test 4: Model information
         self.stdout.write('\n4. 📈 Model Information:')
         self.stdout.write(f'   Is trained: {recipe_ml_model.is_trained}')
-        self.stdout.write(f'   Feature count: {len(recipe_ml_model.feature_columns)}')
+        self.stdout.write(f'   Feature count: {recipe_ml_model.feature_count}')
         self.stdout.write(f'   Available recipes: {len(recipes)}')
         
         # Show sample features
@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.process_memory import process_memory, child_pids
+import os
+import signal
+import subprocess
+import sys
+import time
+
+
+class Command(BaseCommand):
+    help = 'Report resident memory per gunicorn worker, or compare workers with and without preloading'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pid',
+            type=int,
+            help='PID of a running gunicorn master to report on'
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Start gunicorn without and then with RECIPE_PRELOAD and report both'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Workers to start with --compare (default: 4)'
+        )
+        parser.add_argument(
+            '--bind',
+            type=str,
+            default='127.0.0.1:8765',
+            help='Address for the gunicorn started by --compare (default: 127.0.0.1:8765)'
+        )
+        parser.add_argument(
+            '--settle',
+            type=float,
+            default=3.0,
+            help='Seconds the workers must be idle before measuring (default: 3)'
+        )
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            before = self.run_gunicorn(preload=False, **options)
+            after = self.run_gunicorn(preload=True, **options)
+            self.print_report('Without preload (every worker builds its own)', before)
+            self.print_report('With preload + gc.freeze()', after)
+            saved = self.total(before, 'pss') - self.total(after, 'pss')
+            self.stdout.write(self.style.SUCCESS(
+                f'\n✅ Workers use {saved / 1024:.1f} MB less proportional memory (PSS) in total with preload'
+            ))
+        elif options['pid']:
+            self.print_report(f'Gunicorn master {options["pid"]}', self.measure(options['pid']))
+        else:
+            raise CommandError('Pass --pid <gunicorn master pid> or --compare')
+
+    def run_gunicorn(self, preload, workers, bind, settle, **options):
+        env = {**os.environ, 'RECIPE_PRELOAD': 'True' if preload else 'False'}
+        command = [
+            sys.executable, '-m', 'gunicorn', 'backend.wsgi', '-c', 'gunicorn.conf.py',
+            '--workers', str(workers), '--bind', bind
+        ]
+        self.stdout.write(f'⏳ Starting {workers} workers with RECIPE_PRELOAD={env["RECIPE_PRELOAD"]}...')
+        process = subprocess.Popen(
+            command, cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            # Wait until every worker exists and memory has stopped growing
+            deadline = time.time() + 300
+            last = None
+            stable_since = None
+            while time.time() < deadline:
+                if process.poll() is not None:
+                    raise CommandError(f'gunicorn exited with code {process.returncode}')
+                report = self.measure(process.pid)
+                total = self.total(report, 'rss')
+                if len(report) == workers + 1 and total == last:
+                    stable_since = stable_since or time.time()
+                    if time.time() - stable_since >= settle:
+                        return report
+                else:
+                    stable_since = None
+                last = total
+                time.sleep(0.5)
+            raise CommandError('Timed out waiting for the gunicorn workers to start')
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=30)
+
+    def measure(self, master_pid):
+        report = [('master', master_pid, process_memory(master_pid))]
+        report += [('worker', pid, process_memory(pid)) for pid in child_pids(master_pid)]
+        return [row for row in report if row[2]]
+
+    def total(self, report, field):
+        return sum(memory[field] for role, _, memory in report if role == 'worker')
+
+    def print_report(self, title, report):
+        self.stdout.write(self.style.SUCCESS(f'\n📊 {title}'))
+        self.stdout.write(f'   {"process":<8} {"pid":>8} {"rss MB":>9} {"pss MB":>9} {"shared MB":>10} {"private MB":>11}')
+        for role, pid, memory in report:
+            self.stdout.write(
+                f'   {role:<8} {pid:>8} {memory["rss"] / 1024:>9.1f} {memory["pss"] / 1024:>9.1f} '
+                f'{memory["shared"] / 1024:>10.1f} {memory["private"] / 1024:>11.1f}'
+            )
+        self.stdout.write(
+            f'   {"workers":<8} {"":>8} {self.total(report, "rss") / 1024:>9.1f} {self.total(report, "pss") / 1024:>9.1f} '
+            f'{self.total(report, "shared") / 1024:>10.1f} {self.total(report, "private") / 1024:>11.1f}'
+        )
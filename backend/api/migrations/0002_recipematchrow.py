@@ -0,0 +1,41 @@
+# Generated by Django 4.2.15 on 2026-10-18 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeMatchRow',
+            fields=[
+                ('recipe_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('cuisine', models.CharField(blank=True, max_length=100, null=True)),
+                ('difficulty', models.CharField(blank=True, max_length=50, null=True)),
+                ('cooking_time', models.IntegerField(blank=True, null=True)),
+                ('ingredients', models.TextField(blank=True, null=True)),
+                ('instructions', models.TextField(blank=True, null=True)),
+                ('image_url', models.CharField(blank=True, max_length=500, null=True)),
+                ('meal_type', models.CharField(blank=True, max_length=100, null=True)),
+                ('diet_type', models.CharField(blank=True, max_length=100, null=True)),
+                ('serving_size', models.IntegerField(blank=True, null=True)),
+                ('rating', models.FloatField(blank=True, null=True)),
+                ('core_ingredient_ids', models.TextField()),
+                ('core_ingredients', models.TextField()),
+                ('normalized_ingredients', models.TextField()),
+                ('importance_scores', models.TextField()),
+                ('ingredient_categories', models.TextField()),
+                ('instruction_steps', models.TextField()),
+                ('refreshed_at', models.FloatField()),
+            ],
+            options={
+                'db_table': 'recipe_match_table',
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.15 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_recipematchrow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeMatchTableState',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('started_at', models.FloatField()),
+                ('built_at', models.FloatField(blank=True, null=True)),
+                ('row_count', models.IntegerField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'recipe_match_table_state',
+            },
+        ),
+    ]
@@ -1,91 +1,147 @@
-import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.model_selection import train_test_split
-import joblib
+import hashlib
+import heapq
 import json
 import logging
 import re
-from django.db import connection
-from typing import List, Dict, Any, Tuple
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from django.conf import settings
+from django.db import connection, transaction
+from scipy import sparse
+from typing import List, Dict, Any, Tuple, NamedTuple, Optional
 from difflib import SequenceMatcher
 
+from .compiled_forest import compile_forest
+from .feature_hashing import hash_ingredient_lists
+from .ingredient_extractor import (
+    IngredientExtractor, delete_extracted_core_ingredients, extraction_patterns, fetch_recipes_without_core_ingredients,
+    save_core_ingredients,
+)
+from .ingredient_index import (
+    IngredientIndex, RecipeIngredientMatrix, RecipeIngredientBitsets, FuzzyTermIndex, WeightedIngredientIndex
+)
+from .ingredient_normalizer import NORMALIZER_DIGEST, normalize_ingredient_name
+from .ingredient_resolver import IngredientResolver, fetch_ingredients, fetch_ingredients_fingerprint
+from .model_store import (
+    save_artifact, load_latest_artifact, list_artifacts, save_compiled_forest, load_compiled_forest, load_neighbour_table,
+    fingerprint_tag, tree_surgery_verified,
+)
+from .neighbour_table import NEIGHBOUR_TABLE_FORMAT, NeighbourLookup
+from .recipe_catalog import recipe_catalog
+from .recipe_match_table import clear_match_table_state, match_table_state, rebuild_match_table, refresh_match_rows
+from .result_cache import RecommendationCache
+
 logger = logging.getLogger(__name__)
 
 
+class ModelBundle(NamedTuple):
+    """A trained model and everything needed to use it, published as one unit"""
+    model: Any
+    label_encoder: Any
+    scaler: Any
+    # Columns after the hashed ingredient columns
+    feature_columns: Tuple[str, ...]
+    hash_features: int
+    catalog_version: int
+    artifact_info: Optional[Dict[str, Any]]
+    # Training rows kept for incremental updates
+    recipe_ids: Tuple[int, ...] = ()
+    X: Any = None
+    y: Tuple[str, ...] = ()
+    signatures: Tuple[str, ...] = ()
+    full_trained_at: float = 0.0
+    incremental_updates: int = 0
+    # NumPy-only copy of the forest that serving scores with (see compiled_forest)
+    compiled: Any = None
+
+
 class RecipeMLModel:
+    # Two ingredients match when ingredient_similarity_score is above MATCH_THRESHOLD;
+    # spellings count as similar above SPELLING_THRESHOLD
+    MATCH_THRESHOLD = 0.7
+    SPELLING_THRESHOLD = 0.8
+    # Weight of a core ingredient whose importance_score is NULL, for weighted ranking
+    DEFAULT_IMPORTANCE = 1.0
+    
     def __init__(self):
-        self.model = None
-        self.label_encoders = {}
-        self.scaler = StandardScaler()
-        self.feature_columns = []
-        self.is_trained = False
-        self.all_recipes = []
+        # Replaced as a whole, never modified, so readers always see one consistent model
+        self.bundle = None
+        self.catalog = None
+        self.artifact_checked_at = 0.0
+        self.training_checked_at = 0.0
         self.ingredient_vocabulary = set()
         self.core_ingredients_cache = {}
+        self.scoring_engine = getattr(settings, 'RECIPE_SCORING_ENGINE', 'index')
+        self.result_cache = RecommendationCache()
+        self.ranking_mode = getattr(settings, 'ML_RANKING_MODE', 'match')
+        # (bundle, {title: predict_proba column}) for the bundle in use
+        self._class_columns = (None, {})
+        # Running estimate of predict_proba seconds per candidate row, for the rerank time budget
+        self._rerank_row_seconds = 0.0
+        # Single-flight: one rebuild or artifact load at a time, readers never wait
+        self._train_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        # Outcome of the last train or incremental update, for callers that waited on it
+        self._last_run_result = False
+        # Structures built from the ingredients table (resolver, extractor) and the table
+        # fingerprint they were built at; recipe writes don't touch them
+        self._ingredients_derived = {}
+        self._ingredients_fingerprint = None
+        self._ingredients_checked_at = 0.0
+        self._ingredients_lock = threading.RLock()
+    
+    @property
+    def is_trained(self):
+        return self.bundle is not None
+    
+    @property
+    def model(self):
+        return self.bundle.model if self.bundle else None
+    
+    @property
+    def label_encoders(self):
+        return {'recipe': self.bundle.label_encoder} if self.bundle else {}
+    
+    @property
+    def scaler(self):
+        return self.bundle.scaler if self.bundle else None
+    
+    @property
+    def feature_columns(self):
+        return list(self.bundle.feature_columns) if self.bundle else []
+    
+    @property
+    def feature_count(self):
+        return self.bundle.hash_features + len(self.bundle.feature_columns) if self.bundle else 0
+    
+    @property
+    def trained_catalog_version(self):
+        return self.bundle.catalog_version if self.bundle else 0
+    
+    @property
+    def artifact_info(self):
+        return self.bundle.artifact_info if self.bundle else None
+    
+    @property
+    def all_recipes(self):
+        return self.catalog.recipes if self.catalog else []
+    
+    @property
+    def catalog_version(self):
+        return self.catalog.version if self.catalog else 0
+    
+    def get_catalog(self):
+        """Return the shared catalog snapshot that predict, train and status read from"""
+        snapshot = recipe_catalog.get()
+        self.catalog = snapshot
+        return snapshot
     
     def fetch_recipes_with_core_ingredients(self):
-        """Fetch all recipes with their CORE ingredients from the new table"""
-        try:
-            with connection.cursor() as cursor:
-                query = """
-                SELECT 
-                    r.recipe_id, 
-                    r.title, 
-                    r.description,
-                    r.cuisine,
-                    r.difficulty,
-                    r.cooking_time,
-                    r.ingredients,
-                    r.instructions,
-                    r.image_url,
-                    r.meal_type,
-                    r.diet_type,
-                    r.serving_size,
-                    r.rating,
-                    GROUP_CONCAT(DISTINCT i.ingredient_name) as core_ingredients,
-                    GROUP_CONCAT(DISTINCT rci.category) as ingredient_categories,
-                    GROUP_CONCAT(DISTINCT rci.importance_score) as importance_scores
-                FROM recipes r
-                LEFT JOIN recipe_core_ingredients rci ON r.recipe_id = rci.recipe_id
-                LEFT JOIN ingredients i ON rci.ingredient_id = i.ingredient_id
-                WHERE rci.is_essential = 1
-                GROUP BY r.recipe_id
-                HAVING core_ingredients IS NOT NULL
-                """
-                cursor.execute(query)
-                recipes = cursor.fetchall()
-                
-                recipe_list = []
-                for recipe in recipes:
-                    recipe_dict = {
-                        'recipe_id': recipe[0],
-                        'title': recipe[1],
-                        'description': recipe[2] or '',
-                        'cuisine': recipe[3] or 'Indian',
-                        'difficulty': recipe[4] or 'Medium',
-                        'cooking_time': recipe[5] or 30,
-                        'ingredients': recipe[6],
-                        'instructions': recipe[7],
-                        'image_url': recipe[8],
-                        'meal_type': recipe[9] or 'Dinner',
-                        'diet_type': recipe[10] or 'Vegetarian',
-                        'serving_size': recipe[11] or 4,
-                        'rating': float(recipe[12]) if recipe[12] else 4.5,
-                        'core_ingredients': recipe[13].split(',') if recipe[13] else [],
-                        'ingredient_categories': recipe[14].split(',') if recipe[14] else [],
-                        'importance_scores': [float(x) for x in recipe[15].split(',')] if recipe[15] else []
-                    }
-                    recipe_list.append(recipe_dict)
-                
-                logger.info(f"Fetched {len(recipe_list)} recipes with core ingredients")
-                self.all_recipes = recipe_list
-                return recipe_list
-                
-        except Exception as e:
-            logger.error(f"Error fetching recipes with core ingredients: {e}")
-            return []
+        """Fetch all recipes with their CORE ingredients from the catalog snapshot"""
+        return self.get_catalog().recipes
     
     def fetch_recipes_from_db(self):
         """Fetch all recipes with ingredients - USING CORE INGREDIENTS"""
@@ -118,38 +174,7 @@ class RecipeMLModel:
     
     def normalize_ingredient_name(self, ingredient_text: str) -> str:
         """Normalize ingredient names for better matching"""
-        if not ingredient_text:
-            return ""
-        
-        # Convert to lowercase
-        text = ingredient_text.lower().strip()
-        
-        # Remove quantities and measurements
-        quantity_patterns = [
-            r'\d+\s*(tsp|tbsp|cup|cups|gram|g|kg|ml|l|pinch|to taste|slice|slices)\s*',
-            r'\d+[/\d]*\s*',
-            r'[\d.,]+\s*',
-            r'\([^)]*\)',
-            r'\b(optional|fresh|dried|chopped|sliced|minced|grated|powdered)\b'
-        ]
-        
-        for pattern in quantity_patterns:
-            text = re.sub(pattern, '', text)
-        
-        # Remove extra spaces and common stop words
-        stop_words = {'of', 'and', 'or', 'the', 'a', 'an', 'for', 'in', 'with', 'as'}
-        words = [word for word in text.split() if word not in stop_words and len(word) > 2]
-        
-        # Remove plural forms (basic)
-        normalized_words = []
-        for word in words:
-            if word.endswith('es'):
-                word = word[:-2]
-            elif word.endswith('s'):
-                word = word[:-1]
-            normalized_words.append(word)
-        
-        return ' '.join(normalized_words).strip()
+        return normalize_ingredient_name(ingredient_text)
     
     def parse_ingredients(self, ingredients_str, structured_ingredients=None):
         """Parse ingredients - NOW USING CORE INGREDIENTS"""
@@ -210,7 +235,7 @@ class RecipeMLModel:
         
         # SequenceMatcher for similar spellings
         similarity = self.string_similarity(ing1_clean, ing2_clean)
-        if similarity > 0.8:
+        if similarity > self.SPELLING_THRESHOLD:
             return similarity
         
         # Word overlap
@@ -226,8 +251,35 @@ class RecipeMLModel:
         
         return 0.0
     
+    def ingredient_matches(self, user_ing: str, recipe_ing: str) -> bool:
+        """Same per-pair test as find_matching_ingredients_pairwise, for one lowercased pair"""
+        if self.ingredient_similarity_score(user_ing, recipe_ing) > self.MATCH_THRESHOLD:
+            return True
+        recipe_normalized = self.normalize_ingredient_name(recipe_ing)
+        user_normalized = self.normalize_ingredient_name(user_ing)
+        if recipe_normalized and user_normalized:
+            return (recipe_normalized in user_normalized or
+                    user_normalized in recipe_normalized)
+        return False
+    
     def find_matching_ingredients(self, user_ingredients: List[str], recipe_ingredients: List[str]) -> Tuple[int, List[str]]:
-        """Find matching ingredients between user and recipe with similarity threshold"""
+        """Find matching ingredients between user and recipe with similarity threshold.
+        
+        Plain lists in and out, with no catalog access, so it works without a
+        database. predict matches on the catalog's ingredient terms instead (see
+        pantry_check); both agree with find_matching_ingredients_pairwise.
+        """
+        user_ingredients_lower = [ing.lower() for ing in user_ingredients]
+        matching_ingredients = []
+        for recipe_ing in recipe_ingredients:
+            recipe_ing = recipe_ing.lower()
+            if any(self.ingredient_matches(user_ing, recipe_ing) for user_ing in user_ingredients_lower):
+                matching_ingredients.append(recipe_ing)
+        return len(matching_ingredients), matching_ingredients
+    
+    def find_matching_ingredients_pairwise(self, user_ingredients: List[str],
+                                           recipe_ingredients: List[str]) -> Tuple[int, List[str]]:
+        """Reference version of find_matching_ingredients: every user/recipe pair is scored"""
         user_ingredients_lower = [ing.lower() for ing in user_ingredients]
         recipe_ingredients_lower = [ing.lower() for ing in recipe_ingredients]
         
@@ -238,7 +290,7 @@ class RecipeMLModel:
             matched = False
             for user_ing in user_ingredients_lower:
                 similarity = self.ingredient_similarity_score(user_ing, recipe_ing)
-                if similarity > 0.7:  # Similarity threshold
+                if similarity > self.MATCH_THRESHOLD:
                     matching_count += 1
                     matching_ingredients.append(recipe_ing)
                     matched = True
@@ -260,6 +312,142 @@ class RecipeMLModel:
         
         return matching_count, matching_ingredients
     
+    def recipe_match_ingredients(self, recipe):
+        """Ingredients a recipe is matched on: core ingredients, else parsed ones"""
+        recipe_ingredients = recipe.get('core_ingredients', [])
+        if not recipe_ingredients:
+            recipe_ingredients = self.parse_ingredients(
+                recipe['ingredients'],
+                recipe.get('structured_ingredients')
+            )
+        return recipe_ingredients
+    
+    def get_ingredient_index(self, snapshot=None):
+        """Inverted ingredient index for a catalog snapshot, built once per version"""
+        snapshot = snapshot or self.get_catalog()
+        return snapshot.derived(
+            'ingredient_index',
+            lambda snap: IngredientIndex(snap.recipes, self.recipe_match_ingredients)
+        )
+    
+    def get_fuzzy_index(self, snapshot=None):
+        """Fuzzy lookup over the ingredient index's terms, built once per version"""
+        snapshot = snapshot or self.get_catalog()
+        return snapshot.derived(
+            'fuzzy_index',
+            lambda snap: FuzzyTermIndex(
+                self.get_ingredient_index(snap).terms, self.normalize_ingredient_name,
+                # A spelling match only counts above both cut-offs; word overlap only above MATCH_THRESHOLD
+                min_ratio=max(self.SPELLING_THRESHOLD, self.MATCH_THRESHOLD), min_overlap=self.MATCH_THRESHOLD
+            )
+        )
+    
+    def neighbour_table_metadata(self) -> Dict[str, Any]:
+        """What a neighbour table must have been built with to be used by this model"""
+        return {
+            'format': NEIGHBOUR_TABLE_FORMAT,
+            'match_threshold': self.MATCH_THRESHOLD,
+            'spelling_threshold': self.SPELLING_THRESHOLD,
+            # Rows are keyed and scored on normalized names
+            'normalizer': NORMALIZER_DIGEST,
+        }
+    
+    def get_neighbour_lookup(self, snapshot=None):
+        """The precomputed neighbour table (ML_NEIGHBOUR_TABLE), mapped onto a snapshot's
+        terms; loaded from disk once per version, so a rebuilt table is picked up with the catalog"""
+        snapshot = snapshot or self.get_catalog()
+        return snapshot.derived('neighbour_lookup', self._load_neighbour_lookup)
+    
+    def _load_neighbour_lookup(self, snapshot):
+        table = None
+        loaded = load_neighbour_table() if getattr(settings, 'ML_NEIGHBOUR_TABLE', True) else None
+        if loaded is not None:
+            table, metadata = loaded
+            expected = self.neighbour_table_metadata()
+            if any(metadata.get(key) != value for key, value in expected.items()):
+                logger.warning("Ignoring neighbour table built with different matching or normalization rules; rebuild it")
+                table = None
+        return NeighbourLookup(table, self.get_fuzzy_index(snapshot))
+    
+    def ingredients_derived(self, key: str, build):
+        """A structure built from the ingredients table, kept until the table's fingerprint moves.
+        
+        The fingerprint is checked at most every RECIPE_CATALOG_TTL seconds.
+        """
+        due = time.time() - self._ingredients_checked_at > getattr(settings, 'RECIPE_CATALOG_TTL', 60)
+        value = self._ingredients_derived.get(key)
+        if value is not None and not due:
+            return value
+        with self._ingredients_lock:
+            if time.time() - self._ingredients_checked_at > getattr(settings, 'RECIPE_CATALOG_TTL', 60):
+                self._ingredients_checked_at = time.time()
+                try:
+                    fingerprint = fetch_ingredients_fingerprint()
+                except Exception as e:
+                    logger.error(f"Error checking the ingredients table fingerprint: {e}")
+                    fingerprint = self._ingredients_fingerprint
+                if fingerprint != self._ingredients_fingerprint:
+                    self._ingredients_fingerprint = fingerprint
+                    self._ingredients_derived = {}
+            value = self._ingredients_derived.get(key)
+            if value is None:
+                value = self._ingredients_derived[key] = build()
+            return value
+    
+    def get_ingredient_resolver(self, snapshot=None):
+        """Alias-aware lookup from free text to ingredients.ingredient_id (see ingredients_derived)"""
+        return self.ingredients_derived('ingredient_resolver', self._load_ingredient_resolver)
+    
+    def _load_ingredient_resolver(self):
+        try:
+            ingredients = fetch_ingredients()
+        except Exception as e:
+            # Without it every user ingredient goes through fuzzy matching; retry at the next check
+            logger.error(f"Error loading ingredients for the resolver: {e}")
+            ingredients = []
+            self._ingredients_fingerprint = None
+        return IngredientResolver(ingredients, self.normalize_ingredient_name)
+    
+    def resolve_user_ingredients(self, snapshot, user_ingredients: List[str]) -> List[str]:
+        """Lowercased user ingredients, each one the resolver knows replaced by its
+        ingredients-table name ("jeera" -> "cumin seeds"). Everything else is kept as typed."""
+        resolver = self.get_ingredient_resolver(snapshot)
+        return [resolver.canonical_name(ing.lower()) for ing in user_ingredients]
+
+    def get_ingredient_extractor(self, snapshot=None):
+        """Aho-Corasick extractor over the resolver's ingredients and aliases (see ingredients_derived)"""
+        return self.ingredients_derived(
+            'ingredient_extractor',
+            lambda: IngredientExtractor(extraction_patterns(self.get_ingredient_resolver()))
+        )
+
+    def extract_core_ingredients(self, recipe_ids: List[int]) -> int:
+        """Store core ingredients extracted from the ingredients text of recipes that have none.
+
+        Called when recipes are ingested; returns the number of rows written.
+        """
+        rows = fetch_recipes_without_core_ingredients(recipe_ids=recipe_ids, limit=max(len(recipe_ids), 1))
+        if not rows:
+            return 0
+        extractor = self.get_ingredient_extractor()
+        written = save_core_ingredients([(recipe_id, extractor.extract(text)) for recipe_id, text in rows])
+        logger.info(f"Extracted {written} core ingredients for {len(rows)} recipes")
+        return written
+
+    def reextract_core_ingredients(self, recipe_ids: List[int]) -> int:
+        """Replace the extracted core ingredients of edited recipes; curated ones are left alone"""
+        # Build the extractor first so a failure doesn't leave the recipes without rows
+        self.get_ingredient_extractor()
+        with transaction.atomic():
+            delete_extracted_core_ingredients(recipe_ids)
+            return self.extract_core_ingredients(recipe_ids)
+
+    def refresh_match_table(self, recipe_ids: List[int] = None) -> int:
+        """Rebuild the recipe_match_table rows of these recipes (all of them for None)"""
+        if recipe_ids is None:
+            return rebuild_match_table(self.normalize_ingredient_name, self.parse_instructions)
+        return refresh_match_rows(recipe_ids, self.normalize_ingredient_name, self.parse_instructions)
+
     def get_all_unique_ingredients(self, recipes):
         """Extract all unique CORE ingredients from recipes"""
         all_ingredients = set()
@@ -277,26 +465,14 @@ class RecipeMLModel:
                 all_ingredients.update(ingredients)
         return list(all_ingredients)
     
-    def prepare_features(self, user_ingredients: List[str], cuisine_type: str, 
-                        meal_type: str, diet_type: str, serving_size: int):
-        """Prepare feature vector for ML model using CORE ingredients"""
+    def feature_hash_size(self) -> int:
+        """Width of the hashed ingredient feature block (ML_FEATURE_HASH_SIZE)"""
+        return getattr(settings, 'ML_FEATURE_HASH_SIZE', 2 ** 14)
+    
+    def context_features(self, cuisine_type: str, meal_type: str, diet_type: str, serving_size: int) -> Dict[str, float]:
+        """Cuisine, meal, diet and serving features shared by every feature row"""
         features = {}
         
-        # Get recipes and all core ingredients
-        recipes = self.fetch_recipes_from_db()
-        all_ingredients = self.get_all_unique_ingredients(recipes)
-        
-        # Binary features for core ingredients (top 50 most common)
-        user_ingredients_lower = [ing.lower() for ing in user_ingredients]
-        for ingredient in all_ingredients[:50]:  # Increased to 50 for better coverage
-            feature_name = f'ing_{ingredient.replace(" ", "_").replace("-", "_")[:20]}'
-            # Improved matching with similarity score
-            has_ingredient = any(
-                self.ingredient_similarity_score(user_ing, ingredient) > 0.7
-                for user_ing in user_ingredients_lower
-            )
-            features[feature_name] = 1 if has_ingredient else 0
-        
         # Cuisine type features
         cuisines = ['north indian', 'south indian', 'maharashtrian', 'gujarati', 'punjabi', 'bengali', 'hyderabadi']
         for cuisine in cuisines:
@@ -323,160 +499,940 @@ class RecipeMLModel:
         else:
             features['prep_time_preference'] = 0.8
         
-        self.feature_columns = list(features.keys())
         return features
     
-    def train(self):
-        """Train the Random Forest model using CORE ingredients"""
+    def prepare_features(self, user_ingredients: List[str], cuisine_type: str, 
+                        meal_type: str, diet_type: str, serving_size: int, hash_features: int = None):
+        """Prepare feature vector for ML model using CORE ingredients
+        
+        Returns a 1-row sparse matrix: the hashed ingredient columns followed by
+        the context columns, laid out like the rows of build_feature_matrix.
+        """
+        if hash_features is None:
+            # A trained (or loaded) model must see the width it was fitted on
+            bundle = self.bundle
+            hash_features = bundle.hash_features if bundle else self.feature_hash_size()
+        
+        context = self.context_features(cuisine_type, meal_type, diet_type, serving_size)
+        return sparse.hstack([
+            hash_ingredient_lists([user_ingredients], hash_features),
+            sparse.csr_matrix([list(context.values())], dtype=np.float64)
+        ], format='csr')
+    
+    def trainable_recipes(self, recipes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Recipes that produce a training row (the ones with ingredients to match on)"""
+        return [recipe for recipe in recipes if self.recipe_match_ingredients(recipe)]
+    
+    def recipe_signature(self, recipe: Dict[str, Any]) -> str:
+        """Stable digest of everything a recipe's training row and label are built from"""
+        fields = [
+            recipe['title'],
+            [ingredient.lower() for ingredient in self.recipe_match_ingredients(recipe)],
+            recipe.get('cuisine'), recipe.get('meal_type'), recipe.get('diet_type'), recipe.get('serving_size'),
+        ]
+        # Not hash(): signatures are saved in artifacts and compared in other processes
+        return hashlib.md5(json.dumps(fields, default=str).encode()).hexdigest()
+    
+    def training_n_jobs(self) -> int:
+        """Cores to train on, from ML_TRAINING_N_JOBS (-1 means all of them)"""
+        from joblib import effective_n_jobs
+        return effective_n_jobs(getattr(settings, 'ML_TRAINING_N_JOBS', -1))
+    
+    def hash_ingredient_features(self, ingredient_lists: List[List[str]], hash_features: int,
+                                 n_jobs: int = None, min_parallel: int = None):
+        """Hashed ingredient block for many rows, as a sparse matrix.
+        
+        With more than one job and at least min_parallel rows (ML_PARALLEL_FEATURES_MIN)
+        the rows are split across a process pool; below that, starting the pool
+        costs more than it saves.
+        """
+        from joblib import effective_n_jobs
+        n_jobs = self.training_n_jobs() if n_jobs is None else effective_n_jobs(n_jobs)
+        if min_parallel is None:
+            min_parallel = getattr(settings, 'ML_PARALLEL_FEATURES_MIN', 50000)
+        
+        if n_jobs > 1 and len(ingredient_lists) >= max(min_parallel, 2):
+            n_workers = min(n_jobs, len(ingredient_lists))
+            chunk_size = -(-len(ingredient_lists) // n_workers)
+            chunks = [ingredient_lists[start:start + chunk_size] for start in range(0, len(ingredient_lists), chunk_size)]
+            try:
+                # spawn, not fork: this can run inside a threaded web worker
+                with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                    return sparse.vstack(list(pool.map(hash_ingredient_lists, chunks, [hash_features] * len(chunks))), format='csr')
+            except Exception as e:
+                logger.error(f"Parallel feature building failed, continuing in this process: {e}")
+        
+        return hash_ingredient_lists(ingredient_lists, hash_features)
+    
+    def build_feature_matrix(self, recipes: List[Dict[str, Any]], hash_features: int, n_jobs: int = None,
+                             min_parallel: int = None):
+        """Build the sparse training matrix for many recipes.
+        
+        Returns (X, y, feature_columns): X has hash_features hashed ingredient
+        columns followed by the context columns named in feature_columns. Each
+        row equals prepare_features for that recipe.
+        """
+        ingredient_lists = []
+        context_rows = []
+        y = []
+        context_columns = None
+        for recipe in recipes:
+            ingredients = self.recipe_match_ingredients(recipe)
+            if not ingredients:
+                continue
+            
+            context = self.context_features(
+                cuisine_type=recipe.get('cuisine', 'indian'),
+                meal_type=recipe.get('meal_type', 'dinner'),
+                diet_type=recipe.get('diet_type', 'vegetarian'),
+                serving_size=recipe.get('serving_size', 4)
+            )
+            if context_columns is None:
+                context_columns = list(context.keys())
+            
+            ingredient_lists.append(ingredients)
+            context_rows.append(list(context.values()))
+            y.append(recipe['title'])
+        
+        context_columns = context_columns or list(self.context_features('', '', '', 0).keys())
+        X = sparse.hstack([
+            self.hash_ingredient_features(ingredient_lists, hash_features, n_jobs, min_parallel),
+            sparse.csr_matrix(np.array(context_rows, dtype=np.float64).reshape(len(context_rows), len(context_columns)))
+        ], format='csr')
+        return X, y, context_columns
+    
+    def train(self, progress=None, persist: bool = None):
+        """Train the Random Forest model using CORE ingredients
+        
+        progress, if given, is called as progress(phase, fraction) between steps.
+        Concurrent callers don't start their own run: they wait for the one in
+        progress and share its result, while predict keeps using the old model.
+        """
+        return self._run_exclusive(lambda: self._train(progress or (lambda phase, fraction: None), persist))
+    
+    def _run_exclusive(self, run):
+        """Run under _train_lock. A caller that finds a run in progress waits for it
+        and returns that run's result, not whether some older model exists."""
+        if not self._train_lock.acquire(blocking=False):
+            logger.info("Training already in progress; waiting for it")
+            with self._train_lock:
+                return self._last_run_result
         try:
-            recipes = self.fetch_recipes_from_db()
+            self._last_run_result = False
+            self._last_run_result = run()
+            return self._last_run_result
+        finally:
+            self._train_lock.release()
+    
+    def _train(self, progress, persist):
+        try:
+            progress('loading_catalog', 0.0)
+            snapshot = self.get_catalog()
+            recipes = self.trainable_recipes(snapshot.recipes)
             
             if len(recipes) < 3:
                 logger.warning("Not enough recipes to train model. Need at least 3 recipes.")
                 return False
             
-            X = []
-            y = []
-            
-            for recipe in recipes:
-                # Use core ingredients as primary source
-                ingredients = recipe.get('core_ingredients', [])
-                if not ingredients:
-                    # Fallback to parsed ingredients
-                    ingredients = self.parse_ingredients(
-                        recipe['ingredients'], 
-                        recipe.get('structured_ingredients')
-                    )
-                
-                if not ingredients:
-                    continue
-                    
-                features = self.prepare_features(
-                    user_ingredients=ingredients,
-                    cuisine_type=recipe.get('cuisine', 'indian'),
-                    meal_type=recipe.get('meal_type', 'dinner'),
-                    diet_type=recipe.get('diet_type', 'vegetarian'),
-                    serving_size=recipe.get('serving_size', 4)
-                )
-                
-                X.append(list(features.values()))
-                y.append(recipe['title'])
+            # One catalog read and one fixed-width feature space for the whole training set
+            progress('building_features', 0.1)
+            n_jobs = self.training_n_jobs()
+            hash_features = self.feature_hash_size()
+            X, y, feature_columns = self.build_feature_matrix(recipes, hash_features, n_jobs)
             
             if len(set(y)) < 2:
                 logger.warning("Not enough recipe variety for training.")
                 return False
             
+            # sklearn is only imported by processes that train
+            from sklearn.ensemble import RandomForestClassifier
+            from sklearn.model_selection import train_test_split
+            from sklearn.preprocessing import LabelEncoder, StandardScaler
+            
             # Encode labels
-            self.label_encoders['recipe'] = LabelEncoder()
-            y_encoded = self.label_encoders['recipe'].fit_transform(y)
+            progress('fitting', 0.3)
+            label_encoder = LabelEncoder()
+            y_encoded = label_encoder.fit_transform(y)
             
             # Split and train
             X_train, X_test, y_train, y_test = train_test_split(
                 X, y_encoded, test_size=0.2, random_state=42
             )
             
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
+            # Sparse rows: scale without centring, which would make them dense
+            scaler = StandardScaler(with_mean=False)
+            X_train_scaled = scaler.fit_transform(X_train)
+            X_test_scaled = scaler.transform(X_test)
             
-            self.model = RandomForestClassifier(
+            model = RandomForestClassifier(
                 n_estimators=100,
                 max_depth=15,
                 min_samples_split=3,
                 min_samples_leaf=2,
-                random_state=42
+                random_state=42,
+                n_jobs=n_jobs
             )
             
-            self.model.fit(X_train_scaled, y_train)
+            model.fit(X_train_scaled, y_train)
             
-            train_accuracy = self.model.score(X_train_scaled, y_train)
-            test_accuracy = self.model.score(X_test_scaled, y_test)
+            progress('evaluating', 0.85)
+            train_accuracy = model.score(X_train_scaled, y_train)
+            test_accuracy = model.score(X_test_scaled, y_test)
+            # Served predictions are one row at a time; a thread pool per call would only add overhead
+            model.n_jobs = None
             
-            self.is_trained = True
+            bundle = ModelBundle(
+                model=model,
+                label_encoder=label_encoder,
+                scaler=scaler,
+                feature_columns=tuple(feature_columns),
+                hash_features=hash_features,
+                catalog_version=snapshot.version,
+                artifact_info=None,
+                recipe_ids=tuple(recipe['recipe_id'] for recipe in recipes),
+                X=X,
+                y=tuple(y),
+                signatures=tuple(self.recipe_signature(recipe) for recipe in recipes),
+                full_trained_at=time.time(),
+                incremental_updates=0,
+            )
             
             logger.info(f"Model trained successfully using CORE ingredients!")
             logger.info(f"Training Accuracy: {train_accuracy:.2f}")
             logger.info(f"Testing Accuracy: {test_accuracy:.2f}")
-            logger.info(f"Recipes trained on: {len(recipes)}")
-            logger.info(f"Features used: {len(self.feature_columns)}")
+            logger.info(f"Recipes trained on: {len(recipes)} (catalog v{snapshot.version})")
+            logger.info(f"Features used: {hash_features} hashed ingredient + {len(feature_columns)} context")
+            logger.info(f"Cores used: {n_jobs}")
             
+            self.publish(bundle, snapshot, persist, progress)
             return True
             
         except Exception as e:
             logger.error(f"Error training model with core ingredients: {e}")
             return False
     
+    def compile_model(self, bundle):
+        """Export the bundle's forest to a CompiledForest, pruned per ML_COMPILED_MAX_DEPTH / ML_COMPILED_TOP_K"""
+        if not getattr(settings, 'ML_COMPILED_FOREST', True):
+            return None
+        try:
+            return compile_forest(
+                bundle.model, bundle.label_encoder, bundle.scaler,
+                max_depth=getattr(settings, 'ML_COMPILED_MAX_DEPTH', 0) or None,
+                top_k=getattr(settings, 'ML_COMPILED_TOP_K', 0) or None
+            )
+        except Exception as e:
+            # Scoring falls back to the sklearn forest
+            logger.error(f"Error compiling forest: {e}")
+            return None
+    
+    def publish(self, bundle, snapshot, persist, progress):
+        """Compile the forest and optionally save the bundle as an artifact, then swap it in with one assignment"""
+        bundle = bundle._replace(compiled=self.compile_model(bundle))
+        if persist if persist is not None else getattr(settings, 'ML_SAVE_ARTIFACTS', True):
+            progress('saving', 0.95)
+            path = self.save_artifact(bundle, snapshot)
+            if path:
+                bundle = bundle._replace(artifact_info={
+                    'path': str(path), 'source': 'trained', 'catalog_fingerprint': snapshot.fingerprint
+                })
+        self.bundle = bundle
+    
+    def full_rebuild_due(self, bundle=None) -> bool:
+        """Incremental updates drift from a clean fit; rebuild from scratch on a schedule"""
+        bundle = bundle or self.bundle
+        if bundle is None or bundle.X is None:
+            return True
+        if bundle.incremental_updates >= getattr(settings, 'ML_INCREMENTAL_MAX_UPDATES', 10):
+            return True
+        return time.time() - bundle.full_trained_at > getattr(settings, 'ML_FULL_REBUILD_INTERVAL', 86400)
+    
+    def update_incremental(self, progress=None, persist: bool = None):
+        """Bring the model up to date with the catalog without retraining from scratch.
+        
+        Rows of added or edited recipes are rebuilt with the existing hash width
+        and scaler, rows of deleted recipes are dropped, the label encoder is
+        extended with new titles and the forest grows a few trees fitted on the
+        updated rows. Falls back to a full train() when a rebuild is due.
+        """
+        progress = progress or (lambda phase, fraction: None)
+        bundle = self.bundle
+        if self.full_rebuild_due(bundle):
+            logger.info("Full rebuild due; training from scratch")
+            return self.train(progress, persist)
+        if not tree_surgery_verified():
+            logger.warning("Growing fitted trees isn't verified for this scikit-learn; training from scratch")
+            return self.train(progress, persist)
+        
+        return self._run_exclusive(lambda: self._update_incremental(bundle, progress, persist))
+    
+    def _update_incremental(self, bundle, progress, persist):
+        try:
+            progress('loading_catalog', 0.0)
+            snapshot = self.get_catalog()
+            recipes = {recipe['recipe_id']: recipe for recipe in self.trainable_recipes(snapshot.recipes)}
+            
+            # Diff the catalog against the rows the model was fitted on
+            keep = [
+                position for position, (recipe_id, signature) in enumerate(zip(bundle.recipe_ids, bundle.signatures))
+                if recipe_id in recipes and self.recipe_signature(recipes[recipe_id]) == signature
+            ]
+            kept_ids = {bundle.recipe_ids[position] for position in keep}
+            changed = [recipe for recipe_id, recipe in recipes.items() if recipe_id not in kept_ids]
+            removed = sum(1 for recipe_id in bundle.recipe_ids if recipe_id not in recipes)
+            
+            if not changed and not removed:
+                self.bundle = bundle._replace(catalog_version=snapshot.version)
+                logger.info(f"Model already up to date with catalog v{snapshot.version}")
+                return True
+            
+            progress('building_features', 0.1)
+            n_jobs = self.training_n_jobs()
+            X_changed, y_changed, _ = self.build_feature_matrix(changed, bundle.hash_features, n_jobs)
+            X = sparse.vstack([bundle.X[keep], X_changed], format='csr')
+            y = [bundle.y[position] for position in keep] + y_changed
+            recipe_ids = [bundle.recipe_ids[position] for position in keep] + [recipe['recipe_id'] for recipe in changed]
+            signatures = [bundle.signatures[position] for position in keep] + [self.recipe_signature(recipe) for recipe in changed]
+            
+            # Titles only the old trees know (deleted or renamed recipes) stay until the next full rebuild
+            from sklearn.preprocessing import LabelEncoder
+            from .incremental_training import grow_forest
+            
+            progress('fitting', 0.3)
+            old_classes = bundle.label_encoder.classes_[bundle.model.classes_]
+            label_encoder = LabelEncoder().fit(list(bundle.label_encoder.classes_) + y)
+            model = grow_forest(
+                bundle.model, old_classes, label_encoder,
+                bundle.scaler.transform(X), label_encoder.transform(y),
+                n_new_trees=getattr(settings, 'ML_INCREMENTAL_TREES', 10),
+                random_state=42 + bundle.incremental_updates + 1,
+                n_jobs=n_jobs
+            )
+            
+            new_bundle = bundle._replace(
+                model=model,
+                label_encoder=label_encoder,
+                catalog_version=snapshot.version,
+                artifact_info=None,
+                recipe_ids=tuple(recipe_ids),
+                X=X,
+                y=tuple(y),
+                signatures=tuple(signatures),
+                incremental_updates=bundle.incremental_updates + 1,
+            )
+            logger.info(
+                f"Incrementally updated model: {len(changed)} added/edited and {removed} removed "
+                f"recipes, {model.n_estimators} trees (catalog v{snapshot.version})"
+            )
+            self.publish(new_bundle, snapshot, persist, progress)
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error updating model incrementally: {e}")
+            return False
+    
+    def save_artifact(self, bundle, snapshot):
+        """Persist a trained model so other workers and restarts can skip training"""
+        try:
+            path = save_artifact({
+                'model': bundle.model,
+                'label_encoder': bundle.label_encoder,
+                'scaler': bundle.scaler,
+                'feature_columns': list(bundle.feature_columns),
+                'hash_features': bundle.hash_features,
+                'recipe_ids': list(bundle.recipe_ids),
+                'X': bundle.X,
+                'y': list(bundle.y),
+                'signatures': list(bundle.signatures),
+                'full_trained_at': bundle.full_trained_at,
+                'incremental_updates': bundle.incremental_updates,
+                # snapshot.version only means something in this process
+                'catalog_fingerprint': snapshot.fingerprint,
+                'recipe_count': len(snapshot),
+            })
+            if bundle.compiled is not None:
+                save_compiled_forest(bundle.compiled, path, {
+                    'catalog': fingerprint_tag(snapshot.fingerprint), 'hash_features': bundle.hash_features
+                })
+            return path
+        except Exception as e:
+            # The model in memory is still good; only persistence failed
+            logger.error(f"Error saving model artifact: {e}")
+            return None
+    
+    def load_artifact(self):
+        """Load the newest compatible saved model instead of training"""
+        if not self._load_lock.acquire(blocking=False):
+            # Another thread is loading; keep serving the current bundle
+            return self.is_trained
+        try:
+            payload = load_latest_artifact()
+            self.artifact_checked_at = time.time()
+            if payload is None:
+                return False
+            
+            # Versions are per process; the fingerprint says whether it's the catalog we serve
+            snapshot = self.get_catalog()
+            fingerprint = payload.get('catalog_fingerprint')
+            same_catalog = bool(fingerprint and snapshot.fingerprint and tuple(fingerprint) == tuple(snapshot.fingerprint))
+            bundle = ModelBundle(
+                model=payload['model'],
+                label_encoder=payload['label_encoder'],
+                scaler=payload['scaler'],
+                feature_columns=tuple(payload['feature_columns']),
+                hash_features=payload['hash_features'],
+                catalog_version=snapshot.version if same_catalog else 0,
+                artifact_info={
+                    'path': payload['path'],
+                    'source': 'artifact',
+                    'created_at': payload['created_at'],
+                    'catalog_fingerprint': payload['catalog_fingerprint'],
+                    'recipe_count': payload['recipe_count'],
+                },
+                # Artifacts written before incremental updates lack these and get a full rebuild
+                recipe_ids=tuple(payload.get('recipe_ids', ())),
+                X=payload.get('X'),
+                y=tuple(payload.get('y', ())),
+                signatures=tuple(payload.get('signatures', ())),
+                full_trained_at=payload.get('full_trained_at', payload['created_at']),
+                incremental_updates=payload.get('incremental_updates', 0),
+            )
+            # Artifacts saved with compiling turned off get compiled here
+            self.bundle = bundle._replace(
+                compiled=load_compiled_forest(payload['path']) or self.compile_model(bundle)
+            )
+            logger.info(f"Loaded model artifact {payload['path']} ({payload['recipe_count']} recipes, {payload['hash_features'] + len(payload['feature_columns'])} features)")
+            return True
+        finally:
+            self._load_lock.release()
+    
+    def artifact_check_due(self) -> bool:
+        """Look at the artifact directory at most every ML_ARTIFACT_CHECK_INTERVAL seconds"""
+        return time.time() - self.artifact_checked_at >= getattr(settings, 'ML_ARTIFACT_CHECK_INTERVAL', 30)
+    
+    def reload_if_newer(self):
+        """Pick up an artifact written by a training job in another process"""
+        if not self.artifact_check_due():
+            return False
+        self.artifact_checked_at = time.time()
+        artifacts = list_artifacts()
+        current = (self.artifact_info or {}).get('path')
+        if not artifacts or str(artifacts[0]) == current:
+            return False
+        return self.load_artifact()
+    
+    def artifact_status(self):
+        """Where the current model came from, for /ml/status/"""
+        artifact_info = self.artifact_info
+        if not artifact_info:
+            return None
+        snapshot = recipe_catalog.get()
+        fingerprint = artifact_info.get('catalog_fingerprint')
+        return {
+            **{key: value for key, value in artifact_info.items() if key != 'catalog_fingerprint'},
+            # Built from a different catalog than the one being served
+            'stale': bool(fingerprint and snapshot.fingerprint and tuple(fingerprint) != tuple(snapshot.fingerprint)),
+        }
+    
+    def get_ingredient_bitsets(self, snapshot=None):
+        """Packed recipe ingredient bitsets for a catalog snapshot, built once per version"""
+        snapshot = snapshot or self.get_catalog()
+        return snapshot.derived(
+            'ingredient_bitsets',
+            lambda snap: RecipeIngredientBitsets(self.get_ingredient_index(snap))
+        )
+    
+    def importance_weights(self, recipe) -> Optional[List[float]]:
+        """rci.importance_score of each core ingredient, aligned with core_ingredients.
+        
+        Only catalogs loaded from recipe_match_table carry them aligned (the join's
+        GROUP_CONCAT(DISTINCT) loses the pairing); None means equal weights.
+        """
+        if 'core_ingredient_ids' not in recipe:
+            return None
+        scores = recipe.get('importance_scores') or []
+        if not recipe.get('core_ingredients') or len(scores) != len(recipe['core_ingredients']):
+            return None
+        return [max(float(score), 0.0) if score is not None else self.DEFAULT_IMPORTANCE for score in scores]
+    
+    def get_weighted_index(self, snapshot=None):
+        """Importance-weighted posting lists with block upper bounds, built once per catalog version"""
+        snapshot = snapshot or self.get_catalog()
+        return snapshot.derived('weighted_index', self._build_weighted_index)
+    
+    def _build_weighted_index(self, snapshot):
+        weights = [self.importance_weights(recipe) for recipe in snapshot.recipes]
+        if snapshot.recipes and all(recipe_weights is None for recipe_weights in weights):
+            # Logged once per catalog version, since the index is built once per version
+            logger.warning(
+                f"Catalog v{snapshot.version} has no aligned importance scores (is it loaded with the join? "
+                f"build_match_table fixes that): 'weighted' ranking is weighing every ingredient equally"
+            )
+        return WeightedIngredientIndex(self.get_ingredient_index(snapshot), weights)
+    
+    def get_ingredient_matrix(self, snapshot=None):
+        """Sparse recipe x ingredient matrix for a catalog snapshot, built once per version"""
+        snapshot = snapshot or self.get_catalog()
+        return snapshot.derived(
+            'ingredient_matrix',
+            lambda snap: RecipeIngredientMatrix(self.get_ingredient_index(snap))
+        )
+    
+    def resolve_user_terms(self, snapshot, user_ingredients_lower: List[str], term_cache: Dict = None):
+        """Ids of the index terms matched by any user ingredient.
+        
+        A user ingredient the resolver maps to an ingredient_id gets that
+        ingredient's terms, computed once per id and catalog version. Anything else
+        is resolved to its fuzzy neighbours (see match_text_terms). Either way the
+        result is memoised in term_cache, so a batch pays once per distinct
+        ingredient; recipes are then matched on term ids.
+        """
+        if term_cache is None:
+            term_cache = {}
+        resolver = self.get_ingredient_resolver(snapshot)
+        # ingredient_id -> its term ids, shared by every request on this snapshot
+        id_terms = snapshot.derived('ingredient_id_terms', lambda snap: {})
+        matched_terms = set()
+        for user_ing in user_ingredients_lower:
+            terms = term_cache.get(user_ing)
+            if terms is None:
+                ingredient_id = resolver.resolve(user_ing)
+                if ingredient_id is None:
+                    terms = self.match_text_terms(snapshot, user_ing)
+                else:
+                    terms = id_terms.get(ingredient_id)
+                    if terms is None:
+                        terms = id_terms[ingredient_id] = frozenset(
+                            self.match_text_terms(snapshot, resolver.name(ingredient_id).lower())
+                        )
+                term_cache[user_ing] = terms
+            matched_terms |= terms
+        return matched_terms
+    
+    def match_text_terms(self, snapshot, user_ing: str):
+        """Term ids one ingredient string matches: from the precomputed neighbour table
+        when it has a row for it, otherwise through the snapshot's FuzzyTermIndex"""
+        terms = self.get_neighbour_lookup(snapshot).match_terms(user_ing, self.ingredient_matches)
+        if terms is None:
+            terms = self.get_fuzzy_index(snapshot).match_terms(user_ing, self.ingredient_matches)
+        return terms
+    
+    def pantry_check(self, snapshot, user_ingredients_lower: List[str]):
+        """Predicate telling whether the user has a recipe ingredient.
+        
+        Catalog ingredients are looked up in the user's resolved terms; anything
+        the catalog doesn't know is compared against each user ingredient.
+        """
+        index = self.get_ingredient_index(snapshot)
+        matched_terms = self.resolve_user_terms(snapshot, user_ingredients_lower)
+        canonical = self.resolve_user_ingredients(snapshot, user_ingredients_lower)
+        
+        def has_ingredient(recipe_ing: str) -> bool:
+            term_id = index.term_ids.get(recipe_ing.lower())
+            if term_id is not None:
+                return term_id in matched_terms
+            return any(self.ingredient_matches(user_ing, recipe_ing) for user_ing in canonical)
+        
+        return has_ingredient
+    
+    def _apply_thresholds(self, index, candidates, min_matching_ingredients: int, min_match_percentage: float):
+        return [
+            (position, matching_count) for position, matching_count in candidates
+            if matching_count >= min_matching_ingredients
+            and (matching_count / len(index.recipe_ingredients[position])) * 100 > min_match_percentage
+        ]
+    
+    def score_recipes(self, snapshot, user_ingredients_lower: List[str], min_matching_ingredients: int,
+                      min_match_percentage: float, engine: str = None, term_cache: Dict = None):
+        """Score the catalog with the selected engine.
+        
+        Returns (scored, matched_terms): scored is a list of (position, matching_count)
+        for every recipe passing the thresholds, in catalog order. matched_terms is the
+        set of index term ids the user matched, or None for the 'loop' engine.
+        """
+        engine = engine or self.scoring_engine
+        index = self.get_ingredient_index(snapshot)
+        
+        if engine == 'loop':
+            # Reference implementation: compare against every recipe in the catalog
+            scored = []
+            for position, recipe_ingredients in enumerate(index.recipe_ingredients):
+                if not recipe_ingredients:
+                    continue
+                matching_count, _ = self.find_matching_ingredients_pairwise(user_ingredients_lower, recipe_ingredients)
+                match_percentage = (matching_count / len(recipe_ingredients)) * 100
+                if matching_count >= min_matching_ingredients and match_percentage > min_match_percentage:
+                    scored.append((position, matching_count))
+            return scored, None
+        
+        # Resolve which ingredient terms the user has once, then score recipes on term ids
+        matched_terms = self.resolve_user_terms(snapshot, user_ingredients_lower, term_cache)
+        
+        if engine == 'matrix':
+            candidates = self.get_ingredient_matrix(snapshot).candidates(
+                matched_terms, min_matching_ingredients, min_match_percentage
+            )
+        elif engine == 'bitset':
+            candidates = self.get_ingredient_bitsets(snapshot).candidates(
+                matched_terms, min_matching_ingredients, min_match_percentage
+            )
+        elif engine == 'index':
+            # Only visit recipes whose posting lists can still reach the minimum match count
+            candidates = index.candidates(matched_terms, min_matching_ingredients)
+        else:
+            raise ValueError(f"Unknown scoring engine: {engine}")
+        
+        return self._apply_thresholds(index, candidates, min_matching_ingredients, min_match_percentage), matched_terms
+    
+    def select_top(self, snapshot, scored, top_n: int):
+        """Pick the top_n (score, count, position) tuples with a bounded heap.
+        
+        Ties keep catalog order, exactly like a stable sort of the full list.
+        """
+        index = self.get_ingredient_index(snapshot)
+        ranked = (
+            (round((matching_count / len(index.recipe_ingredients[position])) * 100, 2), matching_count, position)
+            for position, matching_count in scored
+        )
+        return heapq.nlargest(top_n, ranked, key=lambda item: (item[0], item[1]))
+    
+    def hydrate_recipe(self, snapshot, position: int, matching_count: int, matching_ingredients: List[str]):
+        """Build the full recommendation payload for one winning recipe"""
+        recipe = snapshot.recipes[position]
+        recipe_ingredients = self.get_ingredient_index(snapshot).recipe_ingredients[position]
+        
+        # Calculate match percentage
+        match_percentage = (matching_count / len(recipe_ingredients)) * 100
+        
+        return {
+            'recipe_id': recipe['recipe_id'],
+            'title': recipe['title'],
+            'description': recipe['description'],
+            'ingredients': recipe_ingredients,
+            'instructions': recipe.get('instruction_steps') or self.parse_instructions(recipe['instructions']),
+            'cooking_time': recipe['cooking_time'],
+            'difficulty': recipe['difficulty'],
+            'cuisine': recipe['cuisine'],
+            'image_url': recipe['image_url'],
+            'meal_type': recipe['meal_type'],
+            'diet_type': recipe['diet_type'],
+            'serving_size': recipe['serving_size'],
+            'rating': recipe['rating'],
+            'confidence_score': round(match_percentage, 2),
+            'matching_ingredients_count': matching_count,
+            'total_ingredients_count': len(recipe_ingredients),
+            'matching_ingredients': matching_ingredients
+        }
+    
+    def rank_recipes(self, snapshot, user_ingredients_lower: List[str], scored, matched_terms, top_n: int):
+        """Keep only the winners, sorted by matching percentage and count (highest first),
+        and build full payloads (instructions parsing etc.) for those alone"""
+        index = self.get_ingredient_index(snapshot)
+        matching_recipes = []
+        for _, matching_count, position in self.select_top(snapshot, scored, top_n):
+            if matched_terms is None:
+                _, matching_ingredients = self.find_matching_ingredients_pairwise(
+                    user_ingredients_lower, index.recipe_ingredients[position]
+                )
+            else:
+                matching_ingredients = index.matching_ingredients(position, matched_terms)
+            matching_recipes.append(
+                self.hydrate_recipe(snapshot, position, matching_count, matching_ingredients)
+            )
+        return matching_recipes
+    
+    def rank_weighted(self, snapshot, user_ingredients_lower: List[str], top_n: int, min_matching_ingredients: int,
+                      min_match_percentage: float, term_cache: Dict = None):
+        """Rank by importance-weighted match (see WeightedIngredientIndex) and build payloads.
+        
+        Recipes still have to pass both count thresholds. Only catalog blocks whose
+        score bound can beat the current top_n are scored.
+        """
+        index = self.get_ingredient_index(snapshot)
+        matched_terms = self.resolve_user_terms(snapshot, user_ingredients_lower, term_cache)
+        stats = {}
+        top = self.get_weighted_index(snapshot).top_k(
+            matched_terms, top_n, min_matching_ingredients, min_match_percentage, stats=stats
+        )
+        logger.info(f"Weighted ranking scored {stats.get('blocks', 0)} catalog blocks, skipped {stats.get('skipped', 0)}")
+        
+        matching_recipes = []
+        for score, matching_count, position in top:
+            recipe = self.hydrate_recipe(
+                snapshot, position, matching_count, index.matching_ingredients(position, matched_terms)
+            )
+            recipe['weighted_score'] = round(score * 100, 2)
+            matching_recipes.append(recipe)
+        return matching_recipes
+    
+    def class_columns(self, bundle) -> Dict[str, int]:
+        """predict_proba column of every recipe title the bundle's forest knows"""
+        cached_bundle, columns = self._class_columns
+        if cached_bundle is not bundle:
+            titles = bundle.label_encoder.classes_[bundle.model.classes_.astype(int)]
+            columns = {title: column for column, title in enumerate(titles)}
+            self._class_columns = (bundle, columns)
+        return columns
+    
+    def rerank_recipes(self, snapshot, queries, deadline: float = None):
+        """Second stage: rerank each query's best candidates with the trained forest.
+        
+        queries are (user_ingredients_lower, scored, matched_terms, top_n, context)
+        tuples, context being the query's (cuisine_type, meal_type, diet_type,
+        serving_size). Each query keeps its ML_RERANK_CANDIDATES best candidates by
+        match score, and every candidate gets one feature row: its ingredients the
+        user has, in the user's context. One predict_proba call (on the compiled
+        forest when there is one) scores the rows of all queries; a candidate's model score is the probability of its own title,
+        blended (relative to the best in its shortlist) with its match score by
+        ML_RERANK_WEIGHT.
+        
+        The candidate cap shrinks to what fits before deadline (a perf_counter
+        time). Returns (results, reranked): without a model, or with no time
+        left, queries are ranked by match score alone and reranked is False.
+        """
+        bundle = self.bundle
+        remaining = deadline - time.perf_counter() if deadline is not None else None
+        if bundle is None or (remaining is not None and remaining <= 0):
+            return [
+                self.rank_recipes(snapshot, user_ingredients_lower, scored, matched_terms, top_n)
+                for user_ingredients_lower, scored, matched_terms, top_n, _ in queries
+            ], False
+        
+        index = self.get_ingredient_index(snapshot)
+        columns = self.class_columns(bundle)
+        weight = getattr(settings, 'ML_RERANK_WEIGHT', 0.5)
+        cap = getattr(settings, 'ML_RERANK_CANDIDATES', 100)
+        if remaining is not None and self._rerank_row_seconds > 0:
+            cap = min(cap, int(remaining / self._rerank_row_seconds / max(len(queries), 1)))
+        
+        # Stage one: shortlist by match score, remembering what each candidate matched
+        shortlists = []
+        ingredient_lists = []
+        context_rows = []
+        for user_ingredients_lower, scored, matched_terms, top_n, context in queries:
+            context_row = list(self.context_features(*context).values())
+            shortlist = []
+            for match_score, matching_count, position in self.select_top(snapshot, scored, max(cap, top_n)):
+                if matched_terms is None:
+                    _, matching_ingredients = self.find_matching_ingredients_pairwise(
+                        user_ingredients_lower, index.recipe_ingredients[position]
+                    )
+                else:
+                    matching_ingredients = index.matching_ingredients(position, matched_terms)
+                shortlist.append((match_score, matching_count, position, matching_ingredients))
+                ingredient_lists.append(matching_ingredients)
+                context_rows.append(context_row)
+            shortlists.append(shortlist)
+        
+        # Stage two: one batched predict_proba over every shortlisted candidate
+        if ingredient_lists:
+            start = time.perf_counter()
+            X = sparse.hstack([
+                hash_ingredient_lists(ingredient_lists, bundle.hash_features),
+                sparse.csr_matrix(np.array(context_rows, dtype=np.float64))
+            ], format='csr')
+            if bundle.compiled is not None:
+                probabilities = bundle.compiled.predict_proba(X)
+            else:
+                probabilities = bundle.model.predict_proba(bundle.scaler.transform(X))
+            row_seconds = (time.perf_counter() - start) / len(ingredient_lists)
+            self._rerank_row_seconds = row_seconds if not self._rerank_row_seconds else (
+                0.8 * self._rerank_row_seconds + 0.2 * row_seconds
+            )
+        
+        results = []
+        row = 0
+        for (_, _, _, top_n, _), shortlist in zip(queries, shortlists):
+            model_scores = []
+            for _, _, position, _ in shortlist:
+                column = columns.get(snapshot.recipes[position]['title'])
+                model_scores.append(float(probabilities[row, column]) if column is not None else None)
+                row += 1
+            # Probabilities are spread over every recipe, so blend them relative to
+            # the best candidate's; recipes added since the last fit have no class
+            # yet and get the shortlist's average
+            known = [score for score in model_scores if score is not None]
+            best = max(known, default=0.0) or 1.0
+            neutral = sum(known) / len(known) if known else 0.0
+            
+            ranked = heapq.nlargest(top_n, (
+                ((1 - weight) * match_score / 100 + weight * (neutral if model_score is None else model_score) / best,
+                 match_score, matching_count, position, matching_ingredients, model_score)
+                for (match_score, matching_count, position, matching_ingredients), model_score in zip(shortlist, model_scores)
+            ), key=lambda item: (item[0], item[1], item[2]))
+            
+            matching_recipes = []
+            for rerank_score, _, matching_count, position, matching_ingredients, model_score in ranked:
+                recipe = self.hydrate_recipe(snapshot, position, matching_count, matching_ingredients)
+                recipe['model_score'] = round(model_score, 4) if model_score is not None else None
+                recipe['rerank_score'] = round(rerank_score, 4)
+                matching_recipes.append(recipe)
+            results.append(matching_recipes)
+        return results, True
+    
     def predict(self, user_ingredients: List[str], cuisine_type: str = 'All Cuisines',
                meal_type: str = 'All Meals', diet_type: str = 'All Diets', 
                serving_size: int = 4, top_n: int = 5, min_matching_ingredients: int = 2,
-               min_match_percentage: float = 40.0):
-        """Generate recipe predictions using CORE ingredients"""
-        if not self.is_trained or self.model is None:
-            logger.info("Model not trained. Training now...")
-            if not self.train():
-                return []
+               min_match_percentage: float = 40.0, engine: str = None, ranking: str = None):
+        """Generate recipe predictions using CORE ingredients
+        
+        ranking is 'match' (ingredient match score only), 'weighted' (match
+        score weighted by each core ingredient's importance, see rank_weighted)
+        or 'rerank' (the best matches reranked by the trained forest, see
+        rerank_recipes); it defaults to ML_RANKING_MODE.
+        """
+        # Ranking only needs the catalog; never make the caller wait for fit()
+        self.ensure_trained(wait=False)
+        ranking = ranking or self.ranking_mode
+        deadline = time.perf_counter() + getattr(settings, 'ML_RERANK_BUDGET_MS', 50) / 1000
         
         try:
-            # Get all recipes with core ingredients
-            all_recipes = self.fetch_recipes_from_db()
+            # Get all recipes with core ingredients from the shared snapshot
+            snapshot = self.get_catalog()
+            user_ingredients_lower = self.resolve_user_ingredients(snapshot, user_ingredients)
             
-            # Filter recipes by direct ingredient matching first
-            matching_recipes = []
-            user_ingredients_lower = [ing.lower() for ing in user_ingredients]
+            cache_key = self.result_cache.key(
+                'predict', user_ingredients_lower, cuisine_type=cuisine_type, meal_type=meal_type,
+                diet_type=diet_type, serving_size=serving_size, top_n=top_n,
+                min_matching_ingredients=min_matching_ingredients, min_match_percentage=min_match_percentage,
+                ranking=ranking
+            )
+            cached = self.result_cache.get(snapshot.version, cache_key)
+            if cached is not None:
+                return cached
             
-            for recipe in all_recipes:
-                # Use core ingredients as primary source
-                recipe_ingredients = recipe.get('core_ingredients', [])
-                if not recipe_ingredients:
-                    # Fallback to parsed ingredients
-                    recipe_ingredients = self.parse_ingredients(
-                        recipe['ingredients'],
-                        recipe.get('structured_ingredients')
-                    )
-                
-                if recipe_ingredients:
-                    matching_count, matching_ingredients = self.find_matching_ingredients(
-                        user_ingredients_lower, recipe_ingredients
-                    )
-                    
-                    # Calculate match percentage
-                    match_percentage = (matching_count / len(recipe_ingredients)) * 100
-                    
-                    # CRITICAL: Only consider recipes with at least 2 matching ingredients AND >40% match percentage
-                    if matching_count >= min_matching_ingredients and match_percentage > min_match_percentage:
-                        recipe_details = {
-                            'recipe_id': recipe['recipe_id'],
-                            'title': recipe['title'],
-                            'description': recipe['description'],
-                            'ingredients': recipe_ingredients,
-                            'instructions': self.parse_instructions(recipe['instructions']),
-                            'cooking_time': recipe['cooking_time'],
-                            'difficulty': recipe['difficulty'],
-                            'cuisine': recipe['cuisine'],
-                            'image_url': recipe['image_url'],
-                            'meal_type': recipe['meal_type'],
-                            'diet_type': recipe['diet_type'],
-                            'serving_size': recipe['serving_size'],
-                            'rating': recipe['rating'],
-                            'confidence_score': round(match_percentage, 2),
-                            'matching_ingredients_count': matching_count,
-                            'total_ingredients_count': len(recipe_ingredients),
-                            'matching_ingredients': matching_ingredients
-                        }
-                        matching_recipes.append(recipe_details)
-            
-            # Sort by matching percentage and count (highest first)
-            matching_recipes.sort(
-                key=lambda x: (x['confidence_score'], x['matching_ingredients_count']), 
-                reverse=True
+            if ranking == 'weighted':
+                # Pruned top-k straight off the posting lists; the catalog isn't scored in full
+                matching_recipes = self.rank_weighted(
+                    snapshot, user_ingredients_lower, top_n, min_matching_ingredients, min_match_percentage
+                )
+                self.result_cache.put(snapshot.version, cache_key, matching_recipes)
+                return matching_recipes
+            
+            scored, matched_terms = self.score_recipes(
+                snapshot, user_ingredients_lower, min_matching_ingredients, min_match_percentage, engine
             )
             
-            logger.info(f"Found {len(matching_recipes)} recipes with at least {min_matching_ingredients} matching CORE ingredients and >{min_match_percentage}% match")
-            return matching_recipes[:top_n]
+            logger.info(f"Found {len(scored)} recipes with at least {min_matching_ingredients} matching CORE ingredients and >{min_match_percentage}% match")
+            if ranking == 'rerank':
+                (matching_recipes,), reranked = self.rerank_recipes(snapshot, [(
+                    user_ingredients_lower, scored, matched_terms, top_n,
+                    (cuisine_type, meal_type, diet_type, serving_size)
+                )], deadline)
+                if not reranked:
+                    # Match-only fallback; let the next request try the model again
+                    return matching_recipes
+            elif ranking == 'match':
+                matching_recipes = self.rank_recipes(snapshot, user_ingredients_lower, scored, matched_terms, top_n)
+            else:
+                raise ValueError(f"Unknown ranking mode: {ranking}")
+            self.result_cache.put(snapshot.version, cache_key, matching_recipes)
+            return matching_recipes
             
         except Exception as e:
             logger.error(f"Error during prediction with core ingredients: {e}")
             return []
     
+    def predict_many(self, queries: List[Any], engine: str = None, ranking: str = None) -> List[List[Dict[str, Any]]]:
+        """Run predict for many ingredient lists in one pass.
+        
+        Each query is either a list of ingredients or a dict with 'ingredients' and
+        any of predict's keyword arguments. The catalog snapshot, per-ingredient
+        term matches and the scoring of identical queries are shared across the
+        batch; each result is identical to calling predict on that query alone.
+        With ranking='rerank' one predict_proba call reranks the whole batch.
+        """
+        self.ensure_trained(wait=False)
+        
+        engine = engine or self.scoring_engine
+        ranking = ranking or self.ranking_mode
+        if ranking not in ('match', 'weighted', 'rerank'):
+            raise ValueError(f"Unknown ranking mode: {ranking}")
+        deadline = time.perf_counter() + getattr(settings, 'ML_RERANK_BUDGET_MS', 50) / 1000
+        snapshot = self.get_catalog()
+        index = self.get_ingredient_index(snapshot)
+        term_cache = {}
+        
+        # Collapse queries that can only produce the same answer
+        prepared = []
+        unique = {}
+        for query in queries:
+            if not isinstance(query, dict):
+                query = {'ingredients': query}
+            user_ingredients_lower = self.resolve_user_ingredients(snapshot, query.get('ingredients') or [])
+            top_n = query.get('top_n', 5)
+            min_matching = query.get('min_matching_ingredients', 2)
+            min_percentage = query.get('min_match_percentage', 40.0)
+            context = (
+                query.get('cuisine_type', 'All Cuisines'), query.get('meal_type', 'All Meals'),
+                query.get('diet_type', 'All Diets'), query.get('serving_size', 4)
+            )
+            # Same canonical key predict caches under
+            key = self.result_cache.key(
+                'predict', user_ingredients_lower, cuisine_type=context[0], meal_type=context[1],
+                diet_type=context[2], serving_size=context[3], top_n=top_n,
+                min_matching_ingredients=min_matching, min_match_percentage=min_percentage, ranking=ranking
+            )
+            if key not in unique:
+                unique[key] = (user_ingredients_lower, top_n, min_matching, min_percentage, context)
+            prepared.append(key)
+        
+        results = {}
+        for key in unique:
+            cached = self.result_cache.get(snapshot.version, key)
+            if cached is not None:
+                results[key] = cached
+        pending = {key: query for key, query in unique.items() if key not in results}
+        
+        try:
+            keys = list(pending)
+            if ranking == 'weighted':
+                scored_queries = []
+            elif engine == 'matrix':
+                # One sparse mat-mat product scores every distinct query against the catalog
+                matched = [self.resolve_user_terms(snapshot, unique[key][0], term_cache) for key in keys]
+                candidate_lists = self.get_ingredient_matrix(snapshot).candidates_many(
+                    matched, [(unique[key][2], unique[key][3]) for key in keys]
+                )
+                scored_queries = [
+                    (self._apply_thresholds(index, candidates, unique[key][2], unique[key][3]), matched_terms)
+                    for key, matched_terms, candidates in zip(keys, matched, candidate_lists)
+                ]
+            else:
+                scored_queries = [
+                    self.score_recipes(snapshot, unique[key][0], unique[key][2], unique[key][3], engine, term_cache)
+                    for key in keys
+                ]
+            
+            reranked = False
+            if ranking == 'weighted':
+                ranked = [
+                    self.rank_weighted(snapshot, unique[key][0], unique[key][1], unique[key][2], unique[key][3], term_cache)
+                    for key in keys
+                ]
+            elif ranking == 'rerank':
+                ranked, reranked = self.rerank_recipes(snapshot, [
+                    (unique[key][0], scored, matched_terms, unique[key][1], unique[key][4])
+                    for key, (scored, matched_terms) in zip(keys, scored_queries)
+                ], deadline)
+            else:
+                ranked = [
+                    self.rank_recipes(snapshot, unique[key][0], scored, matched_terms, unique[key][1])
+                    for key, (scored, matched_terms) in zip(keys, scored_queries)
+                ]
+            results.update(zip(keys, ranked))
+        except Exception as e:
+            logger.error(f"Error during batch prediction with core ingredients: {e}")
+            return [[] for _ in queries]
+        
+        # A rerank that ran out of time fell back to match order; don't cache that
+        if ranking != 'rerank' or reranked:
+            for key in pending:
+                self.result_cache.put(snapshot.version, key, results[key])
+        logger.info(f"Scored {len(queries)} queries ({len(pending)} distinct, {len(unique) - len(pending)} cached) against catalog v{snapshot.version}")
+        # Give every query its own dicts so callers can't mutate each other's results
+        return [[dict(recipe) for recipe in results[key]] for key in prepared]
+    
     def get_recipe_details(self, recipe_name: str):
         """Get complete recipe details using CORE ingredients"""
         try:
@@ -668,6 +1624,14 @@ class RecipeMLModel:
     def get_recipes_with_substitutions(self, user_ingredients, top_n=5):
         """Get recipe recommendations with substitution suggestions using CORE ingredients"""
         try:
+            snapshot = self.get_catalog()
+            # Keyed like predict: aliases and spellings of the same pantry share an entry
+            user_ingredients_lower = self.resolve_user_ingredients(snapshot, user_ingredients)
+            cache_key = self.result_cache.key('substitutions', user_ingredients_lower, top_n=top_n)
+            cached = self.result_cache.get(snapshot.version, cache_key)
+            if cached is not None:
+                return cached
+            
             # First, get normal recommendations (already filters by 2+ matches and >40%)
             recommendations = self.predict(user_ingredients, top_n=top_n)
             
@@ -675,20 +1639,12 @@ class RecipeMLModel:
                 return []
             
             enhanced_recommendations = []
-            user_ingredients_lower = [ing.lower() for ing in user_ingredients]
+            has_ingredient = self.pantry_check(snapshot, user_ingredients_lower)
             
             for recipe in recommendations:
                 # Find missing ingredients for this recipe
                 recipe_ingredients = recipe.get('ingredients', [])
-                missing_ingredients = []
-                
-                for recipe_ing in recipe_ingredients:
-                    has_ingredient = any(
-                        self.ingredient_similarity_score(user_ing, recipe_ing) > 0.7
-                        for user_ing in user_ingredients_lower
-                    )
-                    if not has_ingredient:
-                        missing_ingredients.append(recipe_ing)
+                missing_ingredients = [recipe_ing for recipe_ing in recipe_ingredients if not has_ingredient(recipe_ing)]
                 
                 # Get substitutes for missing ingredients from database
                 substitutes = self.find_common_substitutes(missing_ingredients)
@@ -704,6 +1660,7 @@ class RecipeMLModel:
                 
                 enhanced_recommendations.append(enhanced_recipe)
             
+            self.result_cache.put(snapshot.version, cache_key, enhanced_recommendations)
             return enhanced_recommendations
             
         except Exception as e:
@@ -744,16 +1701,13 @@ class RecipeMLModel:
                 recipe_ingredients = recipe_data[0].split(',') if recipe_data[0] else []
                 
                 # Find missing ingredients and get substitutes
-                user_ingredients_lower = [ing.lower() for ing in user_ingredients]
+                snapshot = self.get_catalog()
+                user_ingredients_lower = self.resolve_user_ingredients(snapshot, user_ingredients)
+                has_ingredient = self.pantry_check(snapshot, user_ingredients_lower)
                 missing_analysis = []
                 
                 for recipe_ing in recipe_ingredients:
-                    has_ingredient = any(
-                        self.ingredient_similarity_score(user_ing, recipe_ing) > 0.7
-                        for user_ing in user_ingredients_lower
-                    )
-                    
-                    if not has_ingredient:
+                    if not has_ingredient(recipe_ing):
                         substitutes = self.get_ingredient_substitutes(recipe_ing)
                         missing_analysis.append({
                             'missing_ingredient': recipe_ing,
@@ -762,7 +1716,7 @@ class RecipeMLModel:
                         })
                 
                 # Calculate usability
-                usability_percentage, can_make = self.calculate_recipe_usability(recipe_ingredients, user_ingredients)
+                usability_percentage, can_make = self.calculate_recipe_usability(recipe_ingredients, user_ingredients_lower)
                 
                 return {
                     'missing_ingredients_analysis': missing_analysis,
@@ -777,18 +1731,60 @@ class RecipeMLModel:
             logger.error(f"Error getting detailed substitutions: {e}")
             return None
 
-    def ensure_trained(self):
-        """Ensure model is trained before making predictions"""
-        if not self.is_trained:
-            logger.info("Model not trained. Training now...")
-            return self.train()
-        return True
+    def check_training_jobs(self):
+        """Start the training job this worker's model needs, at most every ML_ARTIFACT_CHECK_INTERVAL.
+        
+        Runs on the request path, so the start lock is never waited for, and
+        nothing here raises into predict.
+        """
+        if time.time() - self.training_checked_at < getattr(settings, 'ML_ARTIFACT_CHECK_INTERVAL', 30):
+            return
+        self.training_checked_at = time.time()
+        from .training_jobs import read_status, training_jobs
+        try:
+            bundle = self.bundle
+            if bundle is None:
+                training_jobs.start(lock_timeout=0)
+            elif self.full_rebuild_due(bundle):
+                last_success = read_status().get('last_success') or {}
+                if last_success.get('full_trained_at', 0) > bundle.full_trained_at:
+                    # Another worker's job already rebuilt; use its artifact rather than train again
+                    self.load_artifact()
+                else:
+                    training_jobs.start(lock_timeout=0)
+            else:
+                # A write in some worker may be waiting for a job that has since finished
+                training_jobs.start_pending(lock_timeout=0)
+        except TimeoutError:
+            logger.info("Another worker is starting a training job")
+        except Exception as e:
+            logger.error(f"Error checking training jobs: {e}")
+    
+    def ensure_trained(self, wait: bool = True):
+        """Ensure model is trained before making predictions
+        
+        With wait=False a missing model is trained by a background job and this
+        returns False straight away.
+        """
+        if self.is_trained:
+            self.reload_if_newer()
+            self.check_training_jobs()
+            return True
+        # Requests don't list and load the artifact directory every time while there's no model
+        if (wait or self.artifact_check_due()) and self.load_artifact():
+            return True
+        if not wait:
+            self.check_training_jobs()
+            return False
+        logger.info("Model not trained. Training now...")
+        return self.train()
 
 
 # Global instance
 recipe_ml_model = RecipeMLModel()
 
 
+
 # Main function to get recipe recommendations
 def get_recipe_recommendations(user_ingredients, cuisine='All Cuisines', meal_type='All Meals', diet='All Diets'):
     """
@@ -829,11 +1825,37 @@ def get_recipe_recommendations(user_ingredients, cuisine='All Cuisines', meal_ty
         }
 
 
+def recipes_changed(recipe_ids=None):
+    """Called after recipes are added, edited or deleted so the next read sees the change"""
+    if getattr(settings, 'RECIPE_MATCH_TABLE', True):
+        try:
+            # Single rows only go into a table that is built or being rebuilt; a full refresh builds it
+            if recipe_ids is None or match_table_state() is not None:
+                recipe_ml_model.refresh_match_table(recipe_ids)
+        except Exception as e:
+            # The table may now be missing this change: back to the join until the next rebuild
+            logger.error(f"Error refreshing the recipe match table, loading the catalog with the join: {e}")
+            try:
+                clear_match_table_state()
+            except Exception as e:
+                # Not migrated yet
+                logger.error(f"Error clearing the recipe match table state: {e}")
+    recipe_catalog.invalidate()
+    recipe_ml_model.core_ingredients_cache.clear()
+    recipe_ml_model.result_cache.clear()
+    
+    # Fold the change into the model in the background instead of a full retrain
+    from .training_jobs import training_jobs
+    training_jobs.schedule_incremental()
+
+
 def initialize_ml_model():
     """Initialize and optionally train the ML model on startup"""
     try:
         logger.info("Initializing ML model with CORE ingredients...")
-        # This will trigger training when first prediction is made
+        # Load the last saved model; without one, training happens when the first prediction is made
+        if not recipe_ml_model.is_trained and not recipe_ml_model.load_artifact():
+            logger.info("No saved model artifact found")
         return recipe_ml_model
     except Exception as e:
         logger.error(f"Failed to initialize ML model with core ingredients: {e}")
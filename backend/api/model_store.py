@@ -0,0 +1,184 @@
+import hashlib
+import logging
+import os
+import time
+from functools import lru_cache
+from importlib import metadata
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+from django.conf import settings
+
+from .compiled_forest import CompiledForest
+from .neighbour_table import NeighbourTable
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the artifact contents or the feature layout change
+ARTIFACT_FORMAT = 2
+ARTIFACT_PREFIX = 'recipe_model'
+COMPILED_SUFFIX = '.forest.npz'
+NEIGHBOUR_TABLE_NAME = 'ingredient_neighbours.npz'
+# scikit-learn release (major.minor) the Tree state surgery in incremental_training was
+# verified against; bump it only after api.tests.IncrementalTrainingTests pass on a new one
+TREE_SURGERY_SKLEARN = '1.9'
+
+
+def artifact_dir() -> Path:
+    directory = getattr(settings, 'ML_ARTIFACT_DIR', None)
+    return Path(directory) if directory else Path(settings.BASE_DIR) / 'ml_artifacts'
+
+
+@lru_cache(maxsize=None)
+def sklearn_version() -> str:
+    """Installed scikit-learn version, read from package metadata so sklearn itself isn't imported"""
+    return metadata.version('scikit-learn')
+
+
+def fingerprint_tag(fingerprint) -> str:
+    """Short, stable tag for a catalog fingerprint; the same in every process"""
+    if not fingerprint:
+        return 'unknown'
+    return hashlib.sha1(repr(tuple(str(value) for value in fingerprint)).encode()).hexdigest()[:10]
+
+
+def tree_surgery_verified() -> bool:
+    """Whether growing and padding fitted trees is known to work with the installed sklearn"""
+    return sklearn_version().split('.')[:2] == TREE_SURGERY_SKLEARN.split('.')
+
+
+def save_artifact(payload: Dict[str, Any]) -> Path:
+    """Write a trained model to a new versioned file and prune old ones.
+
+    The file is written under a temporary name and renamed into place, so a
+    worker booting at the same time never sees a half-written artifact.
+    """
+    import joblib
+
+    directory = artifact_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    created_at = time.time()
+    payload = {
+        **payload,
+        'format': ARTIFACT_FORMAT,
+        'sklearn_version': sklearn_version(),
+        'tree_surgery_sklearn': TREE_SURGERY_SKLEARN,
+        'created_at': created_at,
+    }
+    name = (
+        f'{ARTIFACT_PREFIX}_f{ARTIFACT_FORMAT}_{int(created_at * 1000)}_'
+        f'{fingerprint_tag(payload.get("catalog_fingerprint"))}.joblib'
+    )
+    path = directory / name
+    tmp_path = directory / f'.{name}.{os.getpid()}.tmp'
+    joblib.dump(payload, tmp_path)
+    os.replace(tmp_path, path)
+    logger.info(f"Saved model artifact {path}")
+
+    prune_artifacts(getattr(settings, 'ML_ARTIFACT_KEEP', 5))
+    return path
+
+
+def list_artifacts():
+    """Artifact paths, newest first"""
+    directory = artifact_dir()
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob(f'{ARTIFACT_PREFIX}_*.joblib'), key=lambda path: path.name, reverse=True)
+
+
+def compiled_path(artifact_path) -> Path:
+    """Where the compiled forest exported from an artifact lives"""
+    artifact_path = Path(artifact_path)
+    return artifact_path.with_name(artifact_path.stem + COMPILED_SUFFIX)
+
+
+def save_compiled_forest(compiled: CompiledForest, artifact_path, metadata: Dict[str, Any] = None) -> Path:
+    """Write a compiled forest next to its artifact (atomically, like save_artifact)"""
+    path = compiled_path(artifact_path)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp.npz')
+    compiled.save(tmp_path, metadata)
+    os.replace(tmp_path, path)
+    logger.info(f"Saved compiled forest {path} ({path.stat().st_size / 1024:.0f} KB)")
+    return path
+
+
+def load_compiled_forest(artifact_path) -> Optional[CompiledForest]:
+    """The compiled forest saved next to an artifact, or None"""
+    path = compiled_path(artifact_path)
+    if not path.is_file():
+        return None
+    try:
+        compiled, _ = CompiledForest.load(path)
+        return compiled
+    except Exception as e:
+        logger.error(f"Error loading compiled forest {path}: {e}")
+        return None
+
+
+def neighbour_table_path() -> Path:
+    return artifact_dir() / NEIGHBOUR_TABLE_NAME
+
+
+def save_neighbour_table(table: NeighbourTable, metadata: Dict[str, Any] = None, path=None) -> Path:
+    """Write the ingredient neighbour table (atomically, like save_artifact)"""
+    path = Path(path) if path else neighbour_table_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp.npz')
+    table.save(tmp_path, metadata)
+    os.replace(tmp_path, path)
+    logger.info(f"Saved neighbour table {path} ({path.stat().st_size / 1024:.0f} KB)")
+    return path
+
+
+def load_neighbour_table(path=None) -> Optional[Tuple[NeighbourTable, Dict[str, Any]]]:
+    """The saved ingredient neighbour table and its metadata, or None"""
+    path = Path(path) if path else neighbour_table_path()
+    if not path.is_file():
+        return None
+    try:
+        return NeighbourTable.load(path)
+    except Exception as e:
+        logger.error(f"Error loading neighbour table {path}: {e}")
+        return None
+
+
+def prune_artifacts(keep: int):
+    for path in list_artifacts()[max(keep, 1):]:
+        for file in (path, compiled_path(path)):
+            try:
+                file.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Could not remove old model artifact {file}: {e}")
+
+
+def is_compatible(payload: Dict[str, Any]) -> bool:
+    # Pickled sklearn estimators are only safe to load with the version that wrote them,
+    # and the hashed columns only line up at the width they were trained with
+    return (
+        isinstance(payload, dict)
+        and payload.get('format') == ARTIFACT_FORMAT
+        and payload.get('sklearn_version') == sklearn_version()
+        and payload.get('hash_features') == getattr(settings, 'ML_FEATURE_HASH_SIZE', 2 ** 14)
+        # Forests grown incrementally hold trees rebuilt through private Tree state
+        and (not payload.get('incremental_updates') or tree_surgery_verified())
+    )
+
+
+def load_latest_artifact() -> Optional[Dict[str, Any]]:
+    """Load the newest compatible artifact, or None if there isn't one"""
+    import joblib
+
+    for path in list_artifacts():
+        try:
+            payload = joblib.load(path)
+        except Exception as e:
+            logger.error(f"Error loading model artifact {path}: {e}")
+            continue
+        if not is_compatible(payload):
+            logger.info(f"Skipping incompatible model artifact {path}")
+            continue
+        payload['path'] = str(path)
+        return payload
+    return None
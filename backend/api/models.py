@@ -162,3 +162,51 @@ class MealPlan(models.Model):
 
     def __str__(self):
         return f"{self.name} ({self.user})"
+
+
+class RecipeMatchRow(models.Model):
+    # One row per catalog recipe, rebuilt from recipes + recipe_core_ingredients by
+    # api.recipe_match_table whenever a recipe is written. List columns hold JSON arrays;
+    # the core ingredient ones are aligned with each other.
+    recipe_id = models.IntegerField(primary_key=True)
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True, null=True)
+    cuisine = models.CharField(max_length=100, null=True, blank=True)
+    difficulty = models.CharField(max_length=50, null=True, blank=True)
+    cooking_time = models.IntegerField(null=True, blank=True)
+    ingredients = models.TextField(blank=True, null=True)
+    instructions = models.TextField(blank=True, null=True)
+    image_url = models.CharField(max_length=500, blank=True, null=True)
+    meal_type = models.CharField(max_length=100, null=True, blank=True)
+    diet_type = models.CharField(max_length=100, null=True, blank=True)
+    serving_size = models.IntegerField(null=True, blank=True)
+    rating = models.FloatField(null=True, blank=True)
+    core_ingredient_ids = models.TextField()
+    core_ingredients = models.TextField()
+    normalized_ingredients = models.TextField()
+    importance_scores = models.TextField()
+    ingredient_categories = models.TextField()
+    instruction_steps = models.TextField()
+    refreshed_at = models.FloatField()
+
+    class Meta:
+        db_table = 'recipe_match_table'
+
+    def __str__(self):
+        return f"Match row for recipe {self.recipe_id}"
+
+
+class RecipeMatchTableState(models.Model):
+    # Single row written by api.recipe_match_table when a full rebuild starts, with built_at
+    # set once it finishes. The catalog only reads the table when built_at is set; a failed
+    # refresh deletes the row, sending the catalog back to the join until the next rebuild.
+    id = models.IntegerField(primary_key=True)
+    started_at = models.FloatField()
+    built_at = models.FloatField(null=True, blank=True)
+    row_count = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'recipe_match_table_state'
+
+    def __str__(self):
+        return f"Match table built at {self.built_at} ({self.row_count} rows)" if self.built_at else "Match table building"
@@ -0,0 +1,169 @@
+"""
+Precomputed ingredient neighbour table.
+
+For every name in the ingredient vocabulary (the ingredients table plus the
+catalog's recipe ingredients, grouped by normalized name) the table lists the
+names it matches and their ingredient_similarity_score, so a request resolves
+a user ingredient with one lookup instead of scoring it against the catalog.
+It is built offline by the build_neighbour_table command and stored as an
+uncompressed .npz in CSR layout: neighbours of name i are
+neighbours[ptr[i]:ptr[i + 1]], with their scores alongside. Names are stored
+as one UTF-8 buffer with offsets rather than a fixed-width string array.
+
+Matching only depends on normalized names, so one row serves every spelling
+that normalizes to it. Scores are not symmetric (SequenceMatcher isn't), so a
+row holds the scores with its own name on the user's side.
+"""
+
+import io
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .ingredient_index import FuzzyTermIndex
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the table layout or the matching rules change
+NEIGHBOUR_TABLE_FORMAT = 1
+
+
+class NeighbourTable:
+    def __init__(self, names: List[str], ptr, neighbours, scores):
+        self.names = names
+        self.ptr = ptr
+        self.neighbours = neighbours
+        self.scores = scores
+        self.name_ids = {name: name_id for name_id, name in enumerate(names)}
+
+    @property
+    def n_names(self) -> int:
+        return len(self.names)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.neighbours)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.arrays().values())
+
+    def row(self, name: str) -> Optional[np.ndarray]:
+        """Neighbour name ids of a normalized name, or None if it isn't in the table"""
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            return None
+        return self.neighbours[self.ptr[name_id]:self.ptr[name_id + 1]]
+
+    def neighbour_scores(self, name: str) -> List[Tuple[str, float]]:
+        """(neighbour name, score) pairs of a normalized name, best first"""
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            return []
+        start, end = self.ptr[name_id], self.ptr[name_id + 1]
+        neighbours = [self.names[other] for other in self.neighbours[start:end].tolist()]
+        return sorted(zip(neighbours, self.scores[start:end].tolist()), key=lambda pair: -pair[1])
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        encoded = [name.encode('utf-8') for name in self.names]
+        name_ptr = np.zeros(len(encoded) + 1, dtype=np.int32)
+        name_ptr[1:] = np.cumsum([len(name) for name in encoded])
+        return {
+            'name_bytes': np.frombuffer(b''.join(encoded), dtype=np.uint8), 'name_ptr': name_ptr,
+            'ptr': self.ptr, 'neighbours': self.neighbours, 'scores': self.scores,
+        }
+
+    def save(self, path, metadata: Optional[Dict[str, Any]] = None):
+        """Write the arrays as an uncompressed .npz; metadata values must be scalars or arrays"""
+        extra = {f'meta_{key}': np.asarray(value) for key, value in (metadata or {}).items()}
+        np.savez(path, **self.arrays(), **extra)
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved table; returns (table, metadata)"""
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files}
+        metadata = {key[len('meta_'):]: arrays.pop(key).item() for key in list(arrays) if key.startswith('meta_')}
+        buffer = arrays.pop('name_bytes').tobytes()
+        name_ptr = arrays.pop('name_ptr').tolist()
+        names = [buffer[start:end].decode('utf-8') for start, end in zip(name_ptr, name_ptr[1:])]
+        return cls(names, **arrays), metadata
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        self.save(buffer)
+        return buffer.getvalue()
+
+
+def build_neighbour_table(vocabulary: List[str], normalize: Callable[[str], str], score: Callable[[str, str], float],
+                          threshold: float, min_ratio: float) -> NeighbourTable:
+    """Score every vocabulary name against its fuzzy candidates and keep those above threshold"""
+    fuzzy_index = FuzzyTermIndex(vocabulary, normalize, min_ratio=min_ratio, min_overlap=threshold)
+    # Any spelling of a name stands for all of them
+    spellings = [vocabulary[term_ids[0]] for term_ids in fuzzy_index.name_terms]
+
+    ptr = [0]
+    neighbours = []
+    scores = []
+    for name_id, spelling in enumerate(spellings):
+        row = []
+        for other in sorted(fuzzy_index.candidate_names(spelling)):
+            similarity = score(spelling, spellings[other])
+            if similarity > threshold:
+                row.append((other, similarity))
+        neighbours.extend(other for other, _ in row)
+        scores.extend(similarity for _, similarity in row)
+        ptr.append(len(neighbours))
+
+    table = NeighbourTable(
+        names=list(fuzzy_index.names),
+        ptr=np.asarray(ptr, dtype=np.int32),
+        neighbours=np.asarray(neighbours, dtype=np.int32),
+        scores=np.asarray(scores, dtype=np.float32),
+    )
+    logger.info(f"Built neighbour table: {table.n_names} names, {table.n_edges} neighbours")
+    return table
+
+
+class NeighbourLookup:
+    """A NeighbourTable mapped onto one catalog snapshot's FuzzyTermIndex.
+
+    Catalog names the table doesn't know (ingredients added since it was
+    built) are still checked with is_match, so a stale table only costs speed.
+    """
+
+    def __init__(self, table: Optional[NeighbourTable], fuzzy_index: FuzzyTermIndex):
+        self.table = table
+        self.fuzzy_index = fuzzy_index
+        self.catalog_names = None
+        self.uncovered = set()
+        if table is not None:
+            # Catalog name id of every table name, -1 if the catalog doesn't use it
+            self.catalog_names = np.asarray(
+                [fuzzy_index.name_ids.get(name, -1) for name in table.names], dtype=np.int64
+            )
+            self.uncovered = {
+                name_id for name_id, name in enumerate(fuzzy_index.names) if name not in table.name_ids
+            }
+
+    def match_terms(self, ingredient: str, is_match: Callable[[str, str], bool]) -> Optional[Set[int]]:
+        """Ids of every catalog term ingredient matches, or None if the table has no row for it"""
+        if self.table is None:
+            return None
+        if not ingredient:
+            return set()
+        row = self.table.row(self.fuzzy_index.normalize(ingredient))
+        if row is None:
+            return None
+
+        name_ids = self.catalog_names[row]
+        matched = set()
+        for name_id in name_ids[name_ids >= 0].tolist():
+            matched.update(self.fuzzy_index.name_terms[name_id])
+        if self.uncovered:
+            for name_id in self.fuzzy_index.candidate_names(ingredient) & self.uncovered:
+                term_ids = self.fuzzy_index.name_terms[name_id]
+                if is_match(ingredient, self.fuzzy_index.terms[term_ids[0]]):
+                    matched.update(term_ids)
+        return matched
@@ -0,0 +1,44 @@
+import gc
+import logging
+
+from django.db import connections
+
+from .ml_model import initialize_ml_model
+
+logger = logging.getLogger(__name__)
+
+
+def warm_recommender():
+    """Build everything the recommender serves from: model, catalog snapshot, index, the scoring engine's
+    structures and fuzzy lookup"""
+    model = initialize_ml_model()
+    if model is None:
+        return None
+    snapshot = model.get_catalog()
+    model.get_ingredient_index(snapshot)
+    # Only what the configured engine reads, so workers don't share structures they never use
+    if model.scoring_engine == 'matrix':
+        model.get_ingredient_matrix(snapshot)
+    elif model.scoring_engine == 'bitset':
+        model.get_ingredient_bitsets(snapshot)
+    if model.ranking_mode == 'weighted':
+        model.get_weighted_index(snapshot)
+    model.get_fuzzy_index(snapshot)
+    model.get_neighbour_lookup(snapshot)
+    model.get_ingredient_resolver(snapshot)
+    logger.info(f"Recommender warmed: catalog v{snapshot.version} with {len(snapshot)} recipes, trained={model.is_trained}")
+    return model
+
+
+def preload_and_freeze():
+    """Warm the recommender in the master process so forked workers share it copy-on-write.
+
+    gc.freeze() moves every object alive now into the permanent generation, so
+    the workers' garbage collector never writes to those pages and they stay shared.
+    """
+    warm_recommender()
+    # Each worker must open its own database connection
+    connections.close_all()
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Froze {gc.get_freeze_count()} objects before forking workers")
@@ -0,0 +1,54 @@
+import logging
+import os
+from typing import List, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fields of /proc/<pid>/smaps_rollup, in kB
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def process_memory(pid: Optional[int] = None) -> Optional[Dict[str, int]]:
+    """Resident memory of a process in kB: rss, pss, shared and private (Linux only)"""
+    pid = pid or os.getpid()
+    values = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as smaps:
+            for line in smaps:
+                name, _, rest = line.partition(':')
+                if name in SMAPS_FIELDS:
+                    values[name] = int(rest.split()[0])
+    except (OSError, ValueError):
+        return None
+    return {
+        'rss': values.get('Rss', 0),
+        'pss': values.get('Pss', 0),
+        'shared': values.get('Shared_Clean', 0) + values.get('Shared_Dirty', 0),
+        'private': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0),
+    }
+
+
+def child_pids(pid: int) -> List[int]:
+    """Direct children of a process, e.g. the workers of a gunicorn master"""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                # The command name may contain spaces; fields after it are fixed
+                fields = stat.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def log_process_memory(label: str, pid: Optional[int] = None):
+    memory = process_memory(pid)
+    if memory:
+        logger.info(
+            f"{label} (pid {pid or os.getpid()}): rss {memory['rss'] / 1024:.1f} MB, pss {memory['pss'] / 1024:.1f} MB, "
+            f"shared {memory['shared'] / 1024:.1f} MB, private {memory['private'] / 1024:.1f} MB"
+        )
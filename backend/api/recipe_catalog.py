@@ -0,0 +1,318 @@
+import json
+import logging
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection
+
+from .recipe_match_table import match_table_state
+
+logger = logging.getLogger(__name__)
+
+
+CATALOG_QUERY = """
+SELECT
+    r.recipe_id,
+    r.title,
+    r.description,
+    r.cuisine,
+    r.difficulty,
+    r.cooking_time,
+    r.ingredients,
+    r.instructions,
+    r.image_url,
+    r.meal_type,
+    r.diet_type,
+    r.serving_size,
+    r.rating,
+    GROUP_CONCAT(DISTINCT i.ingredient_name) as core_ingredients,
+    GROUP_CONCAT(DISTINCT rci.category) as ingredient_categories,
+    GROUP_CONCAT(DISTINCT rci.importance_score) as importance_scores
+FROM recipes r
+LEFT JOIN recipe_core_ingredients rci ON r.recipe_id = rci.recipe_id
+LEFT JOIN ingredients i ON rci.ingredient_id = i.ingredient_id
+WHERE rci.is_essential = 1
+GROUP BY r.recipe_id
+HAVING core_ingredients IS NOT NULL
+"""
+
+# Cheap aggregates that move whenever recipes or their core ingredients change
+FINGERPRINT_QUERY = """
+SELECT
+    (SELECT COUNT(*) FROM recipes),
+    (SELECT COALESCE(SUM(recipe_id), 0) FROM recipes),
+    (SELECT MAX(updated_at) FROM recipes),
+    (SELECT COUNT(*) FROM recipe_core_ingredients),
+    (SELECT COALESCE(SUM(recipe_id * 31 + ingredient_id), 0) FROM recipe_core_ingredients WHERE is_essential = 1)
+"""
+
+
+# The same recipes from the materialized match table (see api.recipe_match_table): no join, no splitting
+MATCH_TABLE_QUERY = """
+SELECT
+    recipe_id, title, description, cuisine, difficulty, cooking_time, ingredients, instructions,
+    image_url, meal_type, diet_type, serving_size, rating,
+    core_ingredients, ingredient_categories, importance_scores,
+    core_ingredient_ids, normalized_ingredients, instruction_steps
+FROM recipe_match_table
+ORDER BY recipe_id
+"""
+
+MATCH_TABLE_FINGERPRINT_QUERY = """
+SELECT COUNT(*), COALESCE(SUM(recipe_id), 0), MAX(refreshed_at) FROM recipe_match_table
+"""
+
+
+def recipe_fields(recipe) -> Dict[str, Any]:
+    """The recipes columns of a catalog row (recipe_id through rating), with display defaults"""
+    return {
+        'recipe_id': recipe[0],
+        'title': recipe[1],
+        'description': recipe[2] or '',
+        'cuisine': recipe[3] or 'Indian',
+        'difficulty': recipe[4] or 'Medium',
+        'cooking_time': recipe[5] or 30,
+        'ingredients': recipe[6],
+        'instructions': recipe[7],
+        'image_url': recipe[8],
+        'meal_type': recipe[9] or 'Dinner',
+        'diet_type': recipe[10] or 'Vegetarian',
+        'serving_size': recipe[11] or 4,
+        'rating': float(recipe[12]) if recipe[12] else 4.5,
+    }
+
+
+def fetch_recipes_with_core_ingredients() -> List[Dict[str, Any]]:
+    """Run the catalog join and build one dict per recipe"""
+    with connection.cursor() as cursor:
+        cursor.execute(CATALOG_QUERY)
+        recipes = cursor.fetchall()
+
+    recipe_list = []
+    for recipe in recipes:
+        recipe_dict = recipe_fields(recipe)
+        recipe_dict.update({
+            'core_ingredients': recipe[13].split(',') if recipe[13] else [],
+            'ingredient_categories': recipe[14].split(',') if recipe[14] else [],
+            'importance_scores': [float(x) for x in recipe[15].split(',')] if recipe[15] else []
+        })
+        recipe_list.append(recipe_dict)
+    return recipe_list
+
+
+def fetch_recipes_from_match_table() -> List[Dict[str, Any]]:
+    """Flat scan of recipe_match_table, one dict per recipe.
+
+    Besides the keys the join produces, recipes carry core_ingredient_ids,
+    normalized_ingredients and instruction_steps; the core ingredient lists are aligned.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(MATCH_TABLE_QUERY)
+        recipes = cursor.fetchall()
+
+    # The list columns are JSON arrays; decode them all as one document instead of per cell
+    decoded = json.loads('[' + ','.join(f'[{",".join(recipe[13:19])}]' for recipe in recipes) + ']')
+
+    recipe_list = []
+    for recipe, (core, categories, scores, ingredient_ids, normalized, steps) in zip(recipes, decoded):
+        recipe_dict = recipe_fields(recipe)
+        recipe_dict.update({
+            'core_ingredients': core,
+            'ingredient_categories': categories,
+            'importance_scores': scores,
+            'core_ingredient_ids': ingredient_ids,
+            'normalized_ingredients': normalized,
+            'instruction_steps': steps,
+        })
+        recipe_list.append(recipe_dict)
+    return recipe_list
+
+
+def match_table_ready() -> bool:
+    """Whether the catalog should load from recipe_match_table: enabled, and fully rebuilt
+    with no failed refresh since"""
+    if not getattr(settings, 'RECIPE_MATCH_TABLE', True):
+        return False
+    try:
+        return match_table_state() == 'built'
+    except Exception as e:
+        # Not migrated yet; the join still works
+        logger.info(f"Recipe match table unavailable, loading the catalog with the join: {e}")
+        return False
+
+
+def fetch_catalog() -> List[Dict[str, Any]]:
+    """Load the catalog from the match table when it is built, else with the join"""
+    if match_table_ready():
+        return fetch_recipes_from_match_table()
+    return fetch_recipes_with_core_ingredients()
+
+
+def fetch_catalog_fingerprint() -> Tuple:
+    """Return a tuple that changes whenever the catalog data changes"""
+    with connection.cursor() as cursor:
+        cursor.execute(MATCH_TABLE_FINGERPRINT_QUERY if match_table_ready() else FINGERPRINT_QUERY)
+        row = cursor.fetchone()
+    return tuple(str(value) for value in row)
+
+
+class CatalogSnapshot:
+    """Read-only view of the recipe catalog at one version.
+
+    Callers share the recipe dicts, so they must never be mutated.
+    """
+
+    def __init__(self, version: int, recipes: List[Dict[str, Any]], fingerprint: Optional[Tuple] = None,
+                 load_seconds: float = 0.0):
+        self.version = version
+        self.recipes = recipes
+        self.by_id = {recipe['recipe_id']: recipe for recipe in recipes}
+        self.fingerprint = fingerprint
+        self.loaded_at = time.time()
+        self.load_seconds = load_seconds
+        self._derived = {}
+        # Reentrant: building one derived structure may build the ones it depends on
+        self._derived_lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.recipes)
+
+    def derived(self, key: str, build):
+        """Return a structure built from this snapshot, building it once per version"""
+        value = self._derived.get(key)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = build(self)
+                    self._derived[key] = value
+        return value
+
+
+class RecipeCatalog:
+    """Process-wide, versioned recipe catalog.
+
+    The catalog join runs once and its result is served from memory. Writes in
+    this process call ``invalidate()`` so the next reader reloads. Changes made
+    by other processes are picked up after ``ttl`` seconds: the current snapshot
+    keeps being served while a background thread compares a cheap fingerprint
+    and reloads only if it moved (stale-while-revalidate). ``max_age`` forces a
+    reload even when the fingerprint looks unchanged.
+    """
+
+    def __init__(self, loader=fetch_catalog, fingerprint=fetch_catalog_fingerprint,
+                 ttl: Optional[float] = None, max_age: Optional[float] = None):
+        self.loader = loader
+        self.fingerprint = fingerprint
+        self.ttl = ttl if ttl is not None else getattr(settings, 'RECIPE_CATALOG_TTL', 60)
+        self.max_age = max_age if max_age is not None else getattr(settings, 'RECIPE_CATALOG_MAX_AGE', 3600)
+        self._snapshot = None
+        self._version = 0
+        self._checked_at = 0.0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._revalidation_lock = threading.Lock()
+
+    def get(self) -> CatalogSnapshot:
+        """Return the current snapshot, loading it on first use or after invalidation"""
+        snapshot = self._snapshot
+        if snapshot is None or self._dirty:
+            with self._lock:
+                if self._snapshot is None or self._dirty:
+                    self._reload()
+                snapshot = self._snapshot
+            if snapshot is None:
+                # Load failed and nothing to fall back to; don't cache the empty result
+                return CatalogSnapshot(0, [])
+            return snapshot
+
+        if time.time() - self._checked_at > self.ttl:
+            self._start_revalidation()
+        return snapshot
+
+    def invalidate(self):
+        """Mark the snapshot stale so the next reader reloads it"""
+        self._dirty = True
+
+    def refresh(self, force: bool = False) -> CatalogSnapshot:
+        """Reload now if the data changed (or unconditionally with force=True)"""
+        with self._lock:
+            if force or self._snapshot is None or self._dirty:
+                self._reload()
+            else:
+                self._revalidate_locked()
+        return self._snapshot or CatalogSnapshot(0, [])
+
+    def status(self) -> Dict[str, Any]:
+        """Describe the current snapshot for /ml/status/"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {'loaded': False, 'version': 0}
+        return {
+            'loaded': True,
+            'version': snapshot.version,
+            'recipe_count': len(snapshot),
+            'age_seconds': round(time.time() - snapshot.loaded_at, 1),
+            'load_seconds': round(snapshot.load_seconds, 3),
+            'stale': self._dirty,
+        }
+
+    def _reload(self):
+        """Run the catalog query and publish a new snapshot (caller holds the lock)"""
+        start = time.time()
+        # Clear first so an invalidate() that races with the query is not lost
+        self._dirty = False
+        fingerprint = None
+        try:
+            if self.fingerprint:
+                fingerprint = self.fingerprint()
+        except Exception as e:
+            logger.error(f"Error checking recipe catalog fingerprint: {e}")
+        try:
+            recipes = self.loader()
+        except Exception as e:
+            logger.error(f"Error loading recipe catalog: {e}")
+            self._dirty = self._snapshot is not None
+            return
+
+        self._version += 1
+        self._snapshot = CatalogSnapshot(self._version, recipes, fingerprint, time.time() - start)
+        self._checked_at = time.time()
+        logger.info(f"Loaded recipe catalog v{self._version}: {len(recipes)} recipes in {time.time() - start:.2f}s")
+
+    def _revalidate_locked(self):
+        """Reload only if the fingerprint moved or the snapshot is too old (caller holds the lock)"""
+        snapshot = self._snapshot
+        if time.time() - snapshot.loaded_at > self.max_age:
+            self._reload()
+            return
+        try:
+            fingerprint = self.fingerprint() if self.fingerprint else None
+        except Exception as e:
+            logger.error(f"Error checking recipe catalog fingerprint: {e}")
+            return
+        if fingerprint != snapshot.fingerprint:
+            self._reload()
+        else:
+            self._checked_at = time.time()
+
+    def _start_revalidation(self):
+        # Only one background check at a time; everyone else keeps the current snapshot
+        if not self._revalidation_lock.acquire(blocking=False):
+            return
+        threading.Thread(target=self._revalidate_in_background, name='recipe-catalog-refresh', daemon=True).start()
+
+    def _revalidate_in_background(self):
+        try:
+            with self._lock:
+                self._revalidate_locked()
+        finally:
+            self._revalidation_lock.release()
+            # Background threads get their own DB connection; don't leak it
+            connection.close()
+
+
+# Global instance
+recipe_catalog = RecipeCatalog()
@@ -0,0 +1,172 @@
+"""
+Maintains recipe_match_table, the materialized read model the catalog loads from.
+
+The catalog used to be a join over recipes, recipe_core_ingredients and
+ingredients whose GROUP_CONCAT strings were split apart again, and requests
+kept normalizing the same ingredient names and splitting the same instruction
+text. Each row of this table holds one catalog recipe with that work done:
+its recipes columns, its essential core ingredients as aligned JSON arrays
+(ids, names, normalized names, importance scores, categories) and its
+instruction steps. Loading the catalog is then a flat scan
+(fetch_recipes_from_match_table).
+
+Rows are rebuilt for the recipes a write touches (recipes_changed); the
+build_match_table command rebuilds all of them. Changes that bypass the app,
+such as scripts writing recipe_core_ingredients directly, need that command.
+
+The table is only read once a full rebuild has finished, which is recorded in
+recipe_match_table_state (match_table_state). Single rows are refreshed only
+while that row exists, i.e. during or after a rebuild, and a failed refresh
+deletes it: a table that may be missing a change is never served, the catalog
+loads with the join until the next rebuild.
+"""
+
+import json
+import logging
+import time
+from itertools import groupby
+from typing import Callable, Iterable, List, Optional
+
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Recipes columns first, in the order recipe_catalog.recipe_fields reads them
+SOURCE_QUERY = """
+SELECT r.recipe_id, r.title, r.description, r.cuisine, r.difficulty, r.cooking_time, r.ingredients,
+       r.instructions, r.image_url, r.meal_type, r.diet_type, r.serving_size, r.rating,
+       i.ingredient_id, i.ingredient_name, rci.importance_score, rci.category
+FROM recipes r
+JOIN recipe_core_ingredients rci ON r.recipe_id = rci.recipe_id
+JOIN ingredients i ON rci.ingredient_id = i.ingredient_id
+WHERE rci.is_essential = 1 AND i.ingredient_name IS NOT NULL AND r.recipe_id IN ({placeholders})
+ORDER BY r.recipe_id, i.ingredient_name, rci.importance_score DESC
+"""
+
+INSERT_QUERY = """
+INSERT INTO recipe_match_table
+    (recipe_id, title, description, cuisine, difficulty, cooking_time, ingredients, instructions,
+     image_url, meal_type, diet_type, serving_size, rating,
+     core_ingredient_ids, core_ingredients, normalized_ingredients, importance_scores, ingredient_categories,
+     instruction_steps, refreshed_at)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# recipe_match_table_state.id of the one marker row
+STATE_ID = 1
+
+# Recipes refreshed per statement; keeps IN lists a sensible size
+REFRESH_CHUNK = 500
+
+
+def build_match_rows(source_rows, normalize: Callable[[str], str],
+                     split_instructions: Callable[[Optional[str]], List[str]]) -> List[tuple]:
+    """Collapse SOURCE_QUERY rows (ordered by recipe) into one table row per recipe"""
+    refreshed_at = time.time()
+    rows = []
+    for _, recipe_rows in groupby(source_rows, key=lambda row: row[0]):
+        recipe_rows = list(recipe_rows)
+        ingredient_ids, names, scores, categories = [], [], [], []
+        for row in recipe_rows:
+            # One entry per ingredient name, like GROUP_CONCAT(DISTINCT ...) in the join
+            if row[14] in names:
+                continue
+            ingredient_ids.append(row[13])
+            names.append(row[14])
+            scores.append(float(row[15]) if row[15] is not None else None)
+            categories.append(row[16])
+        recipe = recipe_rows[0]
+        rows.append((
+            *recipe[:13],
+            json.dumps(ingredient_ids),
+            json.dumps(names),
+            json.dumps([normalize(name.lower()) for name in names]),
+            json.dumps(scores),
+            json.dumps(categories),
+            json.dumps(split_instructions(recipe[7])),
+            refreshed_at,
+        ))
+    return rows
+
+
+def refresh_match_rows(recipe_ids: Iterable[int], normalize: Callable[[str], str],
+                       split_instructions: Callable[[Optional[str]], List[str]]) -> int:
+    """Rebuild the rows of these recipes; deleted recipes, or ones left without
+    essential core ingredients, lose their row. Returns the number of rows written."""
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    written = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(recipe_ids), REFRESH_CHUNK):
+            chunk = recipe_ids[start:start + REFRESH_CHUNK]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(SOURCE_QUERY.format(placeholders=placeholders), chunk)
+            rows = build_match_rows(cursor.fetchall(), normalize, split_instructions)
+            cursor.execute(f"DELETE FROM recipe_match_table WHERE recipe_id IN ({placeholders})", chunk)
+            if rows:
+                cursor.executemany(INSERT_QUERY, rows)
+            written += len(rows)
+    return written
+
+
+def rebuild_match_table(normalize: Callable[[str], str], split_instructions: Callable[[Optional[str]], List[str]],
+                        batch_size: int = 5000) -> int:
+    """Refresh every recipe's row in batches, drop rows of recipes that no longer exist,
+    then mark the table built"""
+    start_match_table_build()
+    written = 0
+    after_id = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT recipe_id FROM recipes WHERE recipe_id > %s ORDER BY recipe_id LIMIT %s", [after_id, batch_size]
+            )
+            recipe_ids = [row[0] for row in cursor.fetchall()]
+        if not recipe_ids:
+            break
+        written += refresh_match_rows(recipe_ids, normalize, split_instructions)
+        after_id = recipe_ids[-1]
+
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM recipe_match_table WHERE recipe_id NOT IN (SELECT recipe_id FROM recipes)")
+    if not mark_match_table_built(written):
+        # A refresh failed while we were rebuilding, so the rows written before it may be stale
+        logger.warning("Recipe match table rebuild raced a failed refresh; not marking it built")
+        return written
+    logger.info(f"Rebuilt recipe match table: {written} rows")
+    return written
+
+
+def match_table_state() -> Optional[str]:
+    """'built' once a full rebuild finished, 'building' while one runs, None before the first
+    one or after a failed refresh"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT built_at FROM recipe_match_table_state WHERE id = %s", [STATE_ID])
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return 'building' if row[0] is None else 'built'
+
+
+def start_match_table_build():
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("DELETE FROM recipe_match_table_state WHERE id = %s", [STATE_ID])
+        cursor.execute(
+            "INSERT INTO recipe_match_table_state (id, started_at, built_at, row_count) VALUES (%s, %s, NULL, NULL)",
+            [STATE_ID, time.time()]
+        )
+
+
+def mark_match_table_built(row_count: int) -> bool:
+    """Record the rebuild as finished; False if the state was cleared meanwhile"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE recipe_match_table_state SET built_at = %s, row_count = %s WHERE id = %s",
+            [time.time(), row_count, STATE_ID]
+        )
+        return cursor.rowcount == 1
+
+
+def clear_match_table_state():
+    """Stop the catalog reading the table, and single rows being refreshed, until the next rebuild"""
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM recipe_match_table_state WHERE id = %s", [STATE_ID])
@@ -0,0 +1,100 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+from django.conf import settings
+
+from .ingredient_normalizer import normalize_ingredient_name
+
+logger = logging.getLogger(__name__)
+
+
+def canonical_ingredients(user_ingredients: List[str]) -> Tuple[str, ...]:
+    """Normalized, deduplicated and sorted form of a user's ingredient list.
+
+    Matching only ever looks at the normalized name, so lists that differ in
+    case, order, quantities or plurals get the same key. Blank entries never
+    match anything and are dropped; an entry that is pure noise ("2 cups")
+    normalizes to "" and is kept, because it matches every recipe.
+    """
+    return tuple(sorted({
+        normalize_ingredient_name(ingredient.lower())
+        for ingredient in user_ingredients
+        if ingredient
+    }))
+
+
+class RecommendationCache:
+    """Bounded LRU cache of recommendation results for one catalog version.
+
+    Entries are dropped as soon as a lookup arrives for a newer catalog
+    version, and ``clear()`` is called when recipes are written.
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size if max_size is not None else getattr(settings, 'ML_RESULT_CACHE_SIZE', 1024)
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key(self, namespace: str, user_ingredients: List[str], **params) -> Tuple:
+        return (namespace, canonical_ingredients(user_ingredients), tuple(sorted(params.items())))
+
+    def get(self, version: int, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        """Return a copy of the cached result, or None on a miss"""
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            if version != self._version:
+                self._reset(version)
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers get their own dicts so they can't alter what is cached
+        return [dict(item) for item in result]
+
+    def put(self, version: int, key: Tuple, result: List[Dict[str, Any]]):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if version != self._version:
+                self._reset(version)
+            self._entries[key] = [dict(item) for item in result]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. after a recipe was added, edited or deleted"""
+        with self._lock:
+            self._reset(None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for /ml/status/ so the cache can be sized"""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.max_size > 0,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+    def _reset(self, version: Optional[int]):
+        if self._entries:
+            self.invalidations += 1
+            logger.info(f"Cleared {len(self._entries)} cached recommendation results")
+        self._entries.clear()
+        self._version = version
@@ -1,3 +1,925 @@
-from django.test import TestCase
+import io
+from contextlib import ExitStack
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .model_store import TREE_SURGERY_SKLEARN, sklearn_version, tree_surgery_verified
+
+
+def clustered_rows(labels, n_features=6, per_label=20, seed=0):
+    """Separable training rows: label i is a tight cluster around 3 * i in every feature"""
+    rng = np.random.RandomState(seed)
+    X = np.vstack([rng.normal(3 * i, 0.1, size=(per_label, n_features)) for i in range(len(labels))])
+    y = np.repeat(labels, per_label)
+    return X, y
+
+
+CATALOG_INGREDIENTS = [
+    'onion', 'tomato', 'green chilli', 'red chilli powder', 'cumin seeds', 'turmeric powder', 'garlic', 'ginger',
+    'paneer', 'basmati rice', 'toor dal', 'coriander leaves', 'potato', 'cauliflower', 'spinach', 'ghee',
+    'garam masala', 'chickpeas', 'yogurt', 'cream', 'butter', 'salt', 'mustard seeds', 'curry leaves', 'coconut',
+    'tamarind', 'jaggery', 'green peas', 'kasuri methi', 'cashews',
+]
+
+# Exact names, plurals, regional aliases, misspellings, partial names and unknowns
+PANTRIES = [
+    ['Onions', 'tomatoes', 'jeera', 'haldi'],
+    ['paneer', 'panner', 'cream', 'butter', 'kasuri methi'],
+    ['basmati rice', 'ghee', 'cashew'],
+    ['chilli', 'garlic', 'adrak', 'Green Chillies'],
+    ['dragonfruit'],
+    ['dal', 'salt', 'spinach', 'curry leaf', 'coconut milk'],
+    [],
+]
+
+
+def synthetic_catalog(n_recipes=150, seed=0):
+    """Catalog snapshot of recipes drawn from CATALOG_INGREDIENTS, shaped like fetch_catalog's,
+    with importance scores aligned like the match table's"""
+    from .recipe_catalog import CatalogSnapshot
+
+    rng = np.random.RandomState(seed)
+    recipes = []
+    for recipe_id in range(1, n_recipes + 1):
+        ingredient_ids = list(dict.fromkeys(rng.randint(len(CATALOG_INGREDIENTS), size=rng.randint(2, 8)).tolist()))
+        names = [CATALOG_INGREDIENTS[ingredient_id] for ingredient_id in ingredient_ids]
+        recipes.append({
+            'recipe_id': recipe_id, 'title': f'Recipe {recipe_id}', 'description': '',
+            'cuisine': ('Punjabi', 'South Indian')[recipe_id % 2], 'difficulty': 'Easy', 'cooking_time': 30,
+            'ingredients': '\n'.join(names), 'instructions': '1. Cook', 'image_url': None, 'meal_type': 'Dinner',
+            'diet_type': 'Vegetarian', 'serving_size': 4, 'rating': 4.0,
+            'core_ingredients': names,
+            'ingredient_categories': ['base'] * len(names),
+            'importance_scores': rng.choice([0.5, 1.0, 2.0, 5.0], size=len(names)).tolist(),
+            'core_ingredient_ids': [ingredient_id + 1 for ingredient_id in ingredient_ids],
+        })
+    return CatalogSnapshot(1, recipes)
+
+
+def in_memory_model(stack, snapshot, engine='index', neighbour_table=None):
+    """A RecipeMLModel serving snapshot with no database, artifacts or training jobs"""
+    from django.test.utils import override_settings
+    from .ml_model import RecipeMLModel
+
+    model = RecipeMLModel()
+    model.scoring_engine = engine
+    ingredients = list(enumerate(CATALOG_INGREDIENTS, 1))
+    stack.enter_context(mock.patch.object(model, 'get_catalog', return_value=snapshot))
+    stack.enter_context(mock.patch.object(model, 'ensure_trained', return_value=False))
+    stack.enter_context(mock.patch('api.ml_model.fetch_ingredients', return_value=ingredients))
+    stack.enter_context(mock.patch('api.ml_model.fetch_ingredients_fingerprint', return_value=(len(ingredients),)))
+    if neighbour_table is None:
+        stack.enter_context(override_settings(ML_NEIGHBOUR_TABLE=False))
+    else:
+        stack.enter_context(mock.patch(
+            'api.ml_model.load_neighbour_table', return_value=(neighbour_table, model.neighbour_table_metadata())
+        ))
+    return model
+
+
+class IncrementalTrainingTests(SimpleTestCase):
+    """grow_forest and pad_tree_classes rebuild trees through sklearn's private Tree state"""
+
+    def setUp(self):
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.preprocessing import LabelEncoder
+
+        self.old_labels = np.array(['dal', 'paneer tikka', 'rajma'])
+        X, y = clustered_rows(self.old_labels)
+        self.old_encoder = LabelEncoder().fit(y)
+        self.forest = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, self.old_encoder.transform(y))
+        self.X_old = X
+
+    def test_verified_sklearn(self):
+        self.assertTrue(
+            tree_surgery_verified(),
+            f'scikit-learn {sklearn_version()} is not the verified {TREE_SURGERY_SKLEARN}: '
+            f'run these tests against it, then bump TREE_SURGERY_SKLEARN'
+        )
+
+    def test_pad_tree_classes_moves_columns(self):
+        from .incremental_training import pad_tree_classes
+
+        positions = np.array([1, 3, 4])
+        padded = pad_tree_classes(self.forest.estimators_[0], positions, 5)
+        expected = np.zeros((len(self.X_old), 5))
+        expected[:, positions] = self.forest.estimators_[0].predict_proba(self.X_old)
+        np.testing.assert_allclose(padded.predict_proba(self.X_old), expected)
+
+    def test_grow_forest_predicts_new_classes(self):
+        from sklearn.preprocessing import LabelEncoder
+        from .incremental_training import grow_forest
+
+        labels = np.array(['dal', 'paneer tikka', 'rajma', 'aloo gobi', 'chole'])
+        X, y = clustered_rows(labels)
+        encoder = LabelEncoder().fit(list(self.old_encoder.classes_) + list(y))
+        grown = grow_forest(
+            self.forest, self.old_encoder.classes_[self.forest.classes_], encoder,
+            X, encoder.transform(y), n_new_trees=10, random_state=1
+        )
+
+        self.assertEqual(grown.n_estimators, 15)
+        probabilities = grown.predict_proba(X)
+        self.assertEqual(probabilities.shape, (len(X), len(encoder.classes_)))
+        np.testing.assert_allclose(probabilities.sum(axis=1), 1.0)
+
+        predicted = encoder.inverse_transform(probabilities.argmax(axis=1))
+        for label in ('aloo gobi', 'chole'):
+            rows = y == label
+            self.assertTrue((predicted[rows] == label).all(), f'{label} rows not predicted as {label}')
+        # Old trees still vote for the classes they knew
+        rows = y == 'rajma'
+        self.assertTrue((predicted[rows] == 'rajma').all())
+
+
+class FeatureHashingTests(SimpleTestCase):
+    """feature_hashing re-implements sklearn's MurmurHash3 and must match it bit for bit"""
+
+    def strings(self):
+        rng = np.random.RandomState(0)
+        edge_cases = ['', 'a', 'ab', 'abc', 'abcd', 'abcde', 'jeera', 'green chilli', 'haldi powder',
+                      'é', 'jalapeño', 'मिर्च', 'ḧ', '🌶', 'crème fraîche', '\x00', '\xff\xfe']
+        alphabet = list('abcdefghijklmnopqrstuvwxyz ') + ['é', 'ñ', 'ü', 'क', 'ष', '中', '🍅']
+        random_strings = [''.join(rng.choice(alphabet, size=rng.randint(0, 24))) for _ in range(500)]
+        return edge_cases + random_strings
+
+    def test_murmurhash_matches_sklearn(self):
+        from sklearn.utils import murmurhash3_32 as sklearn_murmurhash3_32
+        from .feature_hashing import murmurhash3_32
+
+        for text in self.strings():
+            data = text.encode('utf-8')
+            # Every tail length, since the last 1-3 bytes are mixed in separately
+            for end in range(max(len(data) - 3, 0), len(data) + 1):
+                for seed in (0, 42):
+                    self.assertEqual(
+                        murmurhash3_32(data[:end], seed), sklearn_murmurhash3_32(data[:end], seed),
+                        f'{data[:end]!r} seed {seed}'
+                    )
+
+    def test_feature_columns_match_feature_hasher(self):
+        from sklearn.feature_extraction import FeatureHasher
+        from .feature_hashing import feature_column, murmurhash3_32
+
+        # Constructed to hash to -2**31, the one value abs() can't handle in 32 bits
+        self.assertEqual(murmurhash3_32(b'tzir&}ke'), -2 ** 31)
+        strings = [text for text in self.strings() if text] + ['tzir&}ke']
+        for n_features in (2 ** 4, 2 ** 14, 1000):
+            hasher = FeatureHasher(n_features=n_features, input_type='string', alternate_sign=False)
+            columns = hasher.transform([[text] for text in strings]).tocsr().indices
+            self.assertEqual([feature_column(text, n_features) for text in strings], columns.tolist())
+
+
+class CompiledForestTests(SimpleTestCase):
+    """CompiledForest must score like the scaler + forest pipeline it was exported from"""
+
+    def fitted_pipeline(self, with_mean):
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+        rng = np.random.RandomState(0)
+        X = rng.rand(300, 12) * rng.randint(1, 50, size=12)
+        titles = np.array([f'recipe {i}' for i in range(8)])[(X[:, 0] * 7 + X[:, 3]).astype(int) % 8]
+        encoder = LabelEncoder().fit(titles)
+        scaler = StandardScaler(with_mean=with_mean).fit(X)
+        forest = RandomForestClassifier(n_estimators=12, max_depth=8, random_state=0)
+        forest.fit(scaler.transform(X), encoder.transform(titles))
+        return forest, encoder, scaler, rng.rand(100, 12) * 50
+
+    def test_predict_proba_matches_sklearn(self):
+        from scipy import sparse
+        from .compiled_forest import CompiledForest, compile_forest
+
+        for with_mean in (False, True):
+            forest, encoder, scaler, X = self.fitted_pipeline(with_mean)
+            compiled = compile_forest(forest, encoder, scaler)
+            expected = forest.predict_proba(scaler.transform(X))
+
+            self.assertEqual(list(compiled.labels), list(encoder.classes_[forest.classes_]))
+            np.testing.assert_allclose(compiled.predict_proba(X), expected, atol=1e-6)
+            np.testing.assert_allclose(compiled.predict_proba(sparse.csr_matrix(X)), expected, atol=1e-6)
+
+            loaded, _ = CompiledForest.load(io.BytesIO(compiled.to_bytes()))
+            np.testing.assert_allclose(loaded.predict_proba(X), expected, atol=1e-6)
+
+
+class WeightedIndexTests(SimpleTestCase):
+    """Block-max pruning must return exactly what scoring every recipe would"""
+
+    def weighted_catalog(self, n_recipes=3000, n_terms=60, seed=0):
+        from .ingredient_index import IngredientIndex
+
+        rng = np.random.RandomState(seed)
+        # Skewed term frequencies, so some posting lists span every block and others a few
+        popularity = 1.0 / np.arange(1, n_terms + 1)
+        popularity /= popularity.sum()
+        recipes, weights = [], []
+        for _ in range(n_recipes):
+            terms = rng.choice(n_terms, size=rng.randint(1, 12), p=popularity)
+            recipes.append({'ing': [f'ingredient {term}' for term in terms]})
+            roll = rng.rand()
+            if roll < 0.15:
+                weights.append(None)
+            elif roll < 0.2:
+                weights.append([0.0] * len(terms))
+            else:
+                weights.append([float(weight) for weight in rng.choice([0.0, 0.5, 1.0, 2.5, 7.0], size=len(terms))])
+        return IngredientIndex(recipes, lambda recipe: recipe['ing']), weights
+
+    def brute_force(self, index, weights, matched_terms, k, min_matching, min_percentage):
+        results = []
+        for position, term_ids in enumerate(index.recipe_term_ids):
+            recipe_weights = weights[position]
+            if recipe_weights is None or sum(recipe_weights) <= 0:
+                recipe_weights = [1.0] * len(term_ids)
+            total = sum(recipe_weights)
+            matched = [weight for term_id, weight in zip(term_ids, recipe_weights) if term_id in matched_terms]
+            count = len(matched)
+            if count and count >= min_matching and count / len(term_ids) * 100 > min_percentage:
+                results.append((round(sum(matched) / total, 12), count, position))
+        results.sort(key=lambda result: (-result[0], -result[1], result[2]))
+        return results[:k]
+
+    def assertSameResults(self, actual, expected, message):
+        self.assertEqual([result[1:] for result in actual], [result[1:] for result in expected], message)
+        np.testing.assert_allclose([result[0] for result in actual], [result[0] for result in expected],
+                                   atol=1e-9, err_msg=message)
+
+    def test_pruned_matches_unpruned_and_brute_force(self):
+        from .ingredient_index import WeightedIngredientIndex
+
+        index, weights = self.weighted_catalog()
+        rng = np.random.RandomState(1)
+        skipped = 0
+        for block_size in (7, 64, 1024):
+            weighted = WeightedIngredientIndex(index, weights, block_size=block_size)
+            for _ in range(40):
+                matched_terms = set(rng.choice(len(index.terms), size=rng.randint(1, 15), replace=False).tolist())
+                k = int(rng.choice([1, 5, 20, 500]))
+                min_matching = int(rng.randint(1, 3))
+                min_percentage = float(rng.choice([0, 25, 50]))
+                message = f'block_size {block_size}, terms {sorted(matched_terms)}, k {k}'
+
+                stats = {}
+                pruned = weighted.top_k(matched_terms, k, min_matching, min_percentage, stats=stats)
+                unpruned = weighted.top_k(matched_terms, k, min_matching, min_percentage, prune=False)
+                expected = self.brute_force(index, weights, matched_terms, k, min_matching, min_percentage)
+                self.assertSameResults(unpruned, expected, message)
+                self.assertEqual(pruned, unpruned, message)
+                skipped += stats['skipped']
+        self.assertGreater(skipped, 0, 'pruning never skipped a block')
+
+
+class RecommendationCacheTests(SimpleTestCase):
+    """RecommendationCache is an LRU keyed by canonical pantry, valid for one catalog version"""
+
+    def test_key_is_canonical(self):
+        from .result_cache import RecommendationCache
+
+        cache = RecommendationCache(max_size=4)
+        self.assertEqual(
+            cache.key('predict', ['Tomatoes', '2 cups onion', 'salt'], top_n=5),
+            cache.key('predict', ['salt', 'onions', 'tomato', 'salt'], top_n=5)
+        )
+        self.assertNotEqual(cache.key('predict', ['salt'], top_n=5), cache.key('predict', ['salt'], top_n=6))
+
+    def test_least_recently_used_is_evicted(self):
+        from .result_cache import RecommendationCache
+
+        cache = RecommendationCache(max_size=2)
+        a, b, c = (cache.key('predict', [name]) for name in ('dal', 'rice', 'paneer'))
+        cache.put(1, a, [{'recipe_id': 1}])
+        cache.put(1, b, [{'recipe_id': 2}])
+        self.assertIsNotNone(cache.get(1, a))
+        cache.put(1, c, [{'recipe_id': 3}])
+
+        self.assertIsNone(cache.get(1, b))
+        self.assertEqual(cache.get(1, a), [{'recipe_id': 1}])
+        self.assertEqual(cache.get(1, c), [{'recipe_id': 3}])
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_results_are_copied_on_put_and_get(self):
+        from .result_cache import RecommendationCache
+
+        cache = RecommendationCache(max_size=2)
+        key = cache.key('predict', ['dal'])
+        result = [{'recipe_id': 1, 'confidence_score': 80}]
+        cache.put(1, key, result)
+        result[0]['confidence_score'] = 0
+
+        cached = cache.get(1, key)
+        self.assertEqual(cached[0]['confidence_score'], 80)
+        cached[0]['confidence_score'] = 0
+        self.assertEqual(cache.get(1, key)[0]['confidence_score'], 80)
+
+    def test_new_catalog_version_drops_entries(self):
+        from .result_cache import RecommendationCache
+
+        cache = RecommendationCache(max_size=2)
+        key = cache.key('predict', ['dal'])
+        cache.put(1, key, [{'recipe_id': 1}])
+        self.assertIsNone(cache.get(2, key))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    @override_settings(RECIPE_MATCH_TABLE=False)
+    def test_recipes_changed_clears_cache(self):
+        from .ml_model import recipe_ml_model, recipes_changed
+        from .training_jobs import training_jobs
+
+        cache = recipe_ml_model.result_cache
+        key = cache.key('predict', ['dal'])
+        cache.put(7, key, [{'recipe_id': 1}])
+        with mock.patch.object(training_jobs, 'schedule_incremental') as schedule_incremental:
+            recipes_changed([1])
+        schedule_incremental.assert_called_once_with()
+        self.assertIsNone(cache.get(7, key))
+
+
+class IngredientMatchingTests(SimpleTestCase):
+    """find_matching_ingredients and calculate_recipe_usability work on plain lists, without a database"""
+
+    user_ingredients = ['Onions', 'tomato', 'green chilli', 'jeera', 'paneer', '2 cups rice']
+    recipes = [
+        ['onion', 'tomato', 'garlic'],
+        ['chilli', 'cumin seeds', 'basmati rice', 'paneer cubes'],
+        ['Potato', 'cauliflower'],
+        [],
+    ]
+
+    def test_matches_pairwise_reference(self):
+        from .ml_model import RecipeMLModel
+
+        model = RecipeMLModel()
+        for recipe_ingredients in self.recipes:
+            self.assertEqual(
+                model.find_matching_ingredients(self.user_ingredients, recipe_ingredients),
+                model.find_matching_ingredients_pairwise(self.user_ingredients, recipe_ingredients)
+            )
+
+    def test_recipe_usability(self):
+        from .ml_model import RecipeMLModel
+
+        model = RecipeMLModel()
+        usability, can_make = model.calculate_recipe_usability(self.recipes[0], self.user_ingredients)
+        self.assertAlmostEqual(usability, 2 / 3 * 100)
+        self.assertTrue(can_make)
+        self.assertEqual(model.calculate_recipe_usability(self.recipes[2], self.user_ingredients), (0.0, False))
+        self.assertEqual(model.calculate_recipe_usability([], self.user_ingredients), (0, False))
+
+
+class NormalizerTests(SimpleTestCase):
+    """normalize_ingredient_name must keep the original five-pass output: stored data is keyed on it"""
+
+    edge_inputs = [
+        '', ' ', 'Onion', 'Tomatoes', 'green chillies', 'salt, to taste', '1/2 cup rice', '1 1/2 cups milk',
+        '1.5 kg chicken', '250g paneer', '2 tbsp ghee (melted)', 'fresh coriander leaves', 'finely chopped onions',
+        '2fresh', 'fresh2', '1fresh mint', 'a(x)fresh', '(optional) fresh basil', 'salt/2 cups', '1/2/3 cup',
+        '-g/2g', 'a/1la', 'a/,1/2', ',2/ll(', '1.5/g)', '/1.5/a', 'x.1/2 cup', '2 large eggs', '3 lemons',
+        '10 to taste salt', 'tomato(s)', 'peas.', 'a.b,c', '2 slices bread', 'of the and', 'gram flour',
+    ]
+
+    def test_matches_five_pass_original(self):
+        from .ingredient_normalizer import normalize_ingredient_name
+        from .management.commands.benchmark_normalizer import legacy_normalize_ingredient_name
+
+        for text in self.edge_inputs:
+            self.assertEqual(normalize_ingredient_name(text), legacy_normalize_ingredient_name(text), repr(text))
+
+    def test_matches_five_pass_original_on_random_fragments(self):
+        from .ingredient_normalizer import normalize_ingredient_name
+        from .management.commands.benchmark_normalizer import legacy_normalize_ingredient_name
+
+        fragments = ['1', '2', '1/2', '1.5', ',', '.', '/', ' ', 'cup', 'cups', 'g', 'l', 'tsp', 'to taste',
+                     '(', ')', '(x)', 'fresh', 'chopped', 'salt', 'onion', 'a', 'tomatoes', '-']
+        rng = np.random.RandomState(0)
+        for _ in range(5000):
+            text = ''.join(rng.choice(fragments, size=rng.randint(1, 7)))
+            self.assertEqual(normalize_ingredient_name(text), legacy_normalize_ingredient_name(text), repr(text))
+
+
+class ScoringEngineTests(SimpleTestCase):
+    """Every RECIPE_SCORING_ENGINE must return exactly what the pairwise 'loop' engine returns"""
+
+    engines = ('loop', 'index', 'matrix', 'bitset')
+    thresholds = [(2, 40.0), (1, 0.0), (3, 60.0)]
+
+    def predictions(self, engine):
+        snapshot = synthetic_catalog()
+        with ExitStack() as stack:
+            model = in_memory_model(stack, snapshot, engine)
+            return [
+                model.predict(pantry, top_n=10, min_matching_ingredients=min_matching,
+                              min_match_percentage=min_percentage, ranking='match')
+                for pantry in PANTRIES for min_matching, min_percentage in self.thresholds
+            ]
+
+    def test_engines_match_loop(self):
+        expected = self.predictions('loop')
+        self.assertTrue(any(expected), 'no pantry matched anything')
+        for engine in self.engines[1:]:
+            self.assertEqual(self.predictions(engine), expected, engine)
+
+    def test_matching_ingredients_match_find_matching_ingredients(self):
+        snapshot = synthetic_catalog()
+        for engine in self.engines:
+            with ExitStack() as stack:
+                model = in_memory_model(stack, snapshot, engine)
+                for pantry in PANTRIES:
+                    resolved = model.resolve_user_ingredients(snapshot, pantry)
+                    for recipe in model.predict(pantry, top_n=20, min_matching_ingredients=1,
+                                                min_match_percentage=0, ranking='match'):
+                        count, matching = model.find_matching_ingredients(resolved, recipe['ingredients'])
+                        self.assertEqual(recipe['matching_ingredients'], matching, f'{engine} {pantry}')
+                        self.assertEqual(recipe['matching_ingredients_count'], count)
+
+    def test_predict_many_matches_predict(self):
+        snapshot = synthetic_catalog()
+        for engine in self.engines:
+            with ExitStack() as stack:
+                model = in_memory_model(stack, snapshot, engine)
+                expected = [model.predict(pantry, top_n=10, ranking='match') for pantry in PANTRIES]
+                model.result_cache.clear()
+                queries = [{'ingredients': pantry, 'top_n': 10} for pantry in PANTRIES]
+                self.assertEqual(model.predict_many(queries, ranking='match'), expected, engine)
+
+
+class WeightedRankingTests(SimpleTestCase):
+    """predict(ranking='weighted') must rank like importance-weighted pairwise matching"""
+
+    def brute_force(self, model, snapshot, pantry, top_n, min_matching, min_percentage):
+        resolved = model.resolve_user_ingredients(snapshot, pantry)
+        ranked = []
+        for position, recipe in enumerate(snapshot.recipes):
+            names = recipe['core_ingredients']
+            count, matching = model.find_matching_ingredients(resolved, names)
+            if not count or count < min_matching or count / len(names) * 100 <= min_percentage:
+                continue
+            weights = model.importance_weights(recipe)
+            if weights is None or sum(weights) <= 0:
+                weights = [1.0] * len(names)
+            score = sum(weight for name, weight in zip(names, weights) if name in matching) / sum(weights)
+            ranked.append((round(score, 12), count, position))
+        ranked.sort(key=lambda entry: (-entry[0], -entry[1], entry[2]))
+        return [
+            (snapshot.recipes[position]['recipe_id'], round(score * 100, 2), count)
+            for score, count, position in ranked[:top_n]
+        ]
+
+    def assertRanksLikeBruteForce(self, snapshot):
+        with ExitStack() as stack:
+            model = in_memory_model(stack, snapshot)
+            for pantry in PANTRIES:
+                for min_matching, min_percentage in ((2, 40.0), (1, 0.0)):
+                    results = model.predict(pantry, top_n=10, min_matching_ingredients=min_matching,
+                                            min_match_percentage=min_percentage, ranking='weighted')
+                    self.assertEqual(
+                        [(r['recipe_id'], r['weighted_score'], r['matching_ingredients_count']) for r in results],
+                        self.brute_force(model, snapshot, pantry, 10, min_matching, min_percentage),
+                        pantry
+                    )
+
+    def test_weighted_by_importance(self):
+        self.assertRanksLikeBruteForce(synthetic_catalog())
+
+    def test_join_catalog_weighs_equally_and_warns(self):
+        from .recipe_catalog import CatalogSnapshot
+
+        recipes = [
+            {key: value for key, value in recipe.items() if key != 'core_ingredient_ids'}
+            for recipe in synthetic_catalog().recipes
+        ]
+        with self.assertLogs('api.ml_model', 'WARNING') as logs:
+            self.assertRanksLikeBruteForce(CatalogSnapshot(1, recipes))
+        self.assertEqual(len([line for line in logs.output if 'no aligned importance scores' in line]), 1)
+
+
+def pairwise_terms(model, terms, query):
+    """Ids of the terms find_matching_ingredients_pairwise matches query with"""
+    return {
+        term_id for term_id, term in enumerate(terms)
+        if term and model.find_matching_ingredients_pairwise([query], [term])[0]
+    }
+
+
+def fuzzy_term_index(model, terms):
+    """FuzzyTermIndex with the thresholds get_fuzzy_index uses"""
+    from .ingredient_index import FuzzyTermIndex
+
+    return FuzzyTermIndex(
+        terms, model.normalize_ingredient_name,
+        min_ratio=max(model.SPELLING_THRESHOLD, model.MATCH_THRESHOLD), min_overlap=model.MATCH_THRESHOLD
+    )
+
+
+def neighbour_table(model, vocabulary):
+    """Neighbour table built the way the build_neighbour_table command builds it"""
+    from .neighbour_table import build_neighbour_table
+
+    return build_neighbour_table(
+        vocabulary, model.normalize_ingredient_name, model.ingredient_similarity_score,
+        threshold=model.MATCH_THRESHOLD, min_ratio=max(model.SPELLING_THRESHOLD, model.MATCH_THRESHOLD)
+    )
+
+
+class FuzzyMatchingTests(SimpleTestCase):
+    """FuzzyTermIndex must find exactly the terms a pairwise scan of the vocabulary matches"""
+
+    terms = CATALOG_INGREDIENTS + [
+        'Tomatoes', 'green chillies', 'chilli', 'red chilli', 'chili', 'rice', 'brown rice', 'dal', 'moong dal',
+        'ginger garlic paste', 'garlic cloves', 'coriander', 'coriander powder', 'peas', 'ice', 'oil', 'ab', '',
+        'fresh cream', 'cream cheese', 'paneer tikka masala', '2 cups milk', 'milk (full fat)',
+    ]
+    queries = terms + [
+        'panner', 'tomatoe', 'chilly', 'green chili', 'cumin', 'jeera', 'corriander leaves', 'garam', 'masala',
+        'basmati', 'rice flour', 'dal makhani', 'curry leaf', 'a', 'ginger-garlic', 'cheese', 'dragonfruit',
+    ]
+
+    def test_matches_pairwise_scan(self):
+        from .ml_model import RecipeMLModel
+
+        model = RecipeMLModel()
+        fuzzy_index = fuzzy_term_index(model, self.terms)
+        matched_any = 0
+        for query in self.queries:
+            query = query.lower()
+            expected = pairwise_terms(model, self.terms, query)
+            self.assertEqual(fuzzy_index.match_terms(query, model.ingredient_matches), expected, repr(query))
+            self.assertTrue(expected <= {
+                term_id for name_id in fuzzy_index.candidate_names(query) for term_id in fuzzy_index.name_terms[name_id]
+            })
+            matched_any += bool(expected)
+        self.assertGreater(matched_any, len(self.queries) // 2)
+
+
+class NeighbourLookupTests(SimpleTestCase):
+    """A precomputed neighbour table must give the same matches as FuzzyTermIndex, even when stale"""
+
+    terms = FuzzyMatchingTests.terms
+
+    def lookup(self, model, vocabulary):
+        from .neighbour_table import NeighbourLookup
+
+        return NeighbourLookup(neighbour_table(model, vocabulary), fuzzy_term_index(model, self.terms))
+
+    def assertMatchesPairwise(self, model, lookup):
+        covered = 0
+        for query in FuzzyMatchingTests.queries:
+            query = query.lower()
+            matched = lookup.match_terms(query, model.ingredient_matches)
+            if matched is None:
+                # No row: predict falls back to FuzzyTermIndex
+                continue
+            covered += 1
+            self.assertEqual(matched, pairwise_terms(model, self.terms, query), repr(query))
+        self.assertGreater(covered, 0)
+
+    def test_table_matches_pairwise(self):
+        from .ml_model import RecipeMLModel
+
+        model = RecipeMLModel()
+        lookup = self.lookup(model, [term for term in self.terms if term])
+        self.assertMatchesPairwise(model, lookup)
+
+    def test_stale_table_matches_pairwise(self):
+        from .ml_model import RecipeMLModel
+
+        model = RecipeMLModel()
+        # Built before half of the catalog's names existed
+        lookup = self.lookup(model, [term for term in self.terms[::2] if term])
+        self.assertTrue(lookup.uncovered)
+        self.assertMatchesPairwise(model, lookup)
+
+    def test_predict_with_table_matches_without(self):
+        with ExitStack() as stack:
+            model = in_memory_model(stack, synthetic_catalog())
+            expected = [model.predict(pantry, top_n=10, min_matching_ingredients=1, ranking='match') for pantry in PANTRIES]
+        # Stale too: built before half of the catalog's names existed
+        table = neighbour_table(model, CATALOG_INGREDIENTS[::2] + ['chilli', 'cashew', 'panner'])
+        # A fresh snapshot, since the neighbour lookup is built once per snapshot
+        snapshot = synthetic_catalog()
+        with ExitStack() as stack:
+            model = in_memory_model(stack, snapshot, neighbour_table=table)
+            self.assertIsNotNone(model.get_neighbour_lookup(snapshot).table)
+            self.assertEqual(
+                [model.predict(pantry, top_n=10, min_matching_ingredients=1, ranking='match') for pantry in PANTRIES],
+                expected
+            )
+
+
+class IngredientResolverTests(SimpleTestCase):
+    """IngredientResolver: exact names, plurals, regional aliases, and the lowest id on ties"""
+
+    def resolver(self, ingredients, aliases=None):
+        from .ingredient_normalizer import normalize_ingredient_name
+        from .ingredient_resolver import IngredientResolver
+
+        return IngredientResolver(ingredients, normalize_ingredient_name, aliases)
+
+    def test_plurals_and_noise(self):
+        resolver = self.resolver([(1, 'Tomato'), (2, 'curry leaf'), (3, 'green chilli'), (4, 'berry')])
+        self.assertEqual(resolver.resolve('tomatoes'), 1)
+        self.assertEqual(resolver.resolve('2 Tomatoes (chopped)'), 1)
+        self.assertEqual(resolver.resolve('curry leaves'), 2)
+        self.assertEqual(resolver.resolve('Green Chillies'), 3)
+        self.assertEqual(resolver.resolve('berries'), 4)
+        self.assertIsNone(resolver.resolve('dragonfruit'))
+        self.assertIsNone(resolver.resolve(''))
+        self.assertEqual(resolver.canonical_name('TOMATOES'), 'tomato')
+        self.assertEqual(resolver.canonical_name('dragonfruit'), 'dragonfruit')
+
+    def test_regional_aliases(self):
+        resolver = self.resolver([(1, 'cumin seeds'), (2, 'cumin'), (3, 'onion'), (4, 'coriander')])
+        self.assertEqual(resolver.resolve('jeera'), 1)
+        self.assertEqual(resolver.resolve('Pyaz'), 3)
+        # 'coriander leaves' isn't in the table, so the alias's next target is used
+        self.assertEqual(resolver.resolve('dhania'), 4)
+        # No target in the table: left to fuzzy matching
+        self.assertIsNone(resolver.resolve('haldi'))
+        self.assertEqual(self.resolver([(2, 'cumin')]).resolve('jeera'), 2)
+
+    def test_names_win_over_aliases_and_normalized_forms(self):
+        resolver = self.resolver([(1, 'fresh tomato'), (2, 'tomato'), (3, 'jeera'), (4, 'cumin seeds')])
+        # 'fresh tomato' normalizes to 'tomato', but another ingredient is called exactly that
+        self.assertEqual(resolver.resolve('tomato'), 2)
+        self.assertEqual(resolver.resolve('fresh tomato'), 1)
+        # An ingredient named like an alias keeps its name
+        self.assertEqual(resolver.resolve('jeera'), 3)
+
+    def test_lowest_id_wins_ties(self):
+        resolver = self.resolver([(7, 'onion'), (2, 'Onion '), (9, 'potatoes'), (4, 'potato (large)'), (5, 'potato')])
+        self.assertEqual(resolver.resolve('onion'), 2)
+        self.assertEqual(resolver.resolve('onions'), 2)
+        # An exact name owns its normalized form, even against a lower id normalizing to it
+        self.assertEqual(resolver.resolve('potato'), 5)
+        self.assertEqual(resolver.resolve('2 potatoes'), 5)
+        # Otherwise the lowest id normalizing to it
+        self.assertEqual(self.resolver([(9, 'potatoes'), (4, 'potato (large)')]).resolve('potato'), 4)
+        resolver = self.resolver([(1, 'ghee')], aliases={'desi ghee': ('clarified butter', 'ghee')})
+        self.assertEqual(resolver.resolve('desi ghee'), 1)
+
+
+class IngredientExtractorTests(SimpleTestCase):
+    """Aho-Corasick extraction: every occurrence found, then leftmost-longest on word boundaries"""
+
+    ingredients = [(1, 'chilli'), (2, 'green chilli'), (3, 'red chilli powder'), (4, 'tomato'), (5, 'apple'),
+                   (6, 'curry leaf'), (7, 'berry'), (8, 'cumin seeds'), (9, 'butter'), (10, 'milk'), (11, 'onion')]
+
+    def extractor(self):
+        from .ingredient_extractor import IngredientExtractor, extraction_patterns
+        from .ingredient_normalizer import normalize_ingredient_name
+        from .ingredient_resolver import IngredientResolver
+
+        return IngredientExtractor(extraction_patterns(IngredientResolver(self.ingredients, normalize_ingredient_name)))
+
+    def test_automaton_finds_every_occurrence(self):
+        from .ingredient_extractor import AhoCorasick
+
+        patterns = {'he': 1, 'she': 2, 'his': 3, 'hers': 4, 'a': 5, 'aaa': 6}
+        automaton = AhoCorasick(patterns)
+        rng = np.random.RandomState(0)
+        for text in ['ushers', 'ahishers', 'aaaa', ''] + [''.join(rng.choice(list('ahers'), size=30)) for _ in range(50)]:
+            expected = sorted(
+                (start, start + len(pattern), value)
+                for pattern, value in patterns.items()
+                for start in range(len(text)) if text.startswith(pattern, start)
+            )
+            self.assertEqual(sorted(automaton.iter_matches(text)), expected, text)
+
+    def test_leftmost_longest(self):
+        extractor = self.extractor()
+        self.assertEqual(extractor.extract('2 green chilli, slit'), [2])
+        self.assertEqual(extractor.extract('1 tsp red chilli powder'), [3])
+        self.assertEqual(extractor.extract('green chilli and a chilli'), [2, 1])
+
+    def test_word_boundaries(self):
+        extractor = self.extractor()
+        self.assertEqual(extractor.extract('1 pineapple'), [])
+        self.assertEqual(extractor.extract('buttermilk'), [])
+        self.assertEqual(extractor.extract('butter, milk'), [9, 10])
+        self.assertEqual(extractor.extract('onion-tomato masala'), [11, 4])
+
+    def test_plural_surface_forms(self):
+        extractor = self.extractor()
+        self.assertEqual(extractor.extract('3 Tomatoes\n10 curry leaves\n1 cup berries\n2 apples'), [4, 6, 7, 5])
+        self.assertEqual(extractor.extract('2 green chillies'), [2])
+        # Regional aliases resolve like user input does
+        self.assertEqual(extractor.extract('1 tsp jeera'), [8])
+
+    def test_first_mention_order_without_duplicates(self):
+        extractor = self.extractor()
+        self.assertEqual(extractor.extract('onion, tomato, more onion, Onions'), [11, 4])
+        self.assertEqual(extractor.extract(None), [])
+
+
+class RecipeTablesTestCase(TestCase):
+    """TestCase with the unmanaged recipe tables the catalog reads, which migrations don't create"""
+
+    # Portable between SQLite and MySQL; only the columns the recommender reads
+    TABLES = {
+        'recipes': """
+            CREATE TABLE recipes (
+                recipe_id INTEGER PRIMARY KEY, user_id INTEGER, title VARCHAR(255), description TEXT,
+                ingredients TEXT, instructions TEXT, cooking_time INTEGER, cuisine VARCHAR(100),
+                meal_type VARCHAR(100), diet_type VARCHAR(100), difficulty VARCHAR(50), image_url VARCHAR(500),
+                serving_size INTEGER, rating DOUBLE PRECISION, updated_at VARCHAR(32)
+            )
+        """,
+        'ingredients': "CREATE TABLE ingredients (ingredient_id INTEGER PRIMARY KEY, ingredient_name VARCHAR(255))",
+        'recipe_core_ingredients': """
+            CREATE TABLE recipe_core_ingredients (
+                recipe_id INTEGER, ingredient_id INTEGER, importance_score DOUBLE PRECISION,
+                category VARCHAR(50), is_essential INTEGER
+            )
+        """,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        # Before TestCase opens its transaction: MySQL commits on DDL
+        with connection.cursor() as cursor:
+            for statement in cls.TABLES.values():
+                cursor.execute(statement)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.cursor() as cursor:
+            for table in cls.TABLES:
+                cursor.execute(f"DROP TABLE {table}")
+
+    def insert(self, table, rows):
+        with connection.cursor() as cursor:
+            for row in rows:
+                cursor.execute(
+                    f"INSERT INTO {table} ({', '.join(row)}) VALUES ({', '.join(['%s'] * len(row))})",
+                    list(row.values())
+                )
+
+    def core_rows(self, recipe_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT ingredient_id, category FROM recipe_core_ingredients WHERE recipe_id = %s ORDER BY ingredient_id",
+                [recipe_id]
+            )
+            return cursor.fetchall()
+
+
+class ExtractedCoreIngredientsTests(RecipeTablesTestCase):
+    """Editing a recipe replaces its extracted core ingredients, never curated ones"""
+
+    def setUp(self):
+        self.insert('ingredients', [
+            {'ingredient_id': ingredient_id, 'ingredient_name': name}
+            for ingredient_id, name in enumerate(['onion', 'tomato', 'paneer', 'rice'], 1)
+        ])
+        self.insert('recipes', [
+            {'recipe_id': recipe_id, 'title': f'Recipe {recipe_id}', 'ingredients': '2 onions\n1 tomato'}
+            for recipe_id in (1, 2, 3)
+        ])
+        self.insert('recipe_core_ingredients', [
+            {'recipe_id': 1, 'ingredient_id': 1, 'importance_score': 1.0, 'category': 'extracted', 'is_essential': 1},
+            {'recipe_id': 1, 'ingredient_id': 2, 'importance_score': 1.0, 'category': 'extracted', 'is_essential': 1},
+            {'recipe_id': 2, 'ingredient_id': 3, 'importance_score': 0.9, 'category': 'protein', 'is_essential': 1},
+            {'recipe_id': 2, 'ingredient_id': 1, 'importance_score': 1.0, 'category': 'extracted', 'is_essential': 1},
+        ])
+
+    def test_delete_keeps_curated_recipes(self):
+        from .ingredient_extractor import delete_extracted_core_ingredients
+
+        self.assertEqual(delete_extracted_core_ingredients([1, 2, 3]), [1, 3])
+        self.assertEqual(self.core_rows(1), [])
+        self.assertEqual(self.core_rows(2), [(1, 'extracted'), (3, 'protein')])
+
+    def test_reextract_after_edit(self):
+        from .ml_model import RecipeMLModel
+
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE recipes SET ingredients = %s WHERE recipe_id IN (1, 2)", ['1 cup rice\n200g paneer'])
+        RecipeMLModel().reextract_core_ingredients([1, 2])
+        self.assertEqual(self.core_rows(1), [(3, 'extracted'), (4, 'extracted')])
+        self.assertEqual(self.core_rows(2), [(1, 'extracted'), (3, 'protein')])
+
+
+@override_settings(RECIPE_MATCH_TABLE=True)
+class RecipeMatchTableTests(RecipeTablesTestCase):
+    """recipe_match_table rows against the join they replace, and the fallback to the join"""
+
+    def setUp(self):
+        self.insert('ingredients', [
+            {'ingredient_id': ingredient_id, 'ingredient_name': name}
+            for ingredient_id, name in enumerate(['Onion', 'Tomato', 'Paneer', 'Rice', 'Green Chilli'], 1)
+        ])
+        self.insert('recipes', [
+            {'recipe_id': 1, 'title': 'Paneer Masala', 'description': 'Rich', 'ingredients': 'paneer, onion',
+             'instructions': '1. Chop\n2. Cook', 'cooking_time': 40, 'cuisine': 'North Indian',
+             'meal_type': 'Lunch', 'diet_type': 'Vegetarian', 'difficulty': 'Easy', 'rating': 4.2,
+             'serving_size': 2, 'updated_at': '2026-01-01'},
+            {'recipe_id': 2, 'title': 'Jeera Rice', 'ingredients': 'rice', 'instructions': 'Boil the rice.'},
+            # Only non-essential core ingredients: in neither the join nor the table
+            {'recipe_id': 3, 'title': 'Salad', 'ingredients': 'tomato', 'instructions': ''},
+            {'recipe_id': 4, 'title': 'No core ingredients', 'ingredients': 'water', 'instructions': None},
+        ])
+        self.insert('recipe_core_ingredients', [
+            {'recipe_id': 1, 'ingredient_id': 3, 'importance_score': 0.9, 'category': 'protein', 'is_essential': 1},
+            {'recipe_id': 1, 'ingredient_id': 1, 'importance_score': 0.5, 'category': 'vegetable', 'is_essential': 1},
+            {'recipe_id': 1, 'ingredient_id': 5, 'importance_score': 0.3, 'category': 'spice', 'is_essential': 1},
+            {'recipe_id': 1, 'ingredient_id': 2, 'importance_score': 0.2, 'category': 'vegetable', 'is_essential': 0},
+            {'recipe_id': 2, 'ingredient_id': 4, 'importance_score': 1.0, 'category': 'grain', 'is_essential': 1},
+            {'recipe_id': 3, 'ingredient_id': 2, 'importance_score': 1.0, 'category': 'vegetable', 'is_essential': 0},
+        ])
+
+    def rebuild(self):
+        from .ml_model import recipe_ml_model
+
+        return recipe_ml_model.refresh_match_table()
+
+    def assertSameCatalog(self, table, join):
+        # GROUP_CONCAT order is unspecified, so the lists compare as sets
+        self.assertEqual([recipe['recipe_id'] for recipe in table],
+                         sorted(recipe['recipe_id'] for recipe in join))
+        join = {recipe['recipe_id']: recipe for recipe in join}
+        for recipe in table:
+            expected = join[recipe['recipe_id']]
+            for key, value in expected.items():
+                if key in ('core_ingredients', 'ingredient_categories', 'importance_scores'):
+                    self.assertEqual(set(recipe[key]), set(value), key)
+                else:
+                    self.assertEqual(recipe[key], value, key)
+
+    def test_rows_match_the_join(self):
+        from .ingredient_normalizer import normalize_ingredient_name
+        from .recipe_catalog import fetch_recipes_from_match_table, fetch_recipes_with_core_ingredients
+
+        self.assertEqual(self.rebuild(), 2)
+        table = fetch_recipes_from_match_table()
+        self.assertSameCatalog(table, fetch_recipes_with_core_ingredients())
+
+        paneer_masala = table[0]
+        self.assertEqual(paneer_masala['core_ingredients'], ['Green Chilli', 'Onion', 'Paneer'])
+        self.assertEqual(paneer_masala['core_ingredient_ids'], [5, 1, 3])
+        self.assertEqual(paneer_masala['importance_scores'], [0.3, 0.5, 0.9])
+        self.assertEqual(paneer_masala['ingredient_categories'], ['spice', 'vegetable', 'protein'])
+        self.assertEqual(paneer_masala['normalized_ingredients'],
+                         [normalize_ingredient_name(name.lower()) for name in paneer_masala['core_ingredients']])
+        self.assertEqual(len(paneer_masala['instruction_steps']), 2)
+
+    def test_refresh_follows_edits(self):
+        from .recipe_catalog import fetch_recipes_from_match_table, fetch_recipes_with_core_ingredients
+        from .recipe_match_table import refresh_match_rows
+        from .ml_model import recipe_ml_model
+
+        self.rebuild()
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE recipes SET title = 'Paneer Curry' WHERE recipe_id = 1")
+            cursor.execute("UPDATE recipe_core_ingredients SET is_essential = 1 WHERE recipe_id = 3")
+            cursor.execute("DELETE FROM recipe_core_ingredients WHERE recipe_id = 2")
+        refresh_match_rows([1, 2, 3], recipe_ml_model.normalize_ingredient_name, recipe_ml_model.parse_instructions)
+        self.assertSameCatalog(fetch_recipes_from_match_table(), fetch_recipes_with_core_ingredients())
+        self.assertEqual([recipe['recipe_id'] for recipe in fetch_recipes_from_match_table()], [1, 3])
+
+    def test_failed_refresh_falls_back_to_the_join(self):
+        from .ml_model import recipe_ml_model, recipes_changed
+        from .recipe_catalog import fetch_catalog, fetch_recipes_with_core_ingredients, match_table_ready
+        from .recipe_match_table import match_table_state
+        from .training_jobs import training_jobs
+
+        self.assertFalse(match_table_ready())
+        self.rebuild()
+        self.assertTrue(match_table_ready())
+
+        with mock.patch.object(training_jobs, 'schedule_incremental'), \
+                mock.patch.object(recipe_ml_model, 'refresh_match_table', side_effect=RuntimeError('lost connection')), \
+                self.assertLogs('api.ml_model', 'ERROR'):
+            recipes_changed([1])
+        self.assertIsNone(match_table_state())
+        self.assertFalse(match_table_ready())
+
+        # The edit the table missed is served from the join
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE recipes SET title = 'Paneer Curry' WHERE recipe_id = 1")
+        self.assertEqual(fetch_catalog(), fetch_recipes_with_core_ingredients())
+
+        # Single-row refreshes don't bring the table back; only a rebuild does
+        with mock.patch.object(training_jobs, 'schedule_incremental'):
+            recipes_changed([1])
+        self.assertFalse(match_table_ready())
+        self.rebuild()
+        self.assertTrue(match_table_ready())
+
+    def test_rebuild_not_marked_built_after_state_cleared(self):
+        from .recipe_match_table import (clear_match_table_state, mark_match_table_built, match_table_state,
+                                         start_match_table_build)
+
+        start_match_table_build()
+        self.assertEqual(match_table_state(), 'building')
+        clear_match_table_state()
+        self.assertFalse(mark_match_table_built(2))
+        self.assertIsNone(match_table_state())
+
+        start_match_table_build()
+        self.assertTrue(mark_match_table_built(2))
+        self.assertEqual(match_table_state(), 'built')
@@ -0,0 +1,270 @@
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+from django.conf import settings
+
+from .model_store import artifact_dir, fingerprint_tag
+
+logger = logging.getLogger(__name__)
+
+STATUS_FILE = 'training_status.json'
+START_LOCK_FILE = '.training_start.lock'
+# Exists while a recipe write is waiting for the running job to finish (see TrainingJobs.start)
+PENDING_INCREMENTAL_FILE = '.training_pending_incremental'
+
+
+def status_path():
+    return artifact_dir() / STATUS_FILE
+
+
+def pending_path():
+    return artifact_dir() / PENDING_INCREMENTAL_FILE
+
+
+def read_status() -> Dict[str, Any]:
+    """Last known training state, shared by every worker through the artifact directory"""
+    try:
+        with open(status_path()) as status_file:
+            return json.load(status_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_status(status: Dict[str, Any]):
+    path = status_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'.{STATUS_FILE}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as status_file:
+        json.dump(status, status_file)
+    os.replace(tmp_path, path)
+
+
+def update_status(**fields):
+    status = read_status()
+    status.update(fields)
+    write_status(status)
+
+
+@contextmanager
+def start_lock(timeout: float = 10.0, stale_after: float = 30.0):
+    """Cross-process lock held while deciding whether to start a job"""
+    path = artifact_dir() / START_LOCK_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                # Left behind by a worker that died while holding it
+                if time.time() - path.stat().st_mtime > stale_after:
+                    path.unlink()
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"Timed out waiting for {path}")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def run_training_job(job_id: str, kind: str = 'full'):
+    """Entry point of the training process: set up Django, train, save the artifact"""
+    import django
+    django.setup()
+
+    from .ml_model import RecipeMLModel
+
+    # Durations count from when the job was queued, including process start-up
+    start = read_status().get('started_at') or time.time()
+    update_status(state='running', pid=os.getpid())
+
+    def progress(phase, fraction):
+        update_status(phase=phase, progress=round(fraction, 2), duration_seconds=round(time.time() - start, 1))
+
+    model = RecipeMLModel()
+    try:
+        if kind == 'incremental' and model.load_artifact():
+            success = model.update_incremental(progress=progress, persist=True)
+        else:
+            success = model.train(progress=progress, persist=True)
+    except Exception as e:
+        logger.error(f"Training job {job_id} crashed: {e}")
+        success = False
+
+    finished_at = time.time()
+    status = read_status()
+    status.update(
+        state='succeeded' if success and model.artifact_info else 'failed',
+        phase='done',
+        progress=1.0,
+        finished_at=finished_at,
+        duration_seconds=round(finished_at - start, 1),
+    )
+    if status['state'] == 'succeeded':
+        status['last_success'] = {
+            'job_id': job_id,
+            'kind': kind,
+            'finished_at': finished_at,
+            'duration_seconds': status['duration_seconds'],
+            'artifact': os.path.basename(model.artifact_info['path']),
+            'catalog': fingerprint_tag((model.artifact_info or {}).get('catalog_fingerprint')),
+            'recipe_count': len(model.all_recipes),
+            'feature_count': model.feature_count,
+            # Lets workers holding an older bundle load this one instead of rebuilding again
+            'full_trained_at': model.bundle.full_trained_at,
+        }
+    else:
+        status['error'] = 'Training failed - see the server log'
+    write_status(status)
+
+
+class TrainingJobs:
+    """Runs RecipeMLModel.train in a separate process, one job at a time across all workers.
+
+    The job writes its phase and progress to a status file next to the model
+    artifacts, so every worker can report it. When the job finishes, the worker
+    that started it loads the new artifact right away; other workers pick it up
+    through ``RecipeMLModel.reload_if_newer``.
+
+    A recipe write that arrives while a job runs, in any worker, leaves a
+    pending marker next to the status file. Whichever worker next sees no job
+    running (the one watching the job, or any worker's periodic check through
+    ``start_pending``) starts the follow-up incremental job.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._process = None
+        self._timer = None
+
+    def start(self, force: bool = False, kind: str = 'full', lock_timeout: float = 10.0) -> Dict[str, Any]:
+        """Start a training job unless one is already running in any worker; return its status
+
+        kind is 'full' (train from scratch) or 'incremental' (fold catalog changes
+        into the saved model, falling back to a full train when one is due).
+        Raises TimeoutError if another worker holds the start lock for longer
+        than lock_timeout seconds; 0 gives up straight away.
+        """
+        with self._lock, start_lock(timeout=lock_timeout):
+            status = read_status()
+            if status.get('state') in ('queued', 'running') and pid_alive(status.get('pid')):
+                if kind == 'incremental':
+                    # The running job may have read the catalog before this change
+                    pending_path().touch()
+                return status
+
+            # Don't keep spawning jobs for a catalog that can't be trained on
+            retry_after = getattr(settings, 'ML_TRAINING_RETRY_SECONDS', 300)
+            if (not force and status.get('state') == 'failed'
+                    and time.time() - status.get('finished_at', 0) < retry_after):
+                return status
+
+            job_id = uuid.uuid4().hex[:12]
+            # Whatever was pending is covered: this job reads the catalog as it is now
+            pending_path().unlink(missing_ok=True)
+            context = multiprocessing.get_context('spawn')
+            process = context.Process(target=run_training_job, args=(job_id, kind), name=f'recipe-training-{job_id}')
+            write_status({
+                **{key: status[key] for key in ('last_success',) if key in status},
+                'job_id': job_id,
+                'kind': kind,
+                'state': 'queued',
+                'phase': 'starting',
+                'progress': 0.0,
+                'started_at': time.time(),
+                'duration_seconds': 0.0,
+                'pid': None,
+            })
+            process.start()
+            update_status(pid=process.pid)
+            self._process = process
+            logger.info(f"Started {kind} training job {job_id} in process {process.pid}")
+
+            threading.Thread(target=self._watch, args=(job_id, process), name='recipe-training-watch', daemon=True).start()
+            return read_status()
+
+    def start_pending(self, lock_timeout: float = 10.0) -> Optional[Dict[str, Any]]:
+        """Start the incremental job a recipe write left pending, once no job is running"""
+        if not pending_path().exists():
+            return None
+        return self.start(kind='incremental', lock_timeout=lock_timeout)
+
+    def schedule_incremental(self):
+        """Start an incremental job shortly, coalescing recipe writes that arrive close together"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(getattr(settings, 'ML_INCREMENTAL_DELAY', 5), self._start_scheduled)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _start_scheduled(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.start(kind='incremental')
+        except Exception as e:
+            logger.error(f"Error starting incremental training job: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        """Current or last job for /ml/status/"""
+        status = read_status()
+        if status.get('state') in ('queued', 'running') and status.get('pid') and not pid_alive(status['pid']):
+            # The job process died without reporting back
+            status['state'] = 'failed'
+            status['error'] = 'Training process exited unexpectedly'
+        elif status.get('state') in ('queued', 'running'):
+            status['duration_seconds'] = round(time.time() - status.get('started_at', time.time()), 1)
+        status['pending_incremental'] = pending_path().exists()
+        return status
+
+    def _watch(self, job_id: str, process):
+        process.join()
+        status = read_status()
+        if status.get('job_id') == job_id:
+            if status.get('state') == 'succeeded':
+                from .ml_model import recipe_ml_model
+                recipe_ml_model.load_artifact()
+                logger.info(f"Training job {job_id} finished in {status.get('duration_seconds')}s")
+            else:
+                if status.get('state') in ('queued', 'running'):
+                    update_status(state='failed', finished_at=time.time(),
+                                  error=f'Training process exited with code {process.exitcode}')
+                logger.error(f"Training job {job_id} failed")
+
+        try:
+            self.start_pending()
+        except Exception as e:
+            logger.error(f"Error starting pending incremental training job: {e}")
+
+
+# Global instance
+training_jobs = TrainingJobs()
@@ -28,6 +28,7 @@ urlpatterns = [
     path('ml/status/', views.get_ml_model_status, name='ml_status'),
     path('ml/train/', views.train_ml_model, name='ml_train'),
     path('ml/recommend/', views.ml_recommend_recipes, name='ml_recommend'),
+    path('ml/recommend/batch/', views.ml_recommend_batch, name='ml_recommend_batch'),
     path('ml/recommend-with-subs/', views.ml_recommend_with_substitutions, name='ml_recommend_with_subs'),
     path('ml/test/', views.ml_test_page, name='ml_test'),
     path('recipes/<int:recipe_id>/details/', views.get_recipe_details, name='recipe_details'),
@@ -306,6 +306,14 @@ def add_recipe(request):
             cursor.execute("SELECT LAST_INSERT_ID()")
             recipe_id = cursor.fetchone()[0]
 
+        from .ml_model import recipe_ml_model, recipes_changed
+        try:
+            recipe_ml_model.extract_core_ingredients([recipe_id])
+        except Exception as e:
+            # The recipe is saved either way; the backfill command picks it up later
+            print("Core ingredient extraction failed:", e)
+        recipes_changed([recipe_id])
+
         return JsonResponse({'message': 'Recipe added successfully', 'recipe_id': recipe_id}, status=201)
 
     except Exception as e:
@@ -790,6 +798,14 @@ def update_recipe(request, recipe_id):
         serializer = RecipeSerializer(recipe, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
+            from .ml_model import recipe_ml_model, recipes_changed
+            if 'ingredients' in request.data:
+                try:
+                    recipe_ml_model.reextract_core_ingredients([recipe_id])
+                except Exception as e:
+                    # The edit is saved either way; the old core ingredients stay until the next try
+                    print("Core ingredient extraction failed:", e)
+            recipes_changed([recipe_id])
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
@@ -803,6 +819,8 @@ def delete_recipe(request, recipe_id):
         if not recipe:
             return Response({'error': 'Recipe not found'}, status=status.HTTP_404_NOT_FOUND)
         recipe.delete()
+        from .ml_model import recipes_changed
+        recipes_changed([recipe_id])
         return Response({'message': 'Recipe deleted successfully'})
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1075,7 +1093,7 @@ def get_ml_model_status(request):
             'success': True,
             'is_trained': recipe_ml_model.is_trained,
             'recipe_count': len(recipes),
-            'feature_count': len(recipe_ml_model.feature_columns) if recipe_ml_model.is_trained else 0
+            'feature_count': recipe_ml_model.feature_count
         })
     except Exception as e:
         return JsonResponse({
@@ -1167,15 +1185,22 @@ def get_ml_model_status(request):
     """Check ML model status"""
     try:
         from .ml_model import recipe_ml_model
+        from .recipe_catalog import recipe_catalog
+        from .training_jobs import training_jobs
         
-        recipes = recipe_ml_model.fetch_recipes_from_db()
+        snapshot = recipe_ml_model.get_catalog()
         
         return JsonResponse({
             'success': True,
             'is_trained': recipe_ml_model.is_trained,
-            'recipe_count': len(recipes),
-            'feature_count': len(recipe_ml_model.feature_columns) if recipe_ml_model.feature_columns else 0,
-            'message': f'Model ready with {len(recipes)} recipes'
+            'recipe_count': len(snapshot),
+            'feature_count': recipe_ml_model.feature_count,
+            'catalog': recipe_catalog.status(),
+            'trained_catalog_version': recipe_ml_model.trained_catalog_version,
+            'result_cache': recipe_ml_model.result_cache.stats(),
+            'artifact': recipe_ml_model.artifact_status(),
+            'training': training_jobs.status(),
+            'message': f'Model ready with {len(snapshot)} recipes'
         })
     except Exception as e:
         logger.error(f"ML status error: {e}")
@@ -1186,22 +1211,29 @@ def get_ml_model_status(request):
 
 @csrf_exempt
 def train_ml_model(request):
-    """Train the ML model"""
+    """Start training the ML model in a background process"""
     try:
-        from .ml_model import recipe_ml_model
+        from .training_jobs import training_jobs
         
-        success = recipe_ml_model.train()
-        
-        if success:
+        try:
+            # Don't hold the request while another worker holds the start lock
+            job = training_jobs.start(force=True, lock_timeout=0)
+        except TimeoutError:
+            # That worker is starting a job or found one running; report where things stand
+            job = training_jobs.status()
             return JsonResponse({
                 'success': True,
-                'message': f'Model trained successfully with {len(recipe_ml_model.feature_columns)} features'
-            })
-        else:
-            return JsonResponse({
-                'success': False,
-                'error': 'Training failed - not enough data'
+                'job_id': job.get('job_id'),
+                'state': job.get('state'),
+                'message': 'Another worker is starting training right now; follow its progress on /ml/status/'
             })
+        
+        return JsonResponse({
+            'success': True,
+            'job_id': job.get('job_id'),
+            'state': job.get('state'),
+            'message': 'Training started in the background; follow its progress on /ml/status/'
+        })
     except Exception as e:
         logger.error(f"ML training error: {e}")
         return JsonResponse({
@@ -1224,6 +1256,31 @@ def generate_fallback_image(recipe_name):
     else:
         return "https://images.unsplash.com/photo-1556909114-f6e7ad7d3136?w=400"
 
+def transform_ml_recommendations(recommendations):
+    """Convert predict() results to the React-compatible recipe format"""
+    transformed_recommendations = []
+    for i, recipe in enumerate(recommendations):
+        # Generate fallback image based on recipe name
+        image_url = recipe.get('image_url') or generate_fallback_image(recipe.get('title', ''))
+        
+        transformed_recipe = {
+            'id': recipe.get('recipe_id', i + 1),
+            'name': recipe.get('title', 'Unknown Recipe'),
+            'image': image_url,
+            'time': f"{recipe.get('cooking_time', 30)} mins",
+            'rating': float(recipe.get('rating', 4.5)),
+            'difficulty': recipe.get('difficulty', 'Medium'),
+            'cuisine': recipe.get('cuisine', 'Indian'),
+            'description': recipe.get('description', 'Delicious recipe perfect for any occasion.'),
+            'ingredients': recipe.get('ingredients', []),
+            'instructions': recipe.get('instructions', ['No instructions available.']),
+            'match_percentage': round(recipe.get('confidence_score', 0)),
+            'has_substitutions': False,
+            'ingredients_you_have': recipe.get('matching_ingredients', [])
+        }
+        transformed_recommendations.append(transformed_recipe)
+    return transformed_recommendations
+
 @csrf_exempt
 def ml_recommend_recipes(request):
     """Get recipe recommendations - FIXED VERSION"""
@@ -1243,39 +1300,11 @@ def ml_recommend_recipes(request):
         
         from .ml_model import recipe_ml_model
         
-        # Ensure model is trained
-        if not recipe_ml_model.is_trained:
-            logger.info("Model not trained, training now...")
-            if not recipe_ml_model.train():
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Failed to train model with available recipes'
-                })
-        
-        recommendations = recipe_ml_model.predict(ingredients, top_n=top_n)
+        # 'match', 'weighted' or 'rerank'; defaults to ML_RANKING_MODE
+        recommendations = recipe_ml_model.predict(ingredients, top_n=top_n, ranking=data.get('ranking'))
         
         # Transform to React-compatible format
-        transformed_recommendations = []
-        for i, recipe in enumerate(recommendations):
-            # Generate fallback image based on recipe name
-            image_url = recipe.get('image_url') or generate_fallback_image(recipe.get('title', ''))
-            
-            transformed_recipe = {
-                'id': recipe.get('recipe_id', i + 1),
-                'name': recipe.get('title', 'Unknown Recipe'),
-                'image': image_url,
-                'time': f"{recipe.get('cooking_time', 30)} mins",
-                'rating': float(recipe.get('rating', 4.5)),
-                'difficulty': recipe.get('difficulty', 'Medium'),
-                'cuisine': recipe.get('cuisine', 'Indian'),
-                'description': recipe.get('description', 'Delicious recipe perfect for any occasion.'),
-                'ingredients': recipe.get('ingredients', []),
-                'instructions': recipe.get('instructions', ['No instructions available.']),
-                'match_percentage': round(recipe.get('confidence_score', 0)),
-                'has_substitutions': False,
-                'ingredients_you_have': recipe.get('matching_ingredients', [])
-            }
-            transformed_recommendations.append(transformed_recipe)
+        transformed_recommendations = transform_ml_recommendations(recommendations)
         
         logger.info(f"Generated {len(transformed_recommendations)} recommendations for ingredients: {ingredients}")
         
@@ -1293,6 +1322,78 @@ def ml_recommend_recipes(request):
             'error': str(e)
         })
 
+@csrf_exempt
+def ml_recommend_batch(request):
+    """Get recipe recommendations for many ingredient lists in one request"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Only POST method allowed'})
+    
+    try:
+        data = json.loads(request.body)
+        queries = data.get('queries', [])
+        max_queries = getattr(settings, 'ML_BATCH_MAX_QUERIES', 100)
+        
+        if not queries or not isinstance(queries, list):
+            return JsonResponse({
+                'success': False,
+                'error': 'No queries provided'
+            })
+        if len(queries) > max_queries:
+            return JsonResponse({
+                'success': False,
+                'error': f'Too many queries: {len(queries)} (max {max_queries})'
+            })
+        
+        # Each query is a list of ingredients or {"ingredients": [...], "top_n": 5}
+        max_top_n = getattr(settings, 'ML_BATCH_MAX_TOP_N', 50)
+        batch = []
+        for number, query in enumerate(queries):
+            if isinstance(query, dict):
+                ingredients = query.get('ingredients', [])
+                top_n = query.get('top_n', 5)
+            else:
+                ingredients = query
+                top_n = 5
+            if not isinstance(ingredients, list) or not all(isinstance(item, str) for item in ingredients):
+                return JsonResponse({
+                    'success': False,
+                    'error': f'Query {number}: ingredients must be a list of strings'
+                })
+            # bool is an int subclass; true/false is not a count
+            if isinstance(top_n, bool) or not isinstance(top_n, int) or not 1 <= top_n <= max_top_n:
+                return JsonResponse({
+                    'success': False,
+                    'error': f'Query {number}: top_n must be an integer from 1 to {max_top_n}'
+                })
+            batch.append({'ingredients': ingredients, 'top_n': top_n})
+        
+        from .ml_model import recipe_ml_model
+        
+        results = []
+        for query, recommendations in zip(batch, recipe_ml_model.predict_many(batch, ranking=data.get('ranking'))):
+            if not query['ingredients']:
+                recommendations = []
+            transformed_recommendations = transform_ml_recommendations(recommendations)
+            results.append({
+                'recommendations': transformed_recommendations,
+                'count': len(transformed_recommendations)
+            })
+        
+        logger.info(f"Generated batch recommendations for {len(batch)} queries")
+        
+        return JsonResponse({
+            'success': True,
+            'results': results,
+            'count': len(results)
+        })
+        
+    except Exception as e:
+        logger.error(f"ML batch recommendation error: {e}")
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
 @csrf_exempt
 def ml_recommend_with_substitutions(request):
     """Get recipe recommendations with ingredient substitutions - FIXED VERSION"""
@@ -1312,15 +1413,6 @@ def ml_recommend_with_substitutions(request):
         
         from .ml_model import recipe_ml_model
         
-        # Ensure model is trained
-        if not recipe_ml_model.is_trained:
-            logger.info("Model not trained, training now...")
-            if not recipe_ml_model.train():
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Failed to train model with available recipes'
-                })
-        
         # Get enhanced recommendations with substitutions
         recommendations = recipe_ml_model.get_recipes_with_substitutions(ingredients, top_n=top_n)
         
@@ -1590,7 +1682,7 @@ def get_model_metrics(request):
                 'model_status': {
                     'is_trained': recipe_ml_model.is_trained,
                     'recipes_count': len(recipe_ml_model.all_recipes),
-                    'feature_count': len(recipe_ml_model.feature_columns) if recipe_ml_model.feature_columns else 0
+                    'feature_count': recipe_ml_model.feature_count
                 }
             })
         except Exception as e:
@@ -224,3 +224,61 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 ALLOWED_HOSTS = ['*']
+
+# ML recommender
+# Seconds between background checks for recipe changes made by other processes
+RECIPE_CATALOG_TTL = int(os.environ.get('RECIPE_CATALOG_TTL', 60))
+# Reload the catalog at least this often even if nothing seems to have changed
+RECIPE_CATALOG_MAX_AGE = int(os.environ.get('RECIPE_CATALOG_MAX_AGE', 3600))
+# Load the catalog from the materialized recipe_match_table (kept current on recipe writes,
+# rebuilt by build_match_table) instead of joining the recipe tables
+RECIPE_MATCH_TABLE = os.environ.get('RECIPE_MATCH_TABLE', 'True') == 'True'
+# How predict scores the catalog: 'index' (inverted index), 'matrix' (sparse mat-vec),
+# 'bitset' (packed bitsets, AND + popcount) or 'loop' (per recipe)
+RECIPE_SCORING_ENGINE = os.environ.get('RECIPE_SCORING_ENGINE', 'index')
+# Maximum number of ingredient lists accepted by /ml/recommend/batch/
+ML_BATCH_MAX_QUERIES = int(os.environ.get('ML_BATCH_MAX_QUERIES', 100))
+# Largest top_n a single /ml/recommend/batch/ query may ask for
+ML_BATCH_MAX_TOP_N = int(os.environ.get('ML_BATCH_MAX_TOP_N', 50))
+# Recommendation results kept in memory per process (LRU); 0 disables the cache
+ML_RESULT_CACHE_SIZE = int(os.environ.get('ML_RESULT_CACHE_SIZE', 1024))
+# Trained models are saved here and loaded by workers at startup
+ML_ARTIFACT_DIR = os.environ.get('ML_ARTIFACT_DIR', os.path.join(BASE_DIR, 'ml_artifacts'))
+# Number of saved model artifacts to keep
+ML_ARTIFACT_KEEP = int(os.environ.get('ML_ARTIFACT_KEEP', 5))
+ML_SAVE_ARTIFACTS = os.environ.get('ML_SAVE_ARTIFACTS', 'True') == 'True'
+# Seconds between checks for a newer artifact written by a training job
+ML_ARTIFACT_CHECK_INTERVAL = int(os.environ.get('ML_ARTIFACT_CHECK_INTERVAL', 30))
+# Wait this long after a failed training job before a request may start another one
+ML_TRAINING_RETRY_SECONDS = int(os.environ.get('ML_TRAINING_RETRY_SECONDS', 300))
+# Recipe writes are folded into the model by an incremental job this many seconds later
+ML_INCREMENTAL_DELAY = int(os.environ.get('ML_INCREMENTAL_DELAY', 5))
+# Trees added to the forest by each incremental update
+ML_INCREMENTAL_TREES = int(os.environ.get('ML_INCREMENTAL_TREES', 10))
+# Retrain from scratch after this many incremental updates or this many seconds
+ML_INCREMENTAL_MAX_UPDATES = int(os.environ.get('ML_INCREMENTAL_MAX_UPDATES', 10))
+ML_FULL_REBUILD_INTERVAL = int(os.environ.get('ML_FULL_REBUILD_INTERVAL', 86400))
+# Cores used to fit the forest and build features (-1 = all cores)
+ML_TRAINING_N_JOBS = int(os.environ.get('ML_TRAINING_N_JOBS', -1))
+# Recipes needed before feature building uses a process pool
+ML_PARALLEL_FEATURES_MIN = int(os.environ.get('ML_PARALLEL_FEATURES_MIN', 50000))
+# Columns ingredients are hashed into; changing it needs a full retrain
+ML_FEATURE_HASH_SIZE = int(os.environ.get('ML_FEATURE_HASH_SIZE', 2 ** 14))
+# How predict orders results: 'match' (ingredient match score), 'weighted' (match score weighted by
+# rci.importance_score, needs RECIPE_MATCH_TABLE) or 'rerank' (best matches reranked by the model)
+ML_RANKING_MODE = os.environ.get('ML_RANKING_MODE', 'match')
+# Rerank at most this many candidates per query, within this many milliseconds per request
+ML_RERANK_CANDIDATES = int(os.environ.get('ML_RERANK_CANDIDATES', 100))
+ML_RERANK_BUDGET_MS = int(os.environ.get('ML_RERANK_BUDGET_MS', 50))
+# Share of the reranked score that comes from the model (the rest is the match score)
+ML_RERANK_WEIGHT = float(os.environ.get('ML_RERANK_WEIGHT', 0.5))
+# Score with a NumPy-only export of the forest; optionally pruned to this depth and
+# to each leaf's top K recipes (0 = no limit)
+ML_COMPILED_FOREST = os.environ.get('ML_COMPILED_FOREST', 'True') == 'True'
+ML_COMPILED_MAX_DEPTH = int(os.environ.get('ML_COMPILED_MAX_DEPTH', 0))
+ML_COMPILED_TOP_K = int(os.environ.get('ML_COMPILED_TOP_K', 0))
+# Load the newest model artifact when backend.wsgi is imported, so workers don't train or
+# load on their first recommendation; False defers it (and sklearn/joblib) to first use
+ML_LOAD_AT_BOOT = os.environ.get('ML_LOAD_AT_BOOT', 'True') == 'True'
+# Resolve user ingredients from the precomputed neighbour table (build_neighbour_table) when one exists
+ML_NEIGHBOUR_TABLE = os.environ.get('ML_NEIGHBOUR_TABLE', 'True') == 'True'
@@ -9,8 +9,18 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Load the saved recommender model at boot instead of on the first recommendation.
+# Importing Django alone stays light; the scientific stack comes in here, or on first
+# use with ML_LOAD_AT_BOOT=False. Under gunicorn the model is already loaded by the
+# time gunicorn.conf.py warms the rest of the recommender.
+if settings.ML_LOAD_AT_BOOT:
+    from api.ml_model import initialize_ml_model  # noqa: E402
+
+    initialize_ml_model()
@@ -0,0 +1,24 @@
+# Gunicorn settings, picked up automatically when gunicorn starts from this directory
+import os
+
+# Build the recipe catalog, index and model once in the master and share them
+# with the forked workers. Set RECIPE_PRELOAD=False to have every worker build its own.
+preload_app = os.environ.get('RECIPE_PRELOAD', 'True') == 'True'
+
+
+def when_ready(server):
+    if preload_app:
+        from api.preload import preload_and_freeze
+        from api.process_memory import log_process_memory
+
+        preload_and_freeze()
+        log_process_memory('Gunicorn master after preload')
+
+
+def post_worker_init(worker):
+    from api.preload import warm_recommender
+    from api.process_memory import log_process_memory
+
+    if not preload_app:
+        warm_recommender()
+    log_process_memory('Gunicorn worker ready')